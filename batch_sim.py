@@ -0,0 +1,545 @@
+"""Batched physics simulation of many players for tuning jumps and levels.
+
+Runs N player agents through the same level in lockstep, each with its own
+input stream. Positions, velocities, fall_count and jump_count are NumPy
+vectors and every tick is a handful of whole-array operations that mirror
+Player.jump(), Player.loop(), Player.landed(), Player.hit_head() and the
+order handle_move() applies them in.
+
+Collision is against the level's blocks (on the BLOCK_SIZE grid, each
+solid where the block image's mask is) with the same fixed body box
+(Player.HITBOX), split into floors, ceilings and walls the way
+collect_contacts() does. Moving platforms follow their path tick by tick
+and carry the agents standing on them; every agent has its own copy of the
+falling platforms (how long it stood on each, how far each has dropped).
+Landing on a platform tests the agent's current animation frame against the
+platform's mask like collide_mask(), so the facing and animation count are
+part of the state too.
+
+cross_check() runs the real Player class through Level.loop() and
+move_player() on a Level with only those blocks and platforms and compares
+the two tick by tick; they should match exactly.
+
+Usage:
+    python batch_sim.py --level 0 --agents 5000 --ticks 600 --check 16
+"""
+import os
+import sys
+import math
+import time
+import argparse
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # configure() in main() opens a window
+
+import numpy as np
+import pygame
+
+import mario_offbrand as game
+from engine.config import configure
+from engine.assets import world_mask
+from engine.collision import move_player
+from engine.entities import Goal
+
+# Body box inside the player's 64x64 frame: (x inset, y inset, width, height).
+# The bottom matches the frame bottom so landing puts rect.bottom on the tile top.
+HITBOX = game.Player.HITBOX
+PLAYER_SIZE = 64
+
+
+# --- Rounding ---
+def round_like_rect(values):
+    """pygame.Rect rounds assigned floats half away from zero."""
+    whole = np.trunc(values)
+    fraction = values - whole
+    return (whole + np.where(np.abs(fraction) >= 0.5, np.sign(values), 0)).astype(np.int64)
+
+
+# --- Terrain ---
+def mask_rects(mask):
+    """A mask as a few (x, y, width, height) rects: the runs of set pixels in
+    each row, with consecutive rows that have the same runs merged."""
+    width, height = mask.get_size()
+    rects = []
+    previous, top = None, 0
+    for y in range(height + 1):
+        runs = []
+        x = 0
+        while y < height and x < width:
+            if mask.get_at((x, y)):
+                start = x
+                while x < width and mask.get_at((x, y)):
+                    x += 1
+                runs.append((start, x))
+            x += 1
+        runs = tuple(runs)
+        if runs != previous:
+            rects += [(left, top, right - left, y - top) for left, right in previous or ()]
+            previous, top = runs, y
+    return rects
+
+
+class Terrain:
+    """Blocks of a level on a grid of BLOCK_SIZE cells, each solid where the
+    block image's mask is (shape, as mask_rects())."""
+
+    def __init__(self, blocks, cell_size=game.BLOCK_SIZE, shape=None):
+        if not blocks:
+            raise ValueError("Level has no blocks")
+        self.cell_size = cell_size
+        self.shape = shape or [(0, 0, cell_size, cell_size)]
+        xs = [x for x, _ in blocks]
+        ys = [y for _, y in blocks]
+        self.origin_x = min(xs)
+        self.origin_y = min(ys)
+        columns = (max(xs) - self.origin_x) // cell_size + 1
+        rows = (max(ys) - self.origin_y) // cell_size + 1
+        self.solid = np.zeros((rows, columns), dtype=bool)
+        for x, y in blocks:
+            if (x - self.origin_x) % cell_size or (y - self.origin_y) % cell_size:
+                raise ValueError(f"Block at {(x, y)} is not on the {cell_size}px grid")
+            self.solid[(y - self.origin_y) // cell_size, (x - self.origin_x) // cell_size] = True
+        self.bottom = self.origin_y + rows * cell_size
+
+    @classmethod
+    def from_level(cls, level_data):
+        block = game.Block(0, 0, game.BLOCK_SIZE // 2) # As Level.add_entry() makes them
+        return cls(list(level_data["blocks"]), shape=mask_rects(block.mask))
+
+    def _lookup(self, cx, cy):
+        rows, columns = self.solid.shape
+        inside = (cx >= 0) & (cx < columns) & (cy >= 0) & (cy < rows)
+        return inside & self.solid.ravel().take(cy * columns + cx, mode="clip")
+
+    def _areas(self, left, top, right, bottom, cells):
+        """For each (cx, cy) in cells: the agents whose box overlaps the block
+        there and the bounding rect of that overlap, as (agents, x0, y0, x1,
+        y1) arrays. That is one get_bounding_rects() rect as long as the
+        overlap is connected, which it is for any box and a one-piece mask.
+        Only agents with a block in the cell are worked on."""
+        size = self.cell_size
+        for cx, cy in cells:
+            agents = np.flatnonzero(self._lookup(cx, cy))
+            cell_x = self.origin_x + cx[agents] * size
+            cell_y = self.origin_y + cy[agents] * size
+            # In cell coordinates from here on
+            box_left, box_right = left[agents] - cell_x, right[agents] - cell_x
+            box_top, box_bottom = top[agents] - cell_y, bottom[agents] - cell_y
+            x0, y0 = np.full(len(agents), size), np.full(len(agents), size)
+            x1, y1 = np.zeros(len(agents), dtype=np.int64), np.zeros(len(agents), dtype=np.int64)
+            for rect_x, rect_y, rect_width, rect_height in self.shape:
+                ix0 = np.maximum(box_left, rect_x)
+                ix1 = np.minimum(box_right, rect_x + rect_width)
+                iy0 = np.maximum(box_top, rect_y)
+                iy1 = np.minimum(box_bottom, rect_y + rect_height)
+                part = (ix0 < ix1) & (iy0 < iy1)
+                x0 = np.where(part, np.minimum(x0, ix0), x0)
+                y0 = np.where(part, np.minimum(y0, iy0), y0)
+                x1 = np.where(part, np.maximum(x1, ix1), x1)
+                y1 = np.where(part, np.maximum(y1, iy1), y1)
+            hit = x0 < x1
+            yield agents[hit], (x0 + cell_x)[hit], (y0 + cell_y)[hit], (x1 + cell_x)[hit], (y1 + cell_y)[hit]
+
+    def contacts(self, left, top, width, height, dx, dy):
+        """What collect_contacts() finds for the body box (left, top, width,
+        height) walking dx and moving dy this tick, as arrays: (left wall
+        depth, right wall depth, floor depth, ceiling depth), 0 where none.
+        The body swept by dx has to fit in two cells each way."""
+        size = self.cell_size
+        bottom = top + height
+        cx0 = (left + np.minimum(dx, 0) - self.origin_x) // size
+        cx1 = (left + width + np.maximum(dx, 0) - 1 - self.origin_x) // size
+        cy0 = (top - self.origin_y) // size
+        cy1 = (bottom - 1 - self.origin_y) // size
+        # Each cell once: the second column / row only where the box reaches into it
+        far_x = np.where(cx1 != cx0, cx1, -1)
+        far_y = np.where(cy1 != cy0, cy1, -1)
+        cells = [(cx0, cy0), (far_x, cy0), (cx0, far_y), (far_x, far_y)]
+
+        # Floors and ceilings: overlaps with the body where it is now, split by
+        # their shape as _contact_side() does
+        floor = np.zeros(len(left), dtype=np.int64)
+        ceiling = np.zeros(len(left), dtype=np.int64)
+        band_top = np.zeros(len(left), dtype=np.int64) # Rows of the body that can hold a wall
+        band_bottom = np.full(len(left), height)
+        abs_dy = np.abs(dy)
+        for agents, x0, y0, x1, y1 in self._areas(left, top, left + width, bottom, cells):
+            area_width, area_height = x1 - x0, y1 - y0
+            area_top = top[agents]
+            flat = (area_height <= abs_dy[agents] + 1) | (area_height < area_width)
+            below = flat & (y0 + area_height // 2 >= area_top + height // 2)
+            above = flat & ~below
+            agent = agents[below]
+            floor[agent] = np.maximum(floor[agent], area_height[below])
+            band_bottom[agent] = np.minimum(band_bottom[agent], (y0 - area_top)[below])
+            agent = agents[above]
+            ceiling[agent] = np.maximum(ceiling[agent], area_height[above])
+            band_top[agent] = np.maximum(band_top[agent], (y1 - area_top)[above])
+
+        # Walls: overlaps with the moved body, minus the rows sunk into a floor or ceiling
+        ahead = left + dx
+        wall_left = np.zeros(len(left), dtype=np.int64)
+        wall_right = np.zeros(len(left), dtype=np.int64)
+        for agents, x0, _, x1, _ in self._areas(ahead, top + band_top, ahead + width, top + band_bottom, cells):
+            area_width = x1 - x0
+            right = x0 + area_width // 2 >= ahead[agents] + width // 2
+            agent = agents[right]
+            wall_right[agent] = np.maximum(wall_right[agent], area_width[right])
+            agent = agents[~right]
+            wall_left[agent] = np.maximum(wall_left[agent], area_width[~right])
+        return wall_left, wall_right, floor, ceiling
+
+
+# --- Sprites and Platforms ---
+class SpriteTable:
+    """Player.SPRITES as one list of world masks, so an agent's animation
+    frame is an index into it. Player.update_sprite() picks the sheet from
+    the same state; hit sheets aren't included (nothing here hurts)."""
+    SHEETS = ("idle", "run", "jump", "double_jump", "fall")
+    IDLE, RUN, JUMP, DOUBLE_JUMP, FALL = range(len(SHEETS))
+
+    def __init__(self):
+        sprites = game.Player.load_sprites()
+        self.masks = []
+        self.start = np.zeros((len(self.SHEETS), 2), dtype=np.int64) # [sheet, facing right]
+        self.length = np.ones((len(self.SHEETS), 2), dtype=np.int64)
+        for sheet, name in enumerate(self.SHEETS):
+            for right, direction in enumerate(("left", "right")):
+                frames = sprites.get(f"{name}_{direction}", [])
+                self.start[sheet, right] = len(self.masks)
+                self.length[sheet, right] = max(1, len(frames))
+                self.masks += [world_mask(frame) for frame in frames] or [None]
+        # Animation counts this far apart show the same frame on every sheet
+        self.cycle = game.Player.ANIMATION_DELAY * math.lcm(*self.length.ravel().tolist())
+
+    def frames(self, y_vel, jump_count, x_vel, right, animation):
+        """Index of the frame each agent shows, as update_sprite() chooses it."""
+        rising = np.where(jump_count == 1, self.JUMP, np.where(jump_count >= 2, self.DOUBLE_JUMP, self.IDLE))
+        level = np.where(y_vel > game.Player.GRAVITY * 1.5, self.FALL, np.where(x_vel != 0, self.RUN, self.IDLE))
+        sheet = np.where(y_vel < 0, rising, level)
+        right = right.astype(np.int64)
+        return self.start[sheet, right] + (animation // game.Player.ANIMATION_DELAY) % self.length[sheet, right]
+
+
+class Platforms:
+    """A level's moving and falling platforms, made by the game's own
+    classes. Moving platforms go round the same path whatever the players
+    do, so their position is a function of the tick (one period of it is
+    stored); falling platforms depend on who stood on them, so their state
+    is kept per agent by BatchSimulator."""
+
+    def __init__(self, level_data):
+        self.moving = []
+        nobody = game.Player(-10 ** 6, -10 ** 6, PLAYER_SIZE, PLAYER_SIZE) # Never carried
+        for platform_data in level_data.get("platforms", []):
+            params = platform_data[2] if len(platform_data) > 2 else {}
+            platform = game.MovingPlatform(platform_data[0], platform_data[1], **params)
+            path = []
+            while True: # Positions after each loop() until it is back at the start
+                platform.loop(nobody)
+                path.append(platform.rect.topleft)
+                if platform.distance == 0:
+                    break
+            self.moving.append((platform, np.array([platform.origin] + path)))
+        self.falling = [game.FallingPlatform(x, y) for x, y in level_data.get("falling_platforms", [])]
+        self.period = math.lcm(*[len(path) - 1 for _, path in self.moving]) if self.moving else 1
+        self.bottom = max([platform.rect.bottom for platform, _ in self.moving]
+                          + [platform.rect.bottom for platform in self.falling], default=0)
+        self.max_speed = max([np.abs(np.diff(path[:, 0])).max(initial=0) for _, path in self.moving], default=0)
+
+    def moving_position(self, index, tick):
+        """Where moving platform index is after the loop() of tick (0: at the start)."""
+        _, path = self.moving[index]
+        return tuple(path[0 if tick == 0 else (tick - 1) % (len(path) - 1) + 1])
+
+    def moving_range(self, index):
+        """The x span a moving platform covers on its path, (left, right)."""
+        platform, path = self.moving[index]
+        return int(path[:, 0].min()), int(path[:, 0].max()) + platform.rect.width
+
+
+# --- Vectorised Simulation ---
+class BatchSimulator:
+    """N players stepped together; state is one NumPy array per field, named
+    in FIELDS. stood_on, drop, drop_vel and respawn have a column per falling
+    platform: how long the agent has stood on it, how far it has fallen and
+    how fast, and the ticks until it comes back (0 while it's there)."""
+    FIELDS = ("x", "y", "x_vel", "y_vel", "fall_count", "jump_count", "right", "animation",
+              "stood_on", "drop", "drop_vel", "respawn")
+
+    def __init__(self, level_data, count, hitbox=HITBOX, fps=game.FPS):
+        self.terrain = Terrain.from_level(level_data)
+        self.platforms = Platforms(level_data)
+        self.sprites = SpriteTable()
+        goal_bottom = Goal(*level_data["goal"]).rect.bottom if "goal" in level_data else 0
+        self.bottom = max(game.HEIGHT, self.terrain.bottom, self.platforms.bottom, goal_bottom) # As Level.bottom
+        self.hitbox = hitbox
+        self.fps = fps
+        self.gravity = game.Player.GRAVITY
+        self.tick = 0 # Level loops so far, which is where the moving platforms are
+        self._overlaps = {} # Platform class -> frame x offset table, see _overlap()
+        start_x, start_y = level_data["player_start"]
+        falling = len(self.platforms.falling)
+        self.set_state(
+            np.full(count, start_x, dtype=np.int64), np.full(count, start_y, dtype=np.int64), # rect.x / rect.y
+            np.zeros(count, dtype=np.int64), np.zeros(count), np.zeros(count, dtype=np.int64),
+            np.zeros(count, dtype=np.int64), np.ones(count, dtype=bool), np.zeros(count, dtype=np.int64),
+            np.zeros((count, falling), dtype=np.int64), np.zeros((count, falling), dtype=np.int64),
+            np.zeros((count, falling)), np.zeros((count, falling), dtype=np.int64))
+
+    def set_state(self, *fields, tick=None):
+        """Replaces every agent's state with arrays in FIELDS order (equal
+        length), and the tick if given."""
+        for name, value in zip(self.FIELDS, fields, strict=True):
+            setattr(self, name, value)
+        self.count = len(self.x)
+        self.ambiguous = np.zeros(self.count, dtype=bool)
+        if tick is not None:
+            self.tick = tick
+
+    def fields(self):
+        return tuple(getattr(self, name) for name in self.FIELDS)
+
+    def carried(self, left, top, width):
+        """Agents Platform.carries() would move with a platform at (left, top)."""
+        bottom = self.y + PLAYER_SIZE
+        return ((self.y_vel >= 0) & (bottom - top >= 0) & (bottom - top <= game.Platform.LANDING_TOLERANCE)
+                & (self.x + PLAYER_SIZE > left) & (self.x < left + width))
+
+    def loop_platforms(self):
+        """Level.loop() for the platforms: moving ones first, then falling ones,
+        each carrying whoever stands on it."""
+        self.tick += 1
+        for index, (platform, _) in enumerate(self.platforms.moving):
+            old_x, old_y = self.platforms.moving_position(index, self.tick - 1)
+            new_x, new_y = self.platforms.moving_position(index, self.tick)
+            if (new_x, new_y) != (old_x, old_y):
+                carried = self.carried(old_x, old_y, platform.rect.width)
+                self.x = self.x + np.where(carried, new_x - old_x, 0)
+                self.y = self.y + np.where(carried, new_y - old_y, 0)
+
+        for k, platform in enumerate(self.platforms.falling):
+            origin_x, origin_y = platform.origin
+            top = origin_y + self.drop[:, k]
+            gone = self.respawn[:, k] > 0
+            back = gone & (self.respawn[:, k] == 1)
+            resting = ~gone & (self.drop_vel[:, k] == 0)
+            stood = resting & self.carried(origin_x, top, platform.rect.width)
+            self.stood_on[:, k] += stood
+            falling = ~gone & ~(resting & (self.stood_on[:, k] < platform.FALL_DELAY))
+            drop_vel = self.drop_vel[:, k] + np.where(falling, platform.GRAVITY, 0)
+            step = np.where(falling, drop_vel.astype(np.int64), 0) # int() of a positive speed
+            carried = (step != 0) & self.carried(origin_x, top, platform.rect.width)
+            self.y = self.y + np.where(carried, step, 0)
+            drop = self.drop[:, k] + step
+            off = falling & (origin_y + drop > game.HEIGHT)
+            self.respawn[:, k] = np.where(gone, self.respawn[:, k] - 1,
+                                          np.where(off, platform.RESPAWN_DELAY, 0))
+            self.drop[:, k] = np.where(back, 0, drop)
+            self.drop_vel[:, k] = np.where(back, 0, drop_vel)
+            self.stood_on[:, k] = np.where(back, 0, self.stood_on[:, k])
+
+    def platform_landing(self, frames, dy):
+        """Where collect_contacts() lands each agent on a platform: the
+        platform's top, or -1. Agents touching two platforms with different
+        tops are marked ambiguous (the game takes whichever the spatial
+        index returns first)."""
+        landing = np.full(self.count, -1, dtype=np.int64)
+        platforms = [(platform, *self.platforms.moving_position(index, self.tick), True)
+                     for index, (platform, _) in enumerate(self.platforms.moving)]
+        platforms += [(platform, platform.origin[0], platform.origin[1] + self.drop[:, k], self.respawn[:, k] == 0)
+                      for k, platform in enumerate(self.platforms.falling)]
+        for index, (platform, left, top, visible) in enumerate(platforms):
+            width, height = platform.rect.size
+            touching = (visible & (dy >= 0) & (self.x < left + width) & (self.x + PLAYER_SIZE > left)
+                        & (self.y < top + height) & (self.y + PLAYER_SIZE > top)
+                        & (self.y + PLAYER_SIZE - top <= dy + platform.LANDING_TOLERANCE))
+            agents = np.flatnonzero(touching)
+            if not len(agents):
+                continue
+            tops = np.broadcast_to(top, (self.count,))[agents]
+            hit = self._overlap(platform, frames[agents], left - self.x[agents], tops - self.y[agents])
+            agents, tops = agents[hit], tops[hit]
+            self.ambiguous[agents] |= (landing[agents] >= 0) & (landing[agents] != tops)
+            landing[agents] = tops
+        return landing
+
+    def _overlap(self, platform, frames, dx, dy):
+        """collide_mask() for each frame with the platform (dx, dy) from it,
+        worked out once per frame and offset and kept in a table per kind
+        of platform (-1 where not worked out yet)."""
+        width, height = platform.rect.size
+        table = self._overlaps.get(type(platform))
+        if table is None:
+            table = np.full((len(self.sprites.masks), PLAYER_SIZE + width, PLAYER_SIZE + height), -1, dtype=np.int8)
+            self._overlaps[type(platform)] = table
+        cells = (frames, dx + width, dy + height) # Touching keeps dx in (-width, 64), dy in (-height, 64)
+        hit = table[cells]
+        unknown = hit < 0
+        if unknown.any():
+            for frame, i, j in set(zip(*(cell[unknown].tolist() for cell in cells))):
+                mask = self.sprites.masks[frame]
+                table[frame, i, j] = mask is not None and mask.overlap(platform.mask, (i - width, j - height)) is not None
+            hit = table[cells]
+        return hit == 1
+
+    def step(self, left, right, jump):
+        """Advances every agent one tick. Inputs are boolean arrays of length N
+        (jump = space pressed this tick)."""
+        gravity = self.gravity
+
+        # Event handling: Player.jump()
+        jumping = jump & (self.jump_count < 2)
+        self.y_vel = np.where(jumping, -gravity * 8, self.y_vel)
+        self.jump_count = self.jump_count + jumping
+        self.fall_count = np.where(jumping & (self.jump_count == 1), 0, self.fall_count)
+        self.animation = np.where(jumping, 0, self.animation)
+
+        # Player.loop(): gravity, then move by last tick's x_vel, then update_sprite()
+        self.y_vel = self.y_vel + np.minimum(1, (self.fall_count / self.fps) * gravity)
+        self.x = self.x + self.x_vel
+        self.y = round_like_rect(self.y + self.y_vel)
+        self.fall_count = self.fall_count + 1
+        frames = self.sprites.frames(self.y_vel, self.jump_count, self.x_vel, self.right, self.animation)
+        self.animation = self.animation + 1
+
+        # Level.loop(): platforms move and carry
+        self.loop_platforms()
+
+        # move_player(): walk up to a wall in the pressed direction but not into it
+        vel = game.PLAYER_VEL
+        dx = np.where(right, vel, np.where(left, -vel, 0))
+        dy = self.y_vel
+        inset_x, inset_y, width, height = self.hitbox
+        wall_left, wall_right, floor, ceiling = self.terrain.contacts(
+            self.x + inset_x, self.y + inset_y, width, height, dx, dy)
+        self.x_vel = np.where(right, np.maximum(0, vel - wall_right),
+                              np.where(left, -np.maximum(0, vel - wall_left), 0))
+        turned = np.where(right, ~self.right, np.where(left, self.right, False)) # move_left() / move_right()
+        self.right = np.where(right, True, np.where(left, False, self.right))
+        self.animation = np.where(turned, 0, self.animation)
+
+        # resolve_vertical(): land on or bump into blocks, else land on a platform
+        landing = (floor > 0) & (dy > 0)
+        bumping = ~landing & (ceiling > 0) & (dy < 0)
+        self.y = np.where(landing, self.y - floor, np.where(bumping, self.y + ceiling, self.y))
+        self.y_vel = np.where(landing, 0.0, np.where(bumping, dy * -0.5, dy))
+        self.fall_count = np.where(landing | bumping, 0, self.fall_count)
+        self.jump_count = np.where(landing, 0, self.jump_count)
+        if self.platforms.moving or self.platforms.falling:
+            top = np.where(landing | bumping, -1, self.platform_landing(frames, dy))
+            on_platform = top >= 0
+            self.y = np.where(on_platform, top - PLAYER_SIZE, self.y)
+            self.y_vel = np.where(on_platform, 0.0, self.y_vel)
+            self.fall_count = np.where(on_platform, 0, self.fall_count)
+            self.jump_count = np.where(on_platform, 0, self.jump_count)
+
+    def state(self):
+        return {
+            "x": self.x.copy(), "y": self.y.copy(), "y_vel": self.y_vel.copy(),
+            "fall_count": self.fall_count.copy(), "jump_count": self.jump_count.copy(),
+        }
+
+    def run(self, left, right, jump):
+        """Runs whole input streams of shape (ticks, N); returns positions
+        of shape (ticks, N, 2)."""
+        ticks = left.shape[0]
+        positions = np.empty((ticks, self.count, 2), dtype=np.int64)
+        for tick in range(ticks):
+            self.step(left[tick], right[tick], jump[tick])
+            positions[tick, :, 0] = self.x
+            positions[tick, :, 1] = self.y
+        return positions
+
+
+def random_inputs(ticks, count, seed=0, hold=12):
+    """Input streams where each agent holds a direction for a while and
+    presses jump now and then."""
+    rng = np.random.default_rng(seed)
+    changes = max(1, ticks // hold + 1)
+    direction = rng.integers(-1, 2, size=(changes, count)).repeat(hold, axis=0)[:ticks]
+    jump = rng.random((ticks, count)) < 0.04
+    return direction < 0, direction > 0, jump
+
+
+# --- Scalar Reference ---
+def blocks_level(level_data):
+    """A Level with only the blocks and platforms of level_data, what the batch simulator collides with."""
+    return game.Level({key: level_data[key] for key in ("background", "blocks", "platforms", "falling_platforms")
+                       if key in level_data})
+
+
+def scalar_step(player, level, left, right, jump):
+    """One tick of the real Player class, Level.loop() and move_player(), in
+    the order Simulation.step() runs them."""
+    if jump:
+        player.jump() # Player.jump() ignores a third jump itself
+    player.loop(game.FPS)
+    level.loop(player)
+    move_player(player, level, {pygame.K_LEFT: bool(left), pygame.K_RIGHT: bool(right)})
+
+
+def cross_check(level_index=0, count=16, ticks=600, seed=0):
+    """Runs count agents through the batch simulator and through Player,
+    Level.loop() and move_player(); returns the first mismatch as (tick,
+    agent, field, batch value, scalar value) or None. Each Player gets its
+    own Level, as each agent has its own falling platforms. Agents the
+    batch marks ambiguous aren't compared from then on."""
+    level_data = game.level_definitions[level_index]
+    left, right, jump = random_inputs(ticks, count, seed)
+    batch = BatchSimulator(level_data, count)
+    levels = [blocks_level(level_data) for _ in range(count)]
+    start = level_data["player_start"]
+    players = [game.Player(start[0], start[1], PLAYER_SIZE, PLAYER_SIZE) for _ in range(count)]
+    ambiguous = np.zeros(count, dtype=bool)
+
+    for tick in range(ticks):
+        batch.step(left[tick], right[tick], jump[tick])
+        ambiguous |= batch.ambiguous
+        for i, (player, level) in enumerate(zip(players, levels)):
+            scalar_step(player, level, left[tick, i], right[tick, i], jump[tick, i])
+            if ambiguous[i]:
+                continue
+            scalar = {
+                "x": player.rect.x, "y": player.rect.y, "y_vel": player.y_vel,
+                "fall_count": player.fall_count, "jump_count": player.jump_count,
+                "right": player.direction == "right", "animation": player.animation_count,
+            }
+            for field, value in scalar.items():
+                vector_value = getattr(batch, field)[i]
+                if vector_value != value:
+                    return tick, i, field, vector_value, value
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched player physics simulation")
+    parser.add_argument("--level", type=int, default=0)
+    parser.add_argument("--agents", type=int, default=5000)
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", type=int, default=16, help="agents to cross-check against Player (0 to skip)")
+    args = parser.parse_args()
+    configure(muted=True)
+
+    level_data = game.level_definitions[args.level]
+    left, right, jump = random_inputs(args.ticks, args.agents, args.seed)
+    simulator = BatchSimulator(level_data, args.agents)
+    started = time.perf_counter()
+    positions = simulator.run(left, right, jump)
+    elapsed = time.perf_counter() - started
+    print(f"Level {args.level + 1}: {args.agents} agents x {args.ticks} ticks in {elapsed:.2f}s "
+          f"({args.agents * args.ticks / elapsed:,.0f} agent-ticks/s)")
+    landed = (positions[-1, :, 1] < game.HEIGHT).sum()
+    print(f"{landed} agents still on the map after {args.ticks} ticks")
+
+    if args.check:
+        mismatch = cross_check(args.level, args.check, args.ticks, args.seed)
+        if mismatch:
+            tick, agent, field, batch_value, scalar_value = mismatch
+            print(f"Mismatch at tick {tick}, agent {agent}: {field} batch={batch_value} scalar={scalar_value}")
+            sys.exit(1)
+        print(f"Cross-check OK: {args.check} agents match Player for {args.ticks} ticks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""The platformer engine shared by the games in this repo.
+
+    config        pygame setup, the window and the global constants
+    assets        image and sprite sheet loading, parallel preloading
+    audio         synthesized sound effects and streamed music
+    adaptive      quality tiers (read the current one as adaptive.quality)
+    spatial       SpatialHash
+    entities      Player, Block, Goal and platforms
+    traps         TrapSystem and the trap kinds
+    collectibles  FruitField
+    enemies       EnemySystem and the enemy kinds
+    background    parallax backgrounds
+    rendering     draw_world() and the scene surfaces
+    collision     player collision and keyboard movement
+    level         Level, built from level_entries()
+    ghosts, analytics, memory, telemetry
+
+Importing them opens nothing: a game parses its flags and calls
+config.configure() to open the window before anything loads art. Art is
+loaded the first time something needs it (the first Player, a level's traps,
+fruit and enemies), so a game can preload it (assets.preload_assets) after
+configuring.
+"""
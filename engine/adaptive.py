@@ -0,0 +1,96 @@
+"""Quality tiers and the governor that steps between them on slow frames."""
+from collections import deque, namedtuple
+
+from engine.config import FPS
+
+__all__ = ["QualityTier", "QUALITY_TIERS", "QualityGovernor", "report_quality_change",
+           "quality_tiers", "set_render_scale"]
+
+# --- Adaptive Quality ---
+# QualityGovernor watches how long main() takes per frame and swaps the
+# module-level `quality` tier when the frame budget is missed. The drawing
+# code reads `quality` every frame; the simulation never depends on it.
+# set_tier() rebinds the name, so other modules read it as adaptive.quality
+# and it is left out of `from engine.adaptive import *`.
+
+QualityTier = namedtuple("QualityTier", "name particles animation_step render_scale background")
+
+
+def quality_tiers(render_scale):
+    """The tiers, best first, for a window drawn at render_scale."""
+    return [
+        QualityTier("full", True, 1, render_scale, True),
+        QualityTier("slow effects", False, 3, render_scale, True), # No sparkles; fire away from the player shows every 3rd frame
+        QualityTier("half resolution", False, 3, 2, True),
+        QualityTier("flat background", False, 3, 2, False), # One fill instead of the tiles
+    ]
+
+
+QUALITY_TIERS = quality_tiers(1)
+quality = QUALITY_TIERS[0]
+
+
+def set_render_scale(render_scale):
+    """Rebuilds the tiers for config.configure() and starts from the best."""
+    global quality
+    QUALITY_TIERS[:] = quality_tiers(render_scale)
+    quality = QUALITY_TIERS[0]
+
+
+class QualityGovernor:
+    """Steps down a tier when the average frame time misses the budget and
+    back up after a stretch of headroom. on_change(old, new) is called with
+    the two QualityTiers whenever the tier changes."""
+    WINDOW = 30 # Frames averaged per decision
+    HEADROOM = 0.6 # Step up when frames take less than this share of the budget...
+    UP_DELAY = FPS * 2 # ...for this many frames in a row
+
+    def __init__(self, on_change=None, budget_ms=1000 / FPS):
+        self.on_change = on_change
+        self.budget_ms = budget_ms
+        self.tier = 0
+        self.times = deque(maxlen=self.WINDOW)
+        self.calm = 0 # Frames in a row with headroom
+        self.up_delay = self.UP_DELAY
+        self.frames_since_up = None
+
+    def record(self, frame_ms):
+        """Takes the time one frame spent working (not waiting for the clock)."""
+        self.times.append(frame_ms)
+        if self.frames_since_up is not None:
+            self.frames_since_up += 1
+        if len(self.times) < self.WINDOW:
+            return
+        average = sum(self.times) / self.WINDOW
+        if average > self.budget_ms:
+            if self.tier + 1 < len(QUALITY_TIERS):
+                if self.frames_since_up is not None and self.frames_since_up < self.WINDOW * 2:
+                    # Stepping up didn't hold: wait longer before trying again
+                    self.up_delay = min(self.up_delay * 2, self.UP_DELAY * 16)
+                self.set_tier(self.tier + 1)
+            self.calm = 0
+        elif average < self.budget_ms * self.HEADROOM:
+            self.calm += 1
+            if self.calm >= self.up_delay and self.tier > 0:
+                self.set_tier(self.tier - 1)
+                self.frames_since_up = 0
+        else:
+            self.calm = 0
+
+    def reset(self):
+        """Forgets the frames so far, e.g. after a level load stalled one."""
+        self.times.clear()
+        self.calm = 0
+
+    def set_tier(self, tier):
+        global quality
+        old = quality
+        self.tier = tier
+        quality = QUALITY_TIERS[tier]
+        self.reset() # Judge the new tier on its own frames
+        if self.on_change and quality is not old:
+            self.on_change(old, quality)
+
+
+def report_quality_change(old, new):
+    print(f"Quality: {old.name} -> {new.name}")
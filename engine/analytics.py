@@ -0,0 +1,49 @@
+"""Damage, death and goal events, batched into fixed-size records."""
+import os
+import struct
+from os.path import join
+
+# --- Analytics Events ---
+# With --analytics, the simulation logs where the player takes damage, dies
+# and reaches the goal. Events are packed into a fixed bytearray as they
+# happen and the whole buffer is appended to the file (EVENT_FILE for a bare
+# --analytics) in one write when it fills up, on every level load and when
+# the game ends. heatmap.py turns the file into per-level heatmaps.
+
+EVENT_DIR = "analytics"
+EVENT_VERSION = 1 # Bump when EVENT_RECORD or EVENT_CAUSES change, old files are left alone
+EVENT_FILE = join(EVENT_DIR, f"events_v{EVENT_VERSION}.bin")
+EVENT_RECORD = struct.Struct("<BBHiiI") # kind, cause, level index, x, y, tick in the level
+EVENT_KINDS = ["damage", "death", "goal"]
+EVENT_DAMAGE, EVENT_DEATH, EVENT_GOAL = range(len(EVENT_KINDS))
+EVENT_CAUSES = ["none", "other", "fall", "enemy", "fire", "spike", "saw", "spiked_ball", "spike_head", "rock_head"]
+_cause_codes = {cause: code for code, cause in enumerate(EVENT_CAUSES)}
+_cause_codes[None] = 0
+
+
+class EventLog:
+    """Preallocated buffer of EVENT_RECORDs, flushed to path in bulk."""
+    CAPACITY = 4096 # Records per write
+
+    def __init__(self, path=EVENT_FILE):
+        self.path = path
+        self.buffer = bytearray(EVENT_RECORD.size * self.CAPACITY)
+        self.count = 0
+
+    def log(self, kind, cause, level_index, x, y, tick):
+        EVENT_RECORD.pack_into(self.buffer, self.count * EVENT_RECORD.size, kind,
+                               _cause_codes.get(cause, 1), level_index, x, y, tick)
+        self.count += 1
+        if self.count == self.CAPACITY:
+            self.flush()
+
+    def flush(self):
+        if not self.count:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(memoryview(self.buffer)[:self.count * EVENT_RECORD.size])
+        except OSError as e:
+            print(f"Error writing analytics events to {self.path}: {e}")
+        self.count = 0 # Dropped rather than kept growing if the disk is unwritable
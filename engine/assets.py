@@ -0,0 +1,198 @@
+"""Image loading: sprite sheets, tiles and art scaled for RENDER_SCALE, cached per path."""
+import os
+import io
+import pygame
+from multiprocessing.pool import ThreadPool
+from os import listdir
+from os.path import isfile, join
+
+from engine import config
+from engine.config import HEIGHT, WIDTH
+
+# --- Asset Loading Functions ---
+
+def scale_art(surface):
+    return pygame.transform.scale2x(surface) if config.ART_SCALE == 2 else surface
+
+def world_size(surface):
+    """Size of a loaded image in world pixels."""
+    width, height = surface.get_size()
+    return width * config.RENDER_SCALE, height * config.RENDER_SCALE
+
+def world_mask(surface):
+    """Collision mask of a loaded image in world pixels."""
+    mask = pygame.mask.from_surface(surface)
+    if config.RENDER_SCALE != 1:
+        mask = mask.scale(world_size(surface))
+    return mask
+
+def flip(sprites):
+    return [pygame.transform.flip(sprite, True, False) for sprite in sprites]
+
+def load_sprite_sheets(dir1, dir2, width, height, direction=False):
+    path = join("assets", dir1, dir2)
+    if not os.path.exists(path):
+        print(f"Warning: Path not found {path}")
+        return {} # Return empty if path doesn't exist
+    try:
+        images = [f for f in listdir(path) if isfile(join(path, f)) and f.lower().endswith(".png")]
+    except FileNotFoundError:
+        print(f"Error: Directory not found: {path}")
+        return {}
+
+
+    all_sprites = {}
+
+    for image in images:
+        try:
+            sprite_sheet = load_image(join(path, image))
+
+            sprites = []
+            sheet_width = sprite_sheet.get_width()
+            sheet_height = sprite_sheet.get_height() # Added for potential vertical spritesheets
+
+            # Assuming sprites are arranged horizontally for now
+            for i in range(sheet_width // width):
+                surface = pygame.Surface((width, height), pygame.SRCALPHA, 32)
+                rect = pygame.Rect(i * width, 0, width, height)
+                surface.blit(sprite_sheet, (0, 0), rect)
+                sprites.append(scale_art(surface)) # Scale up 2x (unless rendering at native size)
+
+            sprite_name = image.replace(".png", "")
+            if direction:
+                all_sprites[sprite_name + "_right"] = sprites
+                all_sprites[sprite_name + "_left"] = flip(sprites)
+            else:
+                all_sprites[sprite_name] = sprites
+        except pygame.error as e:
+            print(f"Error loading image {join(path, image)}: {e}")
+        except Exception as e:
+             print(f"An unexpected error occurred loading {join(path, image)}: {e}")
+
+
+    return all_sprites
+
+# Function to load a single scaled image (scale_factor is in world pixels)
+def load_scaled_image(path, scale_factor=2):
+    scale_factor /= config.RENDER_SCALE
+    try:
+        image = load_image(path)
+        if scale_factor == 1:
+            return image
+        size = image.get_size()
+        scaled_size = (int(size[0] * scale_factor), int(size[1] * scale_factor))
+        return pygame.transform.scale(image, scaled_size)
+    except pygame.error as e:
+        print(f"Error loading or scaling image {path}: {e}")
+        # Return a placeholder surface if loading fails
+        placeholder = pygame.Surface((int(32 * scale_factor), int(32 * scale_factor)), pygame.SRCALPHA)
+        placeholder.fill((255, 0, 255)) # Bright pink to indicate missing asset
+        return placeholder
+    except Exception as e:
+        print(f"An unexpected error occurred loading {path}: {e}")
+        placeholder = pygame.Surface((int(32 * scale_factor), int(32 * scale_factor)), pygame.SRCALPHA)
+        placeholder.fill((255, 0, 255))
+        return placeholder
+
+
+def get_block(size):
+    path = join("assets", "Terrain", "Terrain.png")
+    try:
+        image = load_image(path)
+        # Use a different block appearance (e.g., the one at 96, 64 in the spritesheet)
+        surface = pygame.Surface((size, size), pygame.SRCALPHA, 32)
+        # Coordinates might need adjustment based on the actual Terrain.png layout
+        # rect = pygame.Rect(96, 0, size, size) # Original brown block
+        rect = pygame.Rect(192, 0, size, size) # Example: Trying a different terrain piece if available
+        surface.blit(image, (0, 0), rect)
+        return scale_art(surface)
+    except pygame.error as e:
+        print(f"Error loading block from {path}: {e}")
+        surface = pygame.Surface((size * config.ART_SCALE, size * config.ART_SCALE), pygame.SRCALPHA)
+        surface.fill((100, 100, 100)) # Grey placeholder
+        return surface
+    except IndexError:
+         print(f"Error: Rect coordinates out of bounds for {path}. Using default block.")
+         surface = pygame.Surface((size * config.ART_SCALE, size * config.ART_SCALE), pygame.SRCALPHA)
+         surface.fill((100, 100, 100))
+         return surface
+
+
+# --- Asset Preloading ---
+# Decoding PNGs is most of the time spent loading. preload_assets() reads and
+# decodes a list of files on a thread pool (pygame.image.load() from the
+# file's bytes) and converts each result on the calling thread as it comes
+# in. The loaders take their image from _preloaded through load_image() when
+# one is waiting and fall back to reading the file themselves, so a file
+# missing from a manifest only costs time. level_manifest() lists what a
+# level needs that isn't loaded yet.
+
+ASSET_WORKERS = max(2, min(8, os.cpu_count() or 1))
+_preloaded = {} # Normalised path -> converted Surface, used up by load_image()
+
+
+def _decode_asset(path):
+    """Pool job: (path, unconverted Surface or None)."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        return path, pygame.image.load(io.BytesIO(data), path) # The name tells pygame the format
+    except (OSError, pygame.error) as e:
+        print(f"Error preloading {path}: {e}")
+        return path, None
+
+
+def preload_assets(paths, progress=None):
+    """Decodes paths in parallel into _preloaded; progress(done, total) is
+    called on this thread after each one. Returns how many were decoded."""
+    paths = [path for path in dict.fromkeys(map(os.path.normpath, paths)) if path not in _preloaded and isfile(path)]
+    if not paths:
+        return 0
+    pool = ThreadPool(min(ASSET_WORKERS, len(paths)))
+    try:
+        for done, (path, image) in enumerate(pool.imap_unordered(_decode_asset, paths), 1):
+            if image is not None:
+                _preloaded[path] = image.convert_alpha() # Needs the display, so not on the pool
+            if progress:
+                progress(done, len(paths))
+    finally:
+        pool.close()
+        pool.join()
+    return len(paths)
+
+
+def discard_preloaded():
+    """Drops preloaded images nothing asked for (e.g. a cache already had them)."""
+    _preloaded.clear()
+
+
+def load_image(path, alpha=True):
+    """pygame.image.load(path) converted for the display (without per-pixel
+    alpha if alpha is False), using the preloaded copy if there is one."""
+    image = _preloaded.pop(os.path.normpath(path), None)
+    if image is None:
+        image = pygame.image.load(path)
+        return image.convert_alpha() if alpha else image.convert()
+    return image if alpha else image.convert()
+
+
+def asset_files(*parts):
+    """The PNGs in a folder under assets/, for manifests."""
+    folder = join("assets", *parts)
+    try:
+        return [join(folder, name) for name in listdir(folder) if name.lower().endswith(".png")]
+    except OSError:
+        return []
+
+
+def draw_loading_screen(done, total):
+    """preload_assets() progress callback: a bar across the window."""
+    pygame.event.pump() # Keep the window responsive
+    config.window.fill((0, 0, 0))
+    bar = pygame.Rect(WIDTH // 4, HEIGHT // 2, WIDTH // 2, 24)
+    pygame.draw.rect(config.window, (255, 255, 255), bar, 2)
+    filled = bar.inflate(-8, -8)
+    filled.width = filled.width * done // total
+    config.window.fill((255, 255, 255), filled)
+    config.window.blit(config.FONT.render("Loading...", True, (255, 255, 255)), (bar.x, bar.y - 50))
+    pygame.display.update()
@@ -0,0 +1,225 @@
+"""Synthesized sound effects, streamed music and the mixer channel allocator."""
+import os
+import random
+import wave
+import pygame
+from array import array
+from collections import namedtuple
+from os.path import isfile, join
+
+# --- Audio ---
+# There are no sound files in assets, so every effect is synthesized into a
+# pygame Sound once, the first time a level loads, and kept in AudioEngine's
+# bank. Effects play on a fixed pool of channels; each category has a voice
+# limit and a new sound steals the weakest voice (lowest priority, then
+# oldest) when it runs out. play() only indexes preallocated lists and
+# starts a channel, so it is safe to call from the simulation.
+# Level music is synthesized to a WAV under MUSIC_DIR once and streamed by
+# pygame.mixer.music. The module-level `audio` stays silent until start()
+# opens the mixer; set SDL_AUDIODRIVER=dummy to run it without a sound card.
+
+MUSIC_DIR = join(".cache", "music")
+MUSIC_VERSION = 1 # Bump when compose_music() changes to ignore old files
+MUSIC_RATE = 22050
+MUSIC_TEMPO = 132 # Beats per minute
+MUSIC_VOLUME = 0.35
+
+Effect = namedtuple("Effect", "name category priority volume notes") # notes: (seconds, start_hz, end_hz, shape)
+
+SOUND_CATEGORIES = ["player", "world", "events"]
+VOICE_LIMITS = [2, 4, 2] # Per category, adds up to the channel pool
+
+EFFECTS = [
+    Effect("jump", "player", 2, 0.25, [(0.10, 320, 640, "square")]),
+    Effect("double_jump", "player", 2, 0.25, [(0.06, 480, 720, "square"), (0.08, 720, 1080, "square")]),
+    Effect("land", "player", 1, 0.5, [(0.06, 160, 60, "triangle")]),
+    Effect("hit", "player", 3, 0.3, [(0.04, 0, 0, "noise"), (0.16, 300, 80, "square")]),
+    Effect("bounce", "world", 2, 0.5, [(0.18, 200, 800, "triangle")]),
+    Effect("boost", "world", 2, 0.2, [(0.12, 600, 1200, "square")]),
+    Effect("crumble", "world", 1, 0.2, [(0.25, 0, 0, "noise")]),
+    Effect("stomp", "world", 2, 0.3, [(0.08, 500, 150, "square")]),
+    Effect("fruit", "world", 1, 0.15, [(0.05, 988, 988, "square"), (0.10, 1319, 1319, "square")]),
+    Effect("goal", "events", 3, 0.25, [(0.1, 523, 523, "square"), (0.1, 659, 659, "square"),
+                                       (0.1, 784, 784, "square"), (0.3, 1047, 1047, "square")]),
+]
+(SOUND_JUMP, SOUND_DOUBLE_JUMP, SOUND_LAND, SOUND_HIT, SOUND_BOUNCE, SOUND_BOOST,
+ SOUND_CRUMBLE, SOUND_STOMP, SOUND_FRUIT, SOUND_GOAL) = range(len(EFFECTS))
+
+
+def synth_note(rate, count, start_hz, end_hz, shape, volume, fade=None):
+    """count samples (floats in -1..1) of one note sliding from start_hz to
+    end_hz. Fades out over the whole note, or just the last fade samples."""
+    noise = random.Random(count)
+    samples = [0.0] * count
+    phase = 0.0
+    for i in range(count):
+        t = i / count
+        if shape == "noise":
+            value = noise.uniform(-1, 1)
+        else:
+            phase = (phase + (start_hz + (end_hz - start_hz) * t) / rate) % 1.0
+            value = (1 if phase < 0.5 else -1) if shape == "square" else 4 * abs(phase - 0.5) - 1
+        envelope = 1 - t if fade is None else min(1, (count - i) / fade)
+        samples[i] = value * volume * envelope
+    return samples
+
+
+def pcm_samples(samples, channels=1):
+    """Floats to signed 16-bit samples, repeated for each output channel."""
+    mono = array("h", (int(max(-1, min(1, value)) * 32767) for value in samples))
+    if channels == 1:
+        return mono
+    pcm = array("h", bytes(len(mono) * 2 * channels))
+    for channel in range(channels):
+        pcm[channel::channels] = mono
+    return pcm
+
+
+def synth_effect(effect, rate, channels):
+    samples = []
+    for seconds, start_hz, end_hz, shape in effect.notes:
+        samples += synth_note(rate, int(rate * seconds), start_hz, end_hz, shape, effect.volume)
+    return pygame.mixer.Sound(buffer=pcm_samples(samples, channels).tobytes())
+
+
+def compose_music(level_index, rate=MUSIC_RATE):
+    """A short loop for a level: a bass line on I-vi-IV-V and a pentatonic
+    lead picked at random, seeded by the level so it's always the same tune."""
+    rng = random.Random(level_index)
+    root = 110 * 2 ** (rng.choice((0, 2, 3, 5, 7)) / 12)
+    eighth = int(rate * 30 / MUSIC_TEMPO)
+    notes = {} # The same few notes come up again and again
+    def note(hz, length, shape, volume):
+        key = (hz, length, shape)
+        if key not in notes:
+            notes[key] = synth_note(rate, length, hz, hz, shape, volume, fade=rate // 100)
+        return notes[key]
+
+    bass, lead = [], []
+    scale = [0, 2, 4, 7, 9, 12, 14, 16, 19, 21]
+    degree = 2
+    for chord in (0, 9, 5, 7) * 2: # One bar each
+        for beat in range(4):
+            bass += note(root * 2 ** ((chord + (7 if beat % 2 else 0)) / 12), eighth * 2, "triangle", 0.25)
+        for _ in range(8):
+            degree = max(0, min(len(scale) - 1, degree + rng.choice((-2, -1, 0, 1, 1, 2))))
+            if rng.random() < 0.2:
+                lead += [0.0] * eighth # Rest
+            else:
+                lead += note(root * 4 * 2 ** (scale[degree] / 12), eighth, "square", 0.12)
+    return [a + b for a, b in zip(bass, lead)]
+
+
+def music_path(level_index):
+    """The level's music file, written the first time it is asked for."""
+    path = join(MUSIC_DIR, f"level_{level_index + 1}_v{MUSIC_VERSION}.wav")
+    if not isfile(path):
+        os.makedirs(MUSIC_DIR, exist_ok=True)
+        with wave.open(path + ".tmp", "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(MUSIC_RATE)
+            out.writeframes(pcm_samples(compose_music(level_index)).tobytes())
+        os.replace(path + ".tmp", path) # Never leave a half-written track behind
+    return path
+
+
+class AudioEngine:
+    """Sound bank, channel pool and level music. Every method is a no-op
+    until start() has opened the mixer."""
+
+    def __init__(self):
+        self.enabled = False
+        self.rate = self.output_channels = None # The mixer's, once started
+        self.sounds = [] # Bank: one Sound per EFFECTS entry
+        # Per effect
+        self.effect_category = [SOUND_CATEGORIES.index(effect.category) for effect in EFFECTS]
+        self.effect_priority = [effect.priority for effect in EFFECTS]
+        # Per channel in the pool
+        self.channels = []
+        self.voice_category = []
+        self.voice_priority = []
+        self.voice_started = [] # Value of plays when the voice started, for oldest first
+        self.plays = 0
+        self.music_level = None
+
+    def start(self):
+        """Opens the mixer; returns False (and stays silent) without one."""
+        try:
+            pygame.mixer.init()
+        except pygame.error as e:
+            print(f"Warning: No audio ({e}), playing without sound")
+            return False
+        self.rate, _, self.output_channels = pygame.mixer.get_init()
+        pool = sum(VOICE_LIMITS)
+        pygame.mixer.set_num_channels(pool)
+        self.channels = [pygame.mixer.Channel(i) for i in range(pool)]
+        self.voice_category = [-1] * pool
+        self.voice_priority = [-1] * pool
+        self.voice_started = [0] * pool
+        self.enabled = True
+        return True
+
+    def load_level(self, level_index):
+        """Builds the sound bank on the first level and switches the music."""
+        if not self.enabled:
+            return
+        if not self.sounds:
+            self.sounds = [synth_effect(effect, self.rate, self.output_channels) for effect in EFFECTS]
+        if level_index == self.music_level:
+            return # Restarting the same level keeps the track going
+        try:
+            pygame.mixer.music.load(music_path(level_index))
+            pygame.mixer.music.set_volume(MUSIC_VOLUME)
+            pygame.mixer.music.play(-1)
+            self.music_level = level_index
+        except (pygame.error, OSError) as e:
+            print(f"Warning: Could not play music for level {level_index + 1}: {e}")
+
+    def play(self, effect):
+        if not self.enabled or not self.sounds:
+            return
+        category = self.effect_category[effect]
+        priority = self.effect_priority[effect]
+        voices = 0 # Still playing in this category
+        free = quietest = weakest = -1 # quietest: weakest voice in the category
+        for i in range(len(self.channels)):
+            if not self.channels[i].get_busy():
+                self.voice_category[i] = self.voice_priority[i] = -1
+                if free < 0:
+                    free = i
+                continue
+            if self.voice_category[i] == category:
+                voices += 1
+                if quietest < 0 or self._weaker(i, quietest):
+                    quietest = i
+            if weakest < 0 or self._weaker(i, weakest):
+                weakest = i
+
+        if voices >= VOICE_LIMITS[category]:
+            channel = quietest
+        elif free >= 0:
+            channel = free
+        else:
+            channel = weakest
+        if channel < 0 or self.voice_priority[channel] > priority:
+            return # Everything it could replace matters more
+        self.plays += 1
+        self.voice_category[channel] = category
+        self.voice_priority[channel] = priority
+        self.voice_started[channel] = self.plays
+        self.channels[channel].play(self.sounds[effect])
+
+    def _weaker(self, a, b):
+        if self.voice_priority[a] != self.voice_priority[b]:
+            return self.voice_priority[a] < self.voice_priority[b]
+        return self.voice_started[a] < self.voice_started[b]
+
+    def stop(self):
+        if self.enabled:
+            pygame.mixer.stop()
+            pygame.mixer.music.stop()
+            self.music_level = None
+
+
+audio = AudioEngine()
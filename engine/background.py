@@ -0,0 +1,91 @@
+"""Parallax backgrounds built from pre-tiled strips, shared between levels."""
+import math
+import pygame
+from os.path import join
+
+from engine import config
+from engine.config import HEIGHT, WIDTH
+from engine.assets import load_image, world_size
+
+# --- Background Handling ---
+# The background is a stack of parallax layers, far to near. Each layer is
+# drawn once into a strip at least a screen wide whose ends join up, so a
+# frame costs at most two blits per layer wherever the camera is: the strip
+# shifted by offset_x * factor, and its start again after its end.
+TILE_SCROLL = 0.25 # The level's background tile
+HILLS_SCROLL = 0.5 # Hills in a darker shade of it, in front
+HILLS_HEIGHT = 240
+_backgrounds = {} # name -> (layers, tile image), shared by every level using it
+
+
+def get_background(name):
+    """The background tile (art pixels), or a plain fallback if it can't be loaded."""
+    try:
+        path = join("assets", "Background", name)
+        image = load_image(path, alpha=False) # Use convert for performance
+        if image.get_width() == 0 or image.get_height() == 0:
+            print(f"Warning: Background image {name} has zero dimension.")
+        else:
+            return image
+    except pygame.error as e:
+        print(f"Error loading background {name}: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred loading background {name}: {e}")
+    # Return a plain color background as fallback
+    fallback_surface = pygame.Surface((64, 64))
+    fallback_surface.fill((100, 100, 200)) # Blueish fallback
+    return fallback_surface
+
+
+def tile_surface(image, size):
+    """A size surface covered with copies of image, starting at the top-left."""
+    surface = pygame.Surface(size).convert()
+    width, height = image.get_size()
+    surface.blits([(image, (x, y)) for x in range(0, size[0], width) for y in range(0, size[1], height)],
+                  doreturn=False)
+    return surface
+
+
+class ParallaxLayer:
+    """A strip (art pixels) repeated sideways, scrolled at factor times the camera."""
+
+    def __init__(self, strip, factor, y=0):
+        self.strip = strip
+        self.factor = factor
+        self.y = y
+        self.width = world_size(strip)[0]
+
+    def draw(self, target, offset_x, factor=None):
+        x = -(int(offset_x * (self.factor if factor is None else factor)) % self.width)
+        target.blit(self.strip, (x, self.y))
+        if x + self.width < WIDTH:
+            target.blit(self.strip, (x + self.width, self.y))
+
+
+def tile_layer(image, factor):
+    # A whole number of tiles, so the strip repeats without a seam
+    width = math.ceil(WIDTH // config.RENDER_SCALE / image.get_width()) * image.get_width()
+    return ParallaxLayer(tile_surface(image, (width, HEIGHT // config.RENDER_SCALE)), factor)
+
+
+def hills_layer(color, factor, height=HILLS_HEIGHT):
+    """Rolling hills along the bottom of the screen. The sines have whole
+    periods across the strip, so its two ends meet."""
+    width, art_height = WIDTH // config.RENDER_SCALE, height // config.RENDER_SCALE
+    strip = pygame.Surface((width, art_height), pygame.SRCALPHA)
+    points = [(0, art_height)]
+    for x in range(0, width + 1, 4):
+        t = x / width * 2 * math.pi
+        points.append((x, art_height * (0.45 - 0.25 * math.sin(t * 2) - 0.15 * math.sin(t * 5 + 1))))
+    points.append((width, art_height))
+    pygame.draw.polygon(strip, color, points)
+    return ParallaxLayer(strip, factor, HEIGHT - height)
+
+
+def background_layers(name):
+    """(parallax layers far to near, tile image) for a background name."""
+    if name not in _backgrounds:
+        image = get_background(name)
+        shade = [round(c * 0.7) for c in pygame.transform.average_color(image)[:3]]
+        _backgrounds[name] = ([tile_layer(image, TILE_SCROLL), hills_layer(shade, HILLS_SCROLL)], image)
+    return _backgrounds[name]
@@ -0,0 +1,150 @@
+"""Fruit, stored as parallel arrays with a spatial hash for pickups."""
+import pygame
+from array import array
+
+from engine import adaptive
+from engine import config
+from engine.config import HEIGHT, WIDTH
+from engine.assets import load_sprite_sheets
+from engine.audio import SOUND_FRUIT, audio
+from engine.spatial import SpatialHash
+
+# --- Collectibles ---
+FRUIT_NAMES = ["Apple", "Bananas", "Cherries", "Kiwi", "Melon", "Orange", "Pineapple", "Strawberry"]
+
+
+def fruit_row(name, x, y, count, spacing=64):
+    """Level helper: count fruits in a horizontal line starting at (x, y)."""
+    return [(name, x + i * spacing, y) for i in range(count)]
+
+
+class FruitField:
+    """Every fruit in a level.
+
+    Positions live in flat arrays and are filed once in a SpatialHash, so
+    pickup checks and drawing only look at the fruit near the player or on
+    screen. Which fruits are collected is a single integer used as a bitset
+    (bit i set = fruit i picked up): snapshot() and restore() just hand the
+    integer around, and collected fruit are skipped rather than removed.
+    Endless mode does remove fruit (remove()), and add() reuses their slots,
+    so the bitset only spans the fruit alive at once."""
+    ANIMATION_DELAY = 3
+    HITBOX_INSET = 32 # Fruit art only fills the middle of its 64x64 frame
+    _sprites = None # Shared by every level
+
+    def __init__(self, fruits):
+        if FruitField._sprites is None:
+            FruitField._sprites = load_sprite_sheets("Items", "Fruits", 32, 32)
+        self.frames = [self._sprites.get(name) or [self._placeholder()] for name in FRUIT_NAMES]
+        self.collected_frames = self._sprites.get("Collected") or [self._placeholder()]
+
+        self.kind = bytearray() # Index into FRUIT_NAMES
+        self.x = array("i")
+        self.y = array("i")
+        self.index = SpatialHash()
+        self.free = [] # Slots of removed fruit, for add() to reuse
+        self.collected = 0 # Bitset of picked up fruit
+        self.count = 0 # Number of set bits, kept alongside so the HUD doesn't recount
+        for name, x, y in fruits:
+            self.add(name, x, y)
+
+        self.tick = 0
+        self.effects = [] # [x, y, ticks] "Collected" animations still playing
+
+    @staticmethod
+    def _placeholder():
+        placeholder = pygame.Surface((64 // config.RENDER_SCALE, 64 // config.RENDER_SCALE), pygame.SRCALPHA)
+        placeholder.fill((255, 0, 255)) # Bright pink to indicate missing asset
+        return placeholder
+
+    def __len__(self):
+        return len(self.kind)
+
+    def add(self, name, x, y):
+        """Adds a fruit and returns its index, or None for an unknown kind."""
+        if name not in FRUIT_NAMES:
+            print(f"Warning: Unknown fruit '{name}', skipping")
+            return None
+        kind = FRUIT_NAMES.index(name)
+        if self.free:
+            i = self.free.pop()
+            self.kind[i], self.x[i], self.y[i] = kind, x, y
+        else:
+            i = len(self.kind)
+            self.kind.append(kind)
+            self.x.append(x)
+            self.y.append(y)
+        self.index.insert(i, self.hitbox(i))
+        return i
+
+    def remove(self, i):
+        """Takes fruit i out of the field. If it was picked up it stays in
+        count, which is then more than the set bits."""
+        self.index.remove(i)
+        self.collected &= ~(1 << i)
+        self.free.append(i)
+
+    def hitbox(self, i):
+        inset = self.HITBOX_INSET
+        return pygame.Rect(self.x[i] + inset // 2, self.y[i] + inset // 2, 64 - inset, 64 - inset)
+
+    def is_collected(self, i):
+        return (self.collected >> i) & 1
+
+    def snapshot(self):
+        return self.collected, self.count
+
+    def restore(self, snapshot):
+        self.collected, self.count = snapshot
+
+    def reset(self):
+        self.collected = 0
+        self.count = 0
+
+    def rebuilt(self, fruits):
+        """A new field for an edited fruit list that keeps which fruit were
+        picked up (matched by kind and position)."""
+        field = FruitField(fruits)
+        picked = {(self.kind[i], self.x[i], self.y[i]) for i in range(len(self)) if self.is_collected(i)}
+        for i in range(len(field)):
+            if (field.kind[i], field.x[i], field.y[i]) in picked:
+                field.collected |= 1 << i
+                field.count += 1
+        field.tick = self.tick
+        return field
+
+    def collect(self, player):
+        """Picks up any fruit touching the player; returns how many."""
+        picked = 0
+        for i in self.index.query(player.rect):
+            if self.is_collected(i) or not player.rect.colliderect(self.hitbox(i)):
+                continue
+            self.collected |= 1 << i
+            if adaptive.quality.particles:
+                self.effects.append([self.x[i], self.y[i], 0])
+            picked += 1
+        if picked:
+            audio.play(SOUND_FRUIT)
+        self.count += picked
+        return picked
+
+    def loop(self):
+        self.tick += 1
+        if self.effects:
+            duration = len(self.collected_frames) * self.ANIMATION_DELAY
+            for effect in self.effects:
+                effect[2] += 1
+            self.effects = [effect for effect in self.effects if effect[2] < duration]
+
+    def draw(self, win, offset_x):
+        frame = self.tick // self.ANIMATION_DELAY
+        on_screen = pygame.Rect(offset_x, 0, WIDTH, HEIGHT)
+        for i in self.index.query(on_screen):
+            if self.is_collected(i):
+                continue
+            frames = self.frames[self.kind[i]]
+            win.blit(frames[frame % len(frames)], (self.x[i] - offset_x, self.y[i]))
+        if not adaptive.quality.particles:
+            return
+        for x, y, ticks in self.effects:
+            win.blit(self.collected_frames[ticks // self.ANIMATION_DELAY], (x - offset_x, y))
@@ -0,0 +1,189 @@
+"""Player collision against the level and keyboard movement."""
+import pygame
+
+from engine.config import PLAYER_VEL
+from engine.entities import Block, Goal, Platform
+from engine.traps import TrapHandle
+
+# --- Collision Handling ---
+# One pass per frame: collect_contacts() tests every candidate the level's
+# SpatialHash returned near the player exactly once and returns a list of
+# Contacts. Horizontal blocking, landing/head bumps, trap effects and the goal
+# check all read that list instead of running their own mask tests.
+LEFT, RIGHT, TOP, BOTTOM = "left", "right", "top", "bottom"
+
+
+class Contact:
+    """Something touching the player this frame: which side of the player it
+    is on and how far the two overlap along that side's axis."""
+    __slots__ = ("obj", "side", "depth")
+
+    def __init__(self, obj, side, depth):
+        self.obj = obj
+        self.side = side
+        self.depth = depth
+
+
+def _contact_side(area, frame, dy):
+    """(side, depth) of an overlap area relative to the player's frame rect.
+
+    Overlaps thin enough for this frame's vertical move to explain (or wider
+    than they are tall) are floors and ceilings; anything taller is a wall."""
+    if area.height <= abs(dy) + 1 or area.height < area.width:
+        return (BOTTOM if area.centery >= frame.centery else TOP), area.height
+    return (RIGHT if area.centerx >= frame.centerx else LEFT), area.width
+
+
+def _block_contacts(player, blocks, dx, dy):
+    """Floor, ceiling and wall contacts between the player's body box and
+    terrain blocks, one mask test per block.
+
+    Each block is tested once against the body swept from where it is to
+    where dx would take it. That overlap is then split with small masks: the
+    part under the body now gives floors and ceilings, the part under the
+    moved body (minus the rows already sunk into a floor or ceiling) gives
+    walls. Block images overlap their neighbours and have transparent bands,
+    so a wall would otherwise show up as thin slivers that look like floors."""
+    body = player.body()
+    body_mask = player.BODY_MASK
+    now_x = -dx if dx < 0 else 0 # Where the unmoved body sits inside the swept one
+    ahead_x = now_x + dx
+    swept_rect = pygame.Rect(body.x - now_x, body.y, body.width + abs(dx), body.height)
+    swept = pygame.mask.Mask(swept_rect.size, fill=True)
+
+    contacts = []
+    overlaps = []
+    band_top, band_bottom = 0, body.height # Rows of the body that can hold a wall
+    for obj in blocks:
+        if not swept_rect.colliderect(obj.rect):
+            continue
+        overlap = swept.overlap_mask(obj.mask, (obj.rect.x - swept_rect.x, obj.rect.y - swept_rect.y))
+        overlaps.append((obj, overlap))
+        for area in overlap.overlap_mask(body_mask, (now_x, 0)).get_bounding_rects():
+            area.move_ip(swept_rect.topleft)
+            side, depth = _contact_side(area, body, dy)
+            if side == BOTTOM:
+                band_bottom = min(band_bottom, area.top - body.y)
+            elif side == TOP:
+                band_top = max(band_top, area.bottom - body.y)
+            else:
+                continue # Already inside a wall: the wall test below reports it
+            contacts.append(Contact(obj, side, depth))
+
+    if band_bottom > band_top:
+        band = pygame.mask.Mask((body.width, band_bottom - band_top), fill=True)
+        ahead = body.move(dx, 0)
+        for obj, overlap in overlaps:
+            for area in overlap.overlap_mask(band, (ahead_x, band_top)).get_bounding_rects():
+                area.move_ip(swept_rect.topleft)
+                side = RIGHT if area.centerx >= ahead.centerx else LEFT
+                contacts.append(Contact(obj, side, area.width))
+    return contacts
+
+
+def collect_contacts(player, objects, dx):
+    """Tests each candidate once and returns this frame's Contacts.
+
+    Blocks are tested against the body box over the horizontal move the keys
+    ask for (dx), so a wall shows up before the player walks into it.
+    Everything else is tested against the sprite's mask where the player is now."""
+    dy = player.y_vel
+    frame = player.rect
+    blocks = []
+    contacts = []
+
+    for obj in objects:
+        if isinstance(obj, Block):
+            blocks.append(obj)
+
+        elif isinstance(obj, Platform):
+            # One-way: only a contact when coming down onto the top edge
+            if not (obj.visible and dy >= 0 and frame.colliderect(obj.rect)):
+                continue
+            depth = frame.bottom - obj.rect.top
+            if depth <= dy + obj.LANDING_TOLERANCE and pygame.sprite.collide_mask(player, obj):
+                contacts.append(Contact(obj, BOTTOM, depth))
+
+        elif isinstance(obj, TrapHandle):
+            batch, i = obj.batch, obj.index
+            if not batch.active[i]:
+                continue
+            if batch.kind.sensor:
+                area = frame.clip(batch.sensors[i])
+                if not area:
+                    continue
+            elif frame.colliderect(obj.rect) and pygame.sprite.collide_mask(player, obj):
+                area = frame.clip(obj.rect)
+            else:
+                continue
+            contacts.append(Contact(obj, *_contact_side(area, frame, dy)))
+
+        elif isinstance(obj, Goal):
+            if frame.colliderect(obj.rect) and pygame.sprite.collide_mask(player, obj):
+                contacts.append(Contact(obj, *_contact_side(frame.clip(obj.rect), frame, dy)))
+
+    if blocks:
+        contacts += _block_contacts(player, blocks, dx, dy)
+    return contacts
+
+
+def wall_depth(contacts, side):
+    """How far a move towards side would push into the deepest wall there (0 if none)."""
+    return max((c.depth for c in contacts if c.side == side and isinstance(c.obj, Block)), default=0)
+
+
+def resolve_vertical(player, contacts, dy):
+    """Lands on or bumps into blocks and platforms, once per frame however
+    many of them the player touches."""
+    floor = max((c.depth for c in contacts if c.side == BOTTOM and isinstance(c.obj, Block)), default=0)
+    ceiling = max((c.depth for c in contacts if c.side == TOP and isinstance(c.obj, Block)), default=0)
+    if floor and dy > 0:
+        player.rect.y -= floor # Feet back on top of the floor
+        player.landed() # Reset vertical velocity, fall count, jump count
+    elif ceiling and dy < 0:
+        player.rect.y += ceiling
+        player.hit_head() # Reverse velocity, reset counters
+    else:
+        for contact in contacts:
+            if isinstance(contact.obj, Platform): # Only there when coming down onto it
+                player.rect.bottom = contact.obj.rect.top
+                player.landed()
+                break
+
+
+# --- Movement Handling ---
+def move_player(player, level, keys):
+    """Walks the player and resolves it against terrain and platforms;
+    returns the contacts. handle_move() without traps, enemies or fruit."""
+    player.x_vel = 0 # Reset horizontal velocity each frame
+    vel = round(PLAYER_VEL * player.speed_modifier) # Floor traps speed the player up or slow it down
+    dx = vel if keys[pygame.K_RIGHT] else -vel if keys[pygame.K_LEFT] else 0
+
+    # Only test what the spatial index has near the player, and each of those once
+    objects = level.index.query(player.rect.inflate(vel * 2 + 2, abs(player.y_vel) * 2 + 2))
+    contacts = collect_contacts(player, objects, dx)
+
+    # Walk up to a wall but not into it
+    if dx < 0:
+        player.move_left(max(0, vel - wall_depth(contacts, LEFT)))
+    elif dx > 0:
+        player.move_right(max(0, vel - wall_depth(contacts, RIGHT)))
+
+    # Landing and head bumps use the y_vel gravity/jumps gave this frame (in player.loop)
+    resolve_vertical(player, contacts, player.y_vel)
+    return contacts
+
+
+def handle_move(player, level, keys=None):
+    if keys is None: # The simulation thread passes the keys the main thread read
+        keys = pygame.key.get_pressed()
+    contacts = move_player(player, level, keys)
+
+    # Trap damage, bounces, lifts and floor effects
+    level.traps.apply_contacts(player, contacts)
+    level.enemies.apply_contacts(player)
+
+    # Fruit pickups (the fruit field has its own index)
+    level.fruits.collect(player)
+
+    return any(isinstance(contact.obj, Goal) for contact in contacts) # True if the goal is reached
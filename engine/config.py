@@ -0,0 +1,48 @@
+"""Engine setup shared by every game: pygame, the window and the global constants.
+
+Importing this does nothing but define the constants. A game parses its own
+flags and calls configure() once, before anything converts images; that opens
+the window and sets MUTED, RENDER_SCALE, ART_SCALE, window, scene and FONT,
+so read those as config.NAME rather than importing them by name."""
+import pygame
+
+WIDTH, HEIGHT = 1000, 800
+FPS = 60
+PLAYER_VEL = 5
+BLOCK_SIZE = 96 # Make block size a global constant
+
+# Set by configure()
+MUTED = False # Play without audio: don't open the sound device at all
+# World coordinates are always in the game's 2x pixels. At RENDER_SCALE 1 the
+# art is scale2x'd when loaded and drawn straight to the window. At
+# RENDER_SCALE 2 the art stays at its native size, the world is drawn into a
+# half-size scene and that is scaled up once per frame.
+RENDER_SCALE = 1
+ART_SCALE = 2 # How much the loaders enlarge the source art
+window = None
+scene = None # Surface the world is drawn into: the window itself at RENDER_SCALE 1
+FONT = None # Font for UI
+
+
+def configure(muted=False, render_scale=1, caption=None):
+    """Initializes pygame and opens the window. Returns the window."""
+    global MUTED, RENDER_SCALE, ART_SCALE, window, scene, FONT
+    MUTED = muted
+    RENDER_SCALE = render_scale
+    ART_SCALE = 2 // render_scale
+    if not muted:
+        pygame.mixer.pre_init(44100, -16, 2, 512) # Small mixer buffer so sound effects start right away
+    pygame.init()
+    if muted:
+        pygame.mixer.quit() # pygame.init() opens it along with everything else
+    pygame.font.init() # Initialize font module
+
+    window = pygame.display.set_mode((WIDTH, HEIGHT))
+    if caption:
+        pygame.display.set_caption(caption)
+    scene = window if render_scale == 1 else pygame.Surface((WIDTH // render_scale, HEIGHT // render_scale)).convert()
+    FONT = pygame.font.SysFont("comicsans", 30)
+
+    from engine import adaptive # It imports this module
+    adaptive.set_render_scale(render_scale)
+    return window
@@ -0,0 +1,337 @@
+"""Enemies, their per-kind behaviour and the navigation graph they path over."""
+import math
+import heapq
+import pygame
+
+from engine.config import BLOCK_SIZE, WIDTH
+from engine.assets import load_sprite_sheets
+from engine.audio import SOUND_STOMP, audio
+
+# --- Enemies ---
+# Enemies don't run the player's physics. They stand on the nodes of a
+# NavGraph (the tops of terrain tiles) and move along its links: walks
+# between neighbouring tiles, and hops/drops to tiles a jump can reach.
+# Routes come from A* and are cached on the graph until the terrain changes.
+# Each enemy re-plans every THINK_INTERVAL ticks, spread across ticks, and
+# enemies far from the player only move every FAR_STEP ticks (in bigger steps).
+
+class NavGraph:
+    """Standable tiles of a level and the links between them.
+
+    Terrain is the level's blocks as full cell_size squares, on the same grid
+    as batch_sim's Terrain. A node (column, row) is an empty cell with a block under it."""
+    HOP_COLUMNS = 3 # Furthest a hop or drop reaches sideways
+    HOP_UP_ROWS = 1
+    DROP_ROWS = 4
+    CACHE_SIZE = 4096 # Cached routes before the cache starts over
+
+    def __init__(self, blocks, cell_size=BLOCK_SIZE):
+        self.cell_size = cell_size
+        # Levels put their blocks on a grid that isn't always aligned with 0
+        self.origin_x = blocks[0][0] % cell_size if blocks else 0
+        self.origin_y = blocks[0][1] % cell_size if blocks else 0
+        self.solid = {self.cell_at(x, y) for x, y in blocks}
+        self.nodes = {(column, row - 1) for column, row in self.solid if (column, row - 1) not in self.solid}
+        self.links = {node: [] for node in self.nodes} # node -> [(node, cost)]
+        self.hops = set() # (from, to) pairs that are hops or drops rather than walks
+        self.paths = {} # (start, goal) -> tuple of nodes, or None if unreachable
+        for node in self.nodes:
+            self._link(node)
+
+    def cell_at(self, x, y):
+        return (int(x - self.origin_x) // self.cell_size, int(y - self.origin_y) // self.cell_size)
+
+    def position(self, node):
+        """World (centre x, floor y) of a node."""
+        column, row = node
+        return (self.origin_x + column * self.cell_size + self.cell_size // 2,
+                self.origin_y + (row + 1) * self.cell_size)
+
+    def node_below(self, x, y, rows=DROP_ROWS):
+        """The node at (x, y), or the first one under it within rows."""
+        column, row = self.cell_at(x, y)
+        for below in range(rows + 1):
+            if (column, row + below) in self.nodes:
+                return (column, row + below)
+        return None
+
+    def _clear(self, column, row, to_column, to_row):
+        """True if nothing solid is on the way from one node to another:
+        across at the higher of the two rows, then down/up the end columns."""
+        top = min(row, to_row)
+        step = 1 if to_column > column else -1
+        solid = self.solid
+        if any((c, top) in solid for c in range(column, to_column + step, step)):
+            return False
+        if any((column, r) in solid for r in range(top, row + 1)):
+            return False
+        return not any((to_column, r) in solid for r in range(top, to_row + 1))
+
+    def _link(self, node):
+        column, row = node
+        links = self.links[node]
+        for step in (-1, 1):
+            if (column + step, row) in self.nodes:
+                links.append(((column + step, row), 1))
+            for reach in range(1, self.HOP_COLUMNS + 1):
+                for rise in range(-self.HOP_UP_ROWS, self.DROP_ROWS + 1):
+                    if reach == 1 and rise == 0:
+                        continue # A walk
+                    target = (column + step * reach, row + rise)
+                    if target in self.nodes and self._clear(column, row, *target):
+                        links.append((target, reach + abs(rise) * 0.5 + 1)) # Walking is preferred
+                        self.hops.add((node, target))
+
+    def path(self, start, goal):
+        """Cheapest route from start to goal as a tuple of nodes (both
+        included), or None. Results are cached until the graph is rebuilt."""
+        key = (start, goal)
+        if key in self.paths:
+            return self.paths[key]
+        if len(self.paths) >= self.CACHE_SIZE:
+            self.paths.clear()
+
+        # A*: every link costs at least the columns it crosses, so that's the heuristic
+        came_from = {start: None}
+        cost = {start: 0}
+        frontier = [(abs(goal[0] - start[0]), 0, start)]
+        route = None
+        while frontier:
+            _, spent, node = heapq.heappop(frontier)
+            if node == goal:
+                route = []
+                while node is not None:
+                    route.append(node)
+                    node = came_from[node]
+                route = tuple(reversed(route))
+                break
+            if spent > cost[node]:
+                continue # Already reached more cheaply
+            for neighbour, link_cost in self.links.get(node, ()):
+                new_cost = spent + link_cost
+                if new_cost < cost.get(neighbour, float("inf")):
+                    cost[neighbour] = new_cost
+                    came_from[neighbour] = node
+                    heapq.heappush(frontier, (new_cost + abs(goal[0] - neighbour[0]), new_cost, neighbour))
+        self.paths[key] = route
+        return route
+
+
+class EnemyKind:
+    """Shared description of one kind of enemy."""
+
+    def __init__(self, name, skin, speed=2, chase_range=0, patrol_span=4, damage=1):
+        self.name = name
+        self.skin = skin # Folder in assets/MainCharacters
+        self.speed = speed # Pixels per tick
+        self.chase_range = chase_range # Columns within which it goes after the player (0: never)
+        self.patrol_span = patrol_span # Columns it patrols either side of where it was placed
+        self.damage = damage
+        self.sprites = None # Loaded lazily, then shared by every instance
+
+    def load(self):
+        if self.sprites is None:
+            self.sprites = load_sprite_sheets("MainCharacters", self.skin, 32, 32, True)
+
+
+ENEMY_KINDS = {kind.name: kind for kind in [
+    EnemyKind("patrol", "MaskDude"),
+    EnemyKind("chaser", "VirtualGuy", speed=3, chase_range=6),
+]}
+
+
+class Enemy:
+    """One enemy: where it is on the NavGraph and the route it is following."""
+    __slots__ = ("kind", "spawn", "x", "y", "node", "route", "link", "progress", "length",
+                 "hop", "patrol", "direction", "next_think", "animation_count", "dead", "defeated")
+    WIDTH, HEIGHT = 32, 44 # Hitbox, centred on x with its bottom at y
+    HOP_HEIGHT = BLOCK_SIZE // 2 # How far above the higher end a hop arcs
+
+    def __init__(self, kind, x, y):
+        self.kind = kind
+        self.spawn = (x, y)
+        self.x, self.y = x, y # Centre bottom, in world pixels
+        self.node = None # Resolved against the NavGraph on the first update
+        self.route = [] # Nodes still to visit, the next one last
+        self.link = None # (from, to) currently being crossed
+        self.progress = 0.0 # Pixels along link
+        self.length = 0.0
+        self.hop = False # Whether link is a hop/drop rather than a walk
+        self.patrol = None # (left node, right node)
+        self.direction = "left"
+        self.next_think = 0
+        self.animation_count = 0
+        self.dead = 0 # Ticks of "hit" animation left once stomped
+        self.defeated = False # Stomped: stays out of the level from then on
+
+    @property
+    def rect(self):
+        return pygame.Rect(int(self.x) - self.WIDTH // 2, int(self.y) - self.HEIGHT, self.WIDTH, self.HEIGHT)
+
+
+class EnemySystem:
+    """All the enemies in a level."""
+    THINK_INTERVAL = 15 # Ticks between an enemy's route decisions
+    FAR_STEP = 4 # Enemies further than FAR_DISTANCE from the player move every FAR_STEP ticks
+    FAR_DISTANCE = WIDTH
+    DEATH_TICKS = 21 # Length of the "hit" animation after a stomp
+    ANIMATION_DELAY = 3
+
+    def __init__(self):
+        self.enemies = []
+        self.tick = 0
+
+    def __len__(self):
+        return len(self.enemies)
+
+    def add(self, kind_name, x, y):
+        kind = ENEMY_KINDS.get(kind_name)
+        if kind is None:
+            print(f"Warning: Unknown enemy kind '{kind_name}', skipping")
+            return None
+        kind.load()
+        enemy = Enemy(kind, x, y)
+        enemy.next_think = len(self.enemies) % self.THINK_INTERVAL # Spread the thinking out
+        self.enemies.append(enemy)
+        return enemy
+
+    def remove(self, enemy):
+        self.enemies.remove(enemy)
+
+    def replan(self):
+        """Drops everything that refers to NavGraph nodes (after the terrain changed)."""
+        for enemy in self.enemies:
+            enemy.node = None
+            enemy.route = []
+            enemy.link = None
+            enemy.patrol = None
+
+    def loop(self, player, nav):
+        self.tick += 1
+        tick = self.tick
+        player_x = player.rect.centerx
+        for i, enemy in enumerate(self.enemies):
+            if enemy.defeated:
+                if enemy.dead:
+                    enemy.dead -= 1
+                    enemy.animation_count += 1 # Plays the hit animation
+                continue
+            if abs(enemy.x - player_x) > self.FAR_DISTANCE:
+                if (tick + i) % self.FAR_STEP:
+                    continue
+                ticks = self.FAR_STEP
+            else:
+                ticks = 1
+            if tick >= enemy.next_think:
+                enemy.next_think = tick + self.THINK_INTERVAL
+                self.think(enemy, player, nav)
+            self.advance(enemy, nav, enemy.kind.speed * ticks)
+            enemy.animation_count += ticks
+
+    def think(self, enemy, player, nav):
+        if enemy.node is None:
+            enemy.node = nav.node_below(enemy.x, enemy.y - 1)
+            if enemy.node is None:
+                return # Not standing on anything the graph knows about
+            enemy.x, enemy.y = nav.position(enemy.node)
+        start = enemy.link[1] if enemy.link else enemy.node # Finish the current link first
+        kind = enemy.kind
+
+        goal = None
+        if kind.chase_range:
+            target = nav.node_below(player.rect.centerx, player.rect.bottom - 1)
+            if target and abs(target[0] - start[0]) <= kind.chase_range and abs(target[1] - start[1]) <= nav.DROP_ROWS:
+                goal = target
+        if goal is None:
+            if enemy.patrol is None:
+                enemy.patrol = self._patrol_ends(enemy, nav)
+            left, right = enemy.patrol
+            # Head for the far end; turn round on arriving
+            goal = left if enemy.direction == "left" else right
+            if start == goal:
+                goal = right if goal == left else left
+        route = nav.path(start, goal) if start != goal else None
+        enemy.route = list(reversed(route[1:])) if route else []
+
+    @staticmethod
+    def _patrol_ends(enemy, nav):
+        column, row = enemy.node
+        left = right = column
+        span = enemy.kind.patrol_span
+        while left > column - span and (left - 1, row) in nav.nodes:
+            left -= 1
+        while right < column + span and (right + 1, row) in nav.nodes:
+            right += 1
+        return (left, row), (right, row)
+
+    def advance(self, enemy, nav, distance):
+        while distance > 0:
+            if enemy.link is None:
+                if not enemy.route:
+                    return
+                start, end = enemy.node, enemy.route.pop()
+                if not any(node == end for node, _ in nav.links.get(start, ())):
+                    enemy.route = [] # Route no longer fits the graph
+                    return
+                (x0, y0), (x1, y1) = nav.position(start), nav.position(end)
+                enemy.link = (start, end)
+                enemy.progress = 0.0
+                enemy.length = math.hypot(x1 - x0, y1 - y0) or 1.0
+                enemy.hop = enemy.link in nav.hops
+                enemy.direction = "right" if x1 > x0 else "left"
+            step = min(distance, enemy.length - enemy.progress)
+            enemy.progress += step
+            distance -= step
+            if enemy.progress >= enemy.length:
+                enemy.node = enemy.link[1]
+                enemy.link = None
+                enemy.x, enemy.y = nav.position(enemy.node)
+
+        if enemy.link is not None:
+            start, end = enemy.link
+            (x0, y0), (x1, y1) = nav.position(start), nav.position(end)
+            t = enemy.progress / enemy.length
+            enemy.x = x0 + (x1 - x0) * t
+            enemy.y = y0 + (y1 - y0) * t
+            if enemy.hop: # Arc over the gap
+                enemy.y -= 4 * Enemy.HOP_HEIGHT * t * (1 - t)
+
+    def apply_contacts(self, player):
+        """Stomping an enemy defeats it and bounces the player; any other touch hurts."""
+        body = player.body()
+        for enemy in self.enemies:
+            if enemy.defeated or abs(enemy.x - body.centerx) > BLOCK_SIZE:
+                continue
+            rect = enemy.rect
+            if not body.colliderect(rect):
+                continue
+            if player.y_vel > 0 and body.bottom - rect.top <= player.y_vel + 8:
+                enemy.defeated = True
+                enemy.dead = self.DEATH_TICKS
+                enemy.animation_count = 0 # Hit animation from its first frame
+                player.y_vel = -player.GRAVITY * 10
+                player.fall_count = 0
+                player.jump_count = 1 # Still allows a double jump
+                audio.play(SOUND_STOMP)
+            else:
+                player.take_damage(enemy.kind.damage, "enemy")
+
+    def draw(self, win, offset_x):
+        for enemy in self.enemies:
+            if enemy.defeated and not enemy.dead:
+                continue # Death animation over
+            if enemy.x + 32 < offset_x or enemy.x - 32 > offset_x + WIDTH:
+                continue # Off-screen
+            sprites = enemy.kind.sprites
+            if enemy.defeated:
+                sheet = "hit"
+            elif enemy.link is not None:
+                sheet = ("jump" if enemy.progress * 2 < enemy.length else "fall") if enemy.hop else "run"
+            else:
+                sheet = "idle"
+            frames = sprites.get(f"{sheet}_{enemy.direction}") or sprites.get("idle_left")
+            if not frames:
+                win.fill((255, 0, 255), (enemy.x - 32 - offset_x, enemy.y - 64, 64, 64)) # Missing art
+                continue
+            frame = frames[(enemy.animation_count // self.ANIMATION_DELAY) % len(frames)]
+            win.blit(frame, (int(enemy.x) - 32 - offset_x, int(enemy.y) - 64))
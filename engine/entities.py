@@ -0,0 +1,430 @@
+"""The player, blocks, the goal and platforms."""
+import weakref
+import pygame
+from os.path import join
+
+from engine import config
+from engine.config import BLOCK_SIZE, FPS, HEIGHT
+from engine.assets import get_block, load_scaled_image, load_sprite_sheets, world_mask, world_size
+from engine.audio import SOUND_CRUMBLE, SOUND_DOUBLE_JUMP, SOUND_HIT, SOUND_JUMP, SOUND_LAND, audio
+
+# --- Game Object Classes ---
+
+class Player(pygame.sprite.Sprite):
+    COLOR = (255, 0, 0)
+    GRAVITY = 1
+    SPRITES = None # NinjaFrog, loaded by the first Player so a game can preload it before then
+    ANIMATION_DELAY = 3
+    MAX_HEALTH = 3
+    INVINCIBILITY_DURATION = 1.5 # Seconds of invincibility after hit
+    LANDING_SOUND_SPEED = 4 # Falling faster than this thuds, so walking along the floor stays quiet
+    # Body box inside the 64x64 frame that terrain collides with: (x inset, y inset, width, height).
+    # Fixed rather than per animation frame, so changing frames can't push the player into a wall.
+    HITBOX = (16, 16, 32, 48)
+    BODY_MASK = pygame.mask.Mask(HITBOX[2:], fill=True)
+    _masks = weakref.WeakKeyDictionary() # sprite -> world-size mask, shared by every player
+    _heart = None
+
+    def __init__(self, x, y, width, height):
+        super().__init__()
+        if self.SPRITES is None:
+            self.load_sprites()
+        self.starting_pos = (x, y) # Store starting position for reset
+        self.rect = pygame.Rect(x, y, width, height)
+        self.x_vel = 0
+        self.y_vel = 0
+        self.mask = None
+        self.direction = "right" # Start facing right
+        self.animation_count = 0
+        self.fall_count = 0
+        self.jump_count = 0
+        self.hit = False
+        self.hit_count = 0
+
+        self.max_health = self.MAX_HEALTH
+        self.current_health = self.max_health
+        self.is_invincible = False
+        self.invincibility_timer = 0
+        self.speed_modifier = 1 # Set by floor traps (sand, mud, ice) each frame
+
+    @staticmethod
+    def load_sprites():
+        """Player.SPRITES, loading it the first time."""
+        if Player.SPRITES is None:
+            Player.SPRITES = load_sprite_sheets("MainCharacters", "NinjaFrog", 32, 32, True)
+        return Player.SPRITES
+
+    def reset(self):
+        """Resets player to starting state for the level."""
+        self.rect.topleft = self.starting_pos
+        self.x_vel = 0
+        self.y_vel = 0
+        self.direction = "right"
+        self.animation_count = 0
+        self.fall_count = 0
+        self.jump_count = 0
+        self.hit = False
+        self.hit_count = 0
+        self.current_health = self.max_health
+        self.is_invincible = False
+        self.invincibility_timer = 0
+        self.speed_modifier = 1
+        self.damage_cause = None # What last hurt the player
+        self.update_sprite() # Ensure correct sprite is set initially
+
+    def jump(self):
+        # Allow jump only if on ground or haven't double jumped
+        if self.jump_count < 2:
+            self.y_vel = -self.GRAVITY * 8 # Consistent jump height
+            self.animation_count = 0
+            self.jump_count += 1
+            if self.jump_count == 1:
+                self.fall_count = 0 # Reset fall count on first jump
+                audio.play(SOUND_JUMP)
+            else:
+                audio.play(SOUND_DOUBLE_JUMP)
+
+    def move(self, dx, dy):
+        self.rect.x += dx
+        self.rect.y += dy
+
+    def body(self):
+        inset_x, inset_y, width, height = self.HITBOX
+        return pygame.Rect(self.rect.x + inset_x, self.rect.y + inset_y, width, height)
+
+    def take_damage(self, amount=1, cause=None):
+        """Reduces health if not invincible. cause (a trap kind's name, "enemy")
+        is kept in damage_cause for the analytics events."""
+        if not self.is_invincible:
+            self.current_health -= amount
+            self.damage_cause = cause
+            self.hit = True # Trigger hit animation
+            self.hit_count = 0
+            self.is_invincible = True
+            self.invincibility_timer = 0 # Reset invincibility timer
+            audio.play(SOUND_HIT)
+            # print(f"Player took damage! Health: {self.current_health}") # Debugging
+
+    def move_left(self, vel):
+        self.x_vel = -vel
+        if self.direction != "left":
+            self.direction = "left"
+            self.animation_count = 0
+
+    def move_right(self, vel):
+        self.x_vel = vel
+        if self.direction != "right":
+            self.direction = "right"
+            self.animation_count = 0
+
+    def loop(self, fps):
+        # --- Handle Invincibility ---
+        if self.is_invincible:
+            self.invincibility_timer += 1 / fps
+            if self.invincibility_timer >= self.INVINCIBILITY_DURATION:
+                self.is_invincible = False
+                self.invincibility_timer = 0
+                # Also ensure hit animation stops if invincibility ends
+                if self.hit and self.hit_count == 0: # Only stop if not already in hit animation cycle
+                     self.hit = False
+
+
+        # --- Handle Gravity ---
+        # Apply gravity based on fall_count for terminal velocity effect
+        self.y_vel += min(1, (self.fall_count / fps) * self.GRAVITY)
+        self.move(self.x_vel, self.y_vel)
+
+        # --- Handle Hit Animation ---
+        # This part seems redundant now that invincibility handles the state
+        # Let's keep it simple: hit animation plays once when take_damage is called
+        if self.hit:
+           self.hit_count += 1
+           # Make hit animation last ~0.5 seconds regardless of invincibility?
+           if self.hit_count > fps * 0.5:
+                self.hit = False
+                self.hit_count = 0
+
+
+        self.fall_count += 1
+        self.update_sprite()
+
+    def landed(self):
+        if self.y_vel > self.LANDING_SOUND_SPEED:
+            audio.play(SOUND_LAND)
+        self.fall_count = 0
+        self.y_vel = 0
+        self.jump_count = 0
+
+    def hit_head(self):
+        # self.count = 0 # 'count' was not defined, maybe meant fall_count or animation_count?
+        self.fall_count = 0 # Reset fall count to prevent instant acceleration down
+        self.y_vel *= -0.5 # Bounce off slightly, reduced intensity
+
+    def update_sprite(self):
+        # Determine sprite sheet based on state
+        sprite_sheet = "idle"
+        if self.hit:
+            sprite_sheet = "hit"
+        elif self.y_vel < 0:
+            if self.jump_count == 1:
+                sprite_sheet = "jump"
+            elif self.jump_count >= 2: # Use double_jump for second jump and beyond
+                sprite_sheet = "double_jump"
+        elif self.y_vel > self.GRAVITY * 1.5: # Lower threshold for fall animation
+            sprite_sheet = "fall"
+        elif self.x_vel != 0:
+            sprite_sheet = "run"
+
+        # Get the correct list of sprites
+        sprite_sheet_name = sprite_sheet + "_" + self.direction
+        if not self.SPRITES or sprite_sheet_name not in self.SPRITES:
+             # print(f"Warning: Sprite key '{sprite_sheet_name}' not found. Defaulting to idle_right.")
+             # Fallback if sprites didn't load or key is missing
+             sprite_sheet_name = "idle_right"
+             if sprite_sheet_name not in self.SPRITES: # Absolute fallback
+                 self.sprite = pygame.Surface((self.rect.width // config.RENDER_SCALE, self.rect.height // config.RENDER_SCALE))
+                 self.sprite.fill(self.COLOR)
+                 self.update()
+                 return
+
+
+        sprites = self.SPRITES[sprite_sheet_name]
+        if not sprites: # Check if the list of sprites is empty
+            # print(f"Warning: Sprite list for '{sprite_sheet_name}' is empty.")
+            self.sprite = pygame.Surface((self.rect.width // config.RENDER_SCALE, self.rect.height // config.RENDER_SCALE))
+            self.sprite.fill(self.COLOR)
+            self.update()
+            return
+
+        # Select the current sprite index based on animation count
+        sprite_index = (self.animation_count // self.ANIMATION_DELAY) % len(sprites)
+        self.sprite = sprites[sprite_index]
+        self.animation_count += 1
+
+        # Update rect and mask
+        self.update()
+
+
+    def update(self):
+        # Adjust rect size based on the current sprite, keep position consistent (topleft)
+        current_pos = self.rect.topleft
+        self.rect = pygame.Rect(current_pos, world_size(self.sprite))
+        self.mask = self._masks.get(self.sprite)
+        if self.mask is None:
+            self.mask = self._masks[self.sprite] = world_mask(self.sprite)
+
+    def draw(self, win, offset_x):
+        # Optionally add visual feedback for invincibility (e.g., flashing)
+        if not hasattr(self, 'sprite') or not self.sprite:
+            # If sprite doesn't exist (shouldn't happen with proper init/update, but defensive)
+            # Draw a placeholder rectangle instead of crashing
+            placeholder_rect = self.rect.move(-offset_x, 0) # Adjust for scroll
+            win.fill(self.COLOR, placeholder_rect)
+            # print("Warning: Player sprite missing, drawing placeholder.") # Optional debug
+            return # Stop here to avoid blitting non-existent sprite
+        if self.is_invincible:
+            # Flash every few frames
+            if pygame.time.get_ticks() % 200 < 100: # Adjust timing for desired flash speed
+                 return # Skip drawing this frame to create a flash effect
+        win.blit(self.sprite, (self.rect.x - offset_x, self.rect.y))
+
+        # Draw Health Hearts (simple version)
+        if Player._heart is None: # Loaded once, not every frame
+            Player._heart = load_scaled_image(join("assets", "Items", "Fruits", "Kiwi.png"), 1) # Example using Kiwi as heart
+        heart_img = Player._heart
+        if heart_img:
+            heart_size = world_size(heart_img)[0]
+            for i in range(self.current_health):
+                 win.blit(heart_img, (10 + i * (heart_size + 5), 10))
+
+
+class Object(pygame.sprite.Sprite):
+    def __init__(self, x, y, width, height, name=None):
+        super().__init__()
+        self.rect = pygame.Rect(x, y, width, height)
+        # Ensure image is created *before* setting mask (art size, the rect is in world pixels)
+        self.image = pygame.Surface((width // config.RENDER_SCALE, height // config.RENDER_SCALE), pygame.SRCALPHA)
+        self.width = width
+        self.height = height
+        self.name = name
+        # Set mask after image is potentially modified by subclasses
+        # self.mask = pygame.mask.from_surface(self.image) # Moved to subclasses
+
+    def draw(self, win, offset_x):
+        win.blit(self.image, (self.rect.x - offset_x, self.rect.y))
+
+    # Add a dummy loop method for compatibility if needed by main loop iteration
+    def loop(self, *args):
+        pass
+
+
+class Block(Object):
+    _shared = {} # size -> (image, mask): every block of a size draws the same tile
+
+    def __init__(self, x, y, size):
+        super().__init__(x, y, size * 2, size * 2) # Size is doubled due to scale2x in get_block
+        if size not in Block._shared:
+            block_surface = get_block(size) # get_block returns a 2x scaled surface (native at RENDER_SCALE 2)
+            self.image.blit(block_surface, (0, 0))
+            Block._shared[size] = (self.image, world_mask(self.image))
+        self.image, self.mask = Block._shared[size]
+
+
+# --- Goal Object ---
+class Goal(Object):
+    IMAGE_PATH = join("assets", "Items", "Checkpoints", "End", "End (Idle).png")
+    _image = None # Shared by every goal
+
+    def __init__(self, x, y, width=32, height=32): # Adjust size as needed
+         # Use a checkpoint or specific goal asset
+         self.goal_img = self.load_image()
+         scaled_width, scaled_height = world_size(self.goal_img)
+         # Adjust y position to align nicely
+         adjusted_y = y + BLOCK_SIZE - scaled_height
+
+         super().__init__(x, adjusted_y, scaled_width, scaled_height, "goal")
+         self.image.blit(self.goal_img, (0,0))
+         self.mask = world_mask(self.image)
+
+    @staticmethod
+    def load_image():
+        """Goal._image, loading it the first time."""
+        if Goal._image is None:
+            Goal._image = load_scaled_image(Goal.IMAGE_PATH)
+        return Goal._image
+
+
+# --- Platforms ---
+class Platform(Object):
+    """Thin one-way platform: the player can land on it from above and is
+    carried along when it moves. Subclasses decide how it moves."""
+    FOLDER = "Platforms"
+    SHEET = "Grey On (32x8)"
+    FRAME_SIZE = (32, 8)
+    ANIMATION_DELAY = 3
+    LANDING_TOLERANCE = 12 # How far the player's feet may sink in and still land on top
+    _sprites = {} # (folder, sheet) -> frames, shared by every platform
+
+    def __init__(self, x, y):
+        self.frames = self.load_frames(self.SHEET)
+        width, height = world_size(self.frames[0])
+        super().__init__(x, y, width, height, "platform")
+        self.image = self.frames[0]
+        self.mask = world_mask(self.image)
+        self.animation_count = 0
+        self.visible = True
+
+    @classmethod
+    def load_frames(cls, sheet):
+        key = (cls.FOLDER, sheet)
+        if key not in Platform._sprites:
+            sheets = load_sprite_sheets("Traps", cls.FOLDER, *cls.FRAME_SIZE)
+            frames = sheets.get(sheet)
+            if not frames:
+                placeholder = pygame.Surface((cls.FRAME_SIZE[0] * config.ART_SCALE, cls.FRAME_SIZE[1] * config.ART_SCALE), pygame.SRCALPHA)
+                placeholder.fill((255, 0, 255)) # Bright pink to indicate missing asset
+                frames = [placeholder]
+            Platform._sprites[key] = frames
+        return Platform._sprites[key]
+
+    def carries(self, player):
+        """True if the player is standing on top of this platform.
+
+        Gravity lets a standing player sink a pixel or two before the next
+        landing snaps them back, so allow a little overlap."""
+        return (self.visible and player.y_vel >= 0
+                and 0 <= player.rect.bottom - self.rect.top <= self.LANDING_TOLERANCE
+                and player.rect.right > self.rect.left and player.rect.left < self.rect.right)
+
+    def move_by(self, dx, dy, player):
+        if dx == 0 and dy == 0:
+            return False
+        if self.carries(player):
+            player.move(dx, dy)
+        self.rect.x += dx
+        self.rect.y += dy
+        return True
+
+    def animate(self):
+        self.animation_count += 1
+        self.image = self.frames[(self.animation_count // self.ANIMATION_DELAY) % len(self.frames)]
+
+    def loop(self, player):
+        """Updates the platform; returns True if it moved this tick."""
+        self.animate()
+        return False
+
+    def draw(self, win, offset_x):
+        if self.visible:
+            super().draw(win, offset_x)
+
+
+class MovingPlatform(Platform):
+    """Platform travelling back and forth from its start by (span_x, span_y)."""
+
+    def __init__(self, x, y, span_x=0, span_y=0, speed=2):
+        super().__init__(x, y)
+        self.origin = (x, y)
+        self.span_x = span_x
+        self.span_y = span_y
+        self.speed = speed
+        self.distance = 0
+
+    def loop(self, player):
+        self.animate()
+        length = max(abs(self.span_x), abs(self.span_y))
+        if length == 0:
+            return False
+        self.distance = (self.distance + self.speed) % (2 * length)
+        t = self.distance if self.distance < length else 2 * length - self.distance
+        x = self.origin[0] + round(self.span_x * t / length)
+        y = self.origin[1] + round(self.span_y * t / length)
+        return self.move_by(x - self.rect.x, y - self.rect.y, player)
+
+
+class FallingPlatform(Platform):
+    """Hovers in place until stood on, then drops after a short delay and
+    comes back once it has fallen off the bottom of the screen."""
+    FOLDER = "Falling Platforms"
+    SHEET = "On (32x10)"
+    FRAME_SIZE = (32, 10)
+    FALL_DELAY = FPS // 2 # Ticks the player can stand on it before it drops
+    RESPAWN_DELAY = FPS * 3
+    GRAVITY = 0.5
+
+    def __init__(self, x, y):
+        super().__init__(x, y)
+        self.origin = (x, y)
+        self.off_frames = self.load_frames("Off")
+        self.reset()
+
+    def reset(self):
+        self.rect.topleft = self.origin
+        self.visible = True
+        self.stood_on = 0
+        self.y_vel = 0
+        self.respawn_timer = 0
+
+    def loop(self, player):
+        if not self.visible:
+            self.respawn_timer -= 1
+            if self.respawn_timer <= 0:
+                self.reset()
+                return True
+            return False
+
+        if self.y_vel == 0:
+            self.animate()
+            if self.carries(player):
+                self.stood_on += 1
+            if self.stood_on < self.FALL_DELAY:
+                return False
+            self.image = self.off_frames[0]
+            audio.play(SOUND_CRUMBLE)
+
+        self.y_vel += self.GRAVITY
+        moved = self.move_by(0, int(self.y_vel), player)
+        if self.rect.top > HEIGHT:
+            self.visible = False
+            self.respawn_timer = self.RESPAWN_DELAY
+        return moved
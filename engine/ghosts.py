@@ -0,0 +1,160 @@
+"""Recording runs and playing them back as ghosts."""
+import os
+import sys
+import struct
+import pygame
+from array import array
+from os import listdir
+from os.path import isfile, join
+
+from engine.config import FPS, WIDTH
+from engine.entities import Player
+
+# --- Ghost Runs ---
+# Every run is recorded as it is played: per tick, the player's position as
+# two int16s and which animation frame was showing as one byte (5 bytes a
+# tick, no physics state). A run that reaches the goal faster than the saved
+# best replaces GHOST_DIR/level_NN/best.ghost. Every .ghost file in that
+# folder (the best run plus any shared ones dropped in) is played back next
+# to the player, drawn with a translucent copy of Player.SPRITES made once.
+
+GHOST_DIR = "ghosts"
+GHOST_MAGIC = b"GHST"
+GHOST_VERSION = 1 # Bump when the frame codes change (they follow Player.SPRITES)
+GHOST_HEADER = struct.Struct("<4sBBI") # magic, version, level index, ticks
+GHOST_TINT = (170, 210, 255, 120) # Multiplied into the frames: blue-ish and see-through
+
+
+def ghost_frames():
+    """Every frame in Player.SPRITES in a fixed order; a frame's code is its index."""
+    sprites = Player.load_sprites()
+    return [frame for name in sorted(sprites) for frame in sprites[name]]
+
+
+class GhostRun:
+    """One recorded run: x, y and frame code per tick."""
+
+    def __init__(self, level_index, x=None, y=None, frames=None):
+        self.level_index = level_index
+        self.x = x if x is not None else array("h")
+        self.y = y if y is not None else array("h")
+        self.frames = frames if frames is not None else bytearray()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        x, y = array("h", self.x), array("h", self.y)
+        if sys.byteorder == "big": # Files are little-endian
+            x.byteswap()
+            y.byteswap()
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(GHOST_HEADER.pack(GHOST_MAGIC, GHOST_VERSION, self.level_index, len(self)))
+            f.write(x.tobytes() + y.tobytes() + bytes(self.frames))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """The run in a .ghost file, or None if it can't be used."""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            print(f"Error reading ghost {path}: {e}")
+            return None
+        if len(data) < GHOST_HEADER.size:
+            return None
+        magic, version, level_index, ticks = GHOST_HEADER.unpack_from(data)
+        if magic != GHOST_MAGIC or version != GHOST_VERSION or len(data) != GHOST_HEADER.size + ticks * 5:
+            print(f"Warning: Skipping ghost {path} (old or damaged file)")
+            return None
+        start = GHOST_HEADER.size
+        x, y = array("h"), array("h")
+        x.frombytes(data[start:start + ticks * 2])
+        y.frombytes(data[start + ticks * 2:start + ticks * 4])
+        if sys.byteorder == "big":
+            x.byteswap()
+            y.byteswap()
+        return cls(level_index, x, y, bytearray(data[start + ticks * 4:]))
+
+
+def ghost_folder(level_index):
+    return join(GHOST_DIR, f"level_{level_index + 1:02d}")
+
+
+def load_ghosts(level_index):
+    folder = ghost_folder(level_index)
+    if not os.path.isdir(folder):
+        return []
+    runs = [GhostRun.load(join(folder, name)) for name in sorted(listdir(folder)) if name.endswith(".ghost")]
+    return [run for run in runs if run is not None and run.level_index == level_index]
+
+
+class GhostRecorder:
+    """Records the player's run through one level."""
+    _codes = None # Frame -> code, shared
+
+    def __init__(self, level_index):
+        if GhostRecorder._codes is None:
+            GhostRecorder._codes = {frame: code for code, frame in enumerate(ghost_frames())}
+        self.run = GhostRun(level_index)
+
+    def record(self, player):
+        run = self.run
+        run.x.append(max(-32768, min(32767, player.rect.x)))
+        run.y.append(max(-32768, min(32767, player.rect.y)))
+        run.frames.append(self._codes.get(getattr(player, "sprite", None), 255)) # 255: nothing to draw
+
+    def finish(self):
+        """Called when the goal is reached: saves the run if it beats the best one."""
+        run = self.run
+        path = join(ghost_folder(run.level_index), "best.ghost")
+        best = GhostRun.load(path) if isfile(path) else None
+        if best is not None and len(best) <= len(run):
+            return False
+        try:
+            run.save(path)
+        except OSError as e:
+            print(f"Error saving ghost {path}: {e}")
+            return False
+        print(f"New best time on level {run.level_index + 1}: {len(run) / FPS:.2f}s")
+        return True
+
+
+class GhostPlayback:
+    """Draws recorded runs at the current tick of the level."""
+    _frames = None # Tinted copies of ghost_frames(), shared
+
+    def __init__(self, runs):
+        if GhostPlayback._frames is None:
+            GhostPlayback._frames = []
+            for frame in ghost_frames():
+                tinted = frame.copy()
+                tinted.fill(GHOST_TINT, special_flags=pygame.BLEND_RGBA_MULT)
+                GhostPlayback._frames.append(tinted)
+        self.runs = runs
+        self.tick = 0
+
+    def __len__(self):
+        return len(self.runs)
+
+    def loop(self):
+        self.tick += 1
+
+    def draw(self, win, offset_x):
+        frames = self._frames
+        tick = self.tick - 1 # What the runs recorded on the tick the player is on
+        if tick < 0:
+            return
+        left = offset_x - 64
+        right = offset_x + WIDTH
+        for run in self.runs:
+            if tick >= len(run.frames):
+                continue # Finished
+            x = run.x[tick]
+            code = run.frames[tick]
+            if x < left or x > right or code >= len(frames):
+                continue # Off-screen
+            win.blit(frames[code], (x - offset_x, run.y[tick]))
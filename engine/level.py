@@ -0,0 +1,175 @@
+"""A level's objects, traps, fruit and enemies, built from entry tuples."""
+import pygame
+from collections import Counter
+
+from engine.config import BLOCK_SIZE, HEIGHT
+from engine.spatial import SpatialHash
+from engine.entities import Block, FallingPlatform, Goal, MovingPlatform, Platform
+from engine.traps import TrapHandle, TrapSystem
+from engine.collectibles import FruitField
+from engine.enemies import Enemy, EnemySystem, NavGraph
+from engine.background import background_layers
+
+# --- Level Loading Function ---
+# A level is built from "entries": one hashable tuple for each block, trap,
+# platform, enemy and the goal in its definition (see level_entries()). Level keeps
+# what each entry created, so an edited definition can be applied by diffing
+# the old and new entries (Level.reload(), used by --dev-levels) instead of
+# rebuilding the whole level.
+
+def _freeze(value):
+    """Hashable copy of level data: lists become tuples, dicts sorted item tuples."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def level_entries(level_data):
+    """Everything a level places except fruit, as hashable tuples."""
+    entries = [("block", pos[0], pos[1]) for pos in level_data["blocks"]]
+    for fire_data in level_data.get("fires", []): # (x, y, width, height) - placed by top-left
+        entries.append(("trap", fire_data[0], fire_data[1], "fire", False, ()))
+    for pos in level_data.get("spikes", []): # (x, y) - y adjusted automatically
+        entries.append(("trap", pos[0], pos[1], "spike", None, ()))
+    for trap_data in level_data.get("traps", []): # (kind, x, y) or (kind, x, y, {params})
+        params = trap_data[3] if len(trap_data) > 3 else {}
+        entries.append(("trap", trap_data[1], trap_data[2], trap_data[0], None, _freeze(params)))
+    for platform_data in level_data.get("platforms", []): # (x, y) or (x, y, {span_x, span_y, speed})
+        params = platform_data[2] if len(platform_data) > 2 else {}
+        entries.append(("platform", platform_data[0], platform_data[1], _freeze(params)))
+    for pos in level_data.get("falling_platforms", []): # (x, y)
+        entries.append(("falling_platform", pos[0], pos[1]))
+    for enemy_data in level_data.get("enemies", []): # (kind, x, y) - stands on the block at (x, y)
+        entries.append(("enemy", enemy_data[1], enemy_data[2], enemy_data[0]))
+    if "goal" in level_data: # Endless mode has none
+        goal_pos = level_data["goal"]
+        entries.append(("goal", goal_pos[0], goal_pos[1]))
+    return entries
+
+
+def _placed_bottom(obj):
+    # Where the level put it: platforms move (and fall) away from there
+    if isinstance(obj, Platform):
+        return obj.origin[1] + obj.rect.height
+    return obj.rect.bottom
+
+
+def _draw_order(obj):
+    # Blocks first, then platforms, then the goal on top
+    return 0 if isinstance(obj, Block) else 2 if isinstance(obj, Goal) else 1
+
+
+class Level:
+    """Everything loaded for one level except the player."""
+
+    def __init__(self, level_data):
+        self.data = level_data
+        self.set_background(level_data["background"])
+        self.objects = [] # Blocks, platforms and the goal
+        self.platforms = []
+        self.traps = TrapSystem()
+        self.enemies = EnemySystem()
+        self.nav = None # Built from the blocks the first time an enemy needs it
+        self.ghosts = None # GhostPlayback, set by the Simulation
+        self.fruits = FruitField(level_data.get("fruits", [])) # (name, x, y)
+        self.bottom = HEIGHT # Lowest edge of any block or platform: falling past it is a death
+        self.entries = {} # entry -> what it created, in a list since entries can repeat
+
+        # Collision index: everything is filed once here, moving things
+        # update their own entries as they move.
+        self.index = SpatialHash()
+        self.traps.attach_index(self.index)
+        for entry in level_entries(level_data):
+            self.add_entry(entry)
+
+    def set_background(self, name):
+        self.background, self.bg_image = background_layers(name)
+        self.bg_color = pygame.transform.average_color(self.bg_image)[:3] # For the "flat background" tier
+
+    def add_entry(self, entry):
+        kind, x, y = entry[:3]
+        if kind == "trap":
+            _, _, _, name, align, params = entry
+            thing = self.traps.add(name, x, y, align=align, **dict(params)) # None for unknown kinds
+        elif kind == "enemy":
+            thing = self.enemies.add(entry[3], x + BLOCK_SIZE // 2, y) # None for unknown kinds
+        else:
+            if kind == "block":
+                thing = Block(x, y, BLOCK_SIZE // 2) # Pass original size
+            elif kind == "platform":
+                thing = MovingPlatform(x, y, **dict(entry[3]))
+            elif kind == "falling_platform":
+                thing = FallingPlatform(x, y)
+            else:
+                thing = Goal(x, y)
+            self.objects.append(thing)
+            if isinstance(thing, Platform):
+                self.platforms.append(thing)
+            self.index.insert(thing, thing.rect)
+            self.bottom = max(self.bottom, _placed_bottom(thing))
+        self.entries.setdefault(entry, []).append(thing)
+
+    def remove_entry(self, entry):
+        things = self.entries[entry]
+        thing = things.pop()
+        if not things:
+            del self.entries[entry]
+        if thing is None:
+            return
+        if isinstance(thing, TrapHandle):
+            self.traps.remove(thing)
+            return
+        if isinstance(thing, Enemy):
+            self.enemies.remove(thing)
+            return
+        self.objects.remove(thing)
+        if isinstance(thing, Platform):
+            self.platforms.remove(thing)
+        self.index.remove(thing)
+
+    def reload(self, level_data, player):
+        """Applies an edited definition of this level in place: only entries
+        that appear or disappear are built or removed, so everything else
+        (moving traps, falling platforms, picked up fruit) keeps its state.
+        Returns (entries added, entries removed)."""
+        old = Counter({entry: len(things) for entry, things in self.entries.items()})
+        new = Counter(level_entries(level_data))
+        removed = old - new
+        added = new - old
+        for entry, count in removed.items():
+            for _ in range(count):
+                self.remove_entry(entry)
+        for entry, count in added.items():
+            for _ in range(count):
+                self.add_entry(entry)
+        if added:
+            self.objects.sort(key=_draw_order)
+        if removed: # The lowest floor may be gone, which raises the fall-death line
+            self.bottom = max([HEIGHT] + [_placed_bottom(obj) for obj in self.objects])
+        if any(entry[0] == "block" for entry in (added + removed)):
+            self.nav = None # Terrain changed: rebuild the graph (and its cached routes)
+            self.enemies.replan()
+
+        if _freeze(level_data.get("fruits", [])) != _freeze(self.data.get("fruits", [])):
+            self.fruits = self.fruits.rebuilt(level_data.get("fruits", []))
+        if level_data["background"] != self.data["background"]:
+            self.set_background(level_data["background"])
+        player.starting_pos = tuple(level_data["player_start"]) # Used next time the player resets
+        self.data = level_data
+        return sum(added.values()), sum(removed.values())
+
+    def loop(self, player):
+        for platform in self.platforms:
+            if platform.loop(player): # Carries the player if they are standing on it
+                self.index.move(platform, platform.rect)
+        self.traps.loop()
+        if self.enemies:
+            self.enemies.loop(player, self.nav_graph())
+        self.fruits.loop()
+
+    def nav_graph(self):
+        if self.nav is None:
+            self.nav = NavGraph([entry[1:] for entry in self.entries if entry[0] == "block"])
+        return self.nav
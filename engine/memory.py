@@ -0,0 +1,139 @@
+"""Per-category memory accounting for the --memory report."""
+import gc
+import pygame
+
+from engine import rendering
+from engine import config
+from engine.entities import Block, Goal, Platform, Player
+from engine.traps import TRAP_KINDS
+from engine.collectibles import FruitField
+from engine.enemies import ENEMY_KINDS
+from engine.rendering import _half_images
+from engine.ghosts import GhostPlayback
+
+# --- Memory Accounting ---
+# Bytes held by surfaces and masks, grouped by what owns them. The known
+# owners are walked directly; a sweep over the garbage collector's containers
+# catches anything else still holding pixels ("other"), which is where a leak
+# from an old level would end up. With --memory-report or --leak-check,
+# MemoryTracker runs this after level loads and warns when a level keeps
+# coming back bigger. The sweep takes ~100 ms, so otherwise a load only
+# bumps a counter and the walk waits for an explicit request (F9).
+
+MEMORY_CATEGORIES = ("player", "blocks", "traps", "enemies", "objects", "background", "hud", "cache", "other")
+
+
+def surface_bytes(surface):
+    if surface.get_parent() is not None:
+        return 0 # Subsurfaces share their parent's pixels
+    return surface.get_pitch() * surface.get_height()
+
+
+def mask_bytes(mask):
+    width, height = mask.get_size()
+    return (width + 63) // 64 * 8 * height # Rows of 64-bit words
+
+
+def _walk_images(item, found):
+    """Adds every Surface / Mask inside nested lists, tuples and dicts to found (id -> object)."""
+    if isinstance(item, (pygame.Surface, pygame.mask.Mask)):
+        found[id(item)] = item
+    elif isinstance(item, dict):
+        for value in item.values():
+            _walk_images(value, found)
+    elif isinstance(item, (list, tuple)):
+        for value in item:
+            _walk_images(value, found)
+
+
+def _memory_owners(player, level):
+    """category -> things to walk, most specific owners first."""
+    loaded_kinds = [kind for kind in TRAP_KINDS.values() if kind.sprites is not None]
+    return {
+        "player": [Player.SPRITES, list(Player._masks.values()), Player.BODY_MASK,
+                   getattr(player, "sprite", None), player.mask, GhostPlayback._frames],
+        "blocks": [list(Block._shared.values())],
+        "traps": [[(kind.sprites, kind.masks) for kind in loaded_kinds]],
+        "enemies": [[kind.sprites for kind in ENEMY_KINDS.values()]],
+        "objects": [Platform._sprites, FruitField._sprites,
+                    [(obj.image, obj.mask) for obj in level.objects if not isinstance(obj, Block)],
+                    [obj.goal_img for obj in level.objects if isinstance(obj, Goal)]],
+        "background": [level.bg_image, [layer.strip for layer in level.background]],
+        "hud": [Player._heart],
+        "cache": [None if config.scene is config.window else config.scene, rendering._half_scene, list(_half_images.values())],
+    }
+
+
+def memory_usage(player, level):
+    """category -> [bytes, surfaces, masks] for everything the game holds."""
+    usage = {category: [0, 0, 0] for category in MEMORY_CATEGORIES}
+    counted = {id(config.window)} # The display surface belongs to SDL
+
+    def add(category, images):
+        for key, image in images.items():
+            if key in counted:
+                continue
+            counted.add(key)
+            entry = usage[category]
+            if isinstance(image, pygame.Surface):
+                entry[0] += surface_bytes(image)
+                entry[1] += 1
+            else:
+                entry[0] += mask_bytes(image)
+                entry[2] += 1
+
+    for category, owners in _memory_owners(player, level).items():
+        found = {}
+        _walk_images(owners, found)
+        add(category, found)
+
+    # Whatever else still references a surface or mask. Collect first: an old
+    # level is full of reference cycles (traps <-> SpatialHash) and only goes
+    # away when the cycle collector runs.
+    gc.collect()
+    others = {}
+    for container in gc.get_objects():
+        for item in gc.get_referents(container):
+            if isinstance(item, (pygame.Surface, pygame.mask.Mask)):
+                others[id(item)] = item
+    add("other", others)
+    return usage
+
+
+def format_memory_report(usage, title="Surface memory"):
+    lines = [f"{title}: {sum(entry[0] for entry in usage.values()) / 1024:,.0f} KB"]
+    for category, (size, surfaces, masks) in usage.items():
+        lines.append(f"  {category:<11}{size / 1024:>9,.0f} KB  {surfaces:>4} surfaces {masks:>4} masks")
+    return "\n".join(lines)
+
+
+class MemoryTracker:
+    """Measures memory_usage() after level loads, if report or leak_check is
+    on, and warns when a category grew on each of the last LEAK_LOADS loads
+    of the same level. Shared sprite caches grow once, the first time a
+    level needs them; a leak keeps growing."""
+    GROWTH_WARNING = 32 * 1024 # Bytes a category has to grow by per load to count
+    LEAK_LOADS = 2
+
+    def __init__(self, report=False, leak_check=False):
+        self.report = report # Also print the full report at every level load
+        self.enabled = report or leak_check
+        self.history = {} # level index -> bytes per category after each of its measured loads
+
+    def record(self, level_index, player, level):
+        """Returns the usage, or None if measuring is off."""
+        if not self.enabled:
+            return None
+        usage = memory_usage(player, level)
+        if self.report:
+            print(format_memory_report(usage, f"Surface memory after loading level {level_index + 1}"))
+        history = self.history.setdefault(level_index, [])
+        history.append({category: entry[0] for category, entry in usage.items()})
+        del history[:-(self.LEAK_LOADS + 1)]
+        if len(history) > self.LEAK_LOADS:
+            for category in MEMORY_CATEGORIES:
+                sizes = [loaded[category] for loaded in history]
+                if all(after - before > self.GROWTH_WARNING for before, after in zip(sizes, sizes[1:])):
+                    print(f"Warning: '{category}' surfaces grew by {(sizes[-1] - sizes[0]) / 1024:,.0f} KB "
+                          f"over {self.LEAK_LOADS} measured loads of level {level_index + 1} (possible leak)")
+        return usage
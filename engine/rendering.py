@@ -0,0 +1,120 @@
+"""Drawing the world into the window or a scaled scene."""
+import weakref
+import pygame
+
+from engine import adaptive, config
+from engine.config import HEIGHT, WIDTH
+
+# --- Drawing Function ---
+def draw_text(window, text, font, color, x, y):
+    text_surface = font.render(text, True, color)
+    window.blit(text_surface, (x, y))
+
+_half_scene = None # Half-size scene for the "half resolution" tier at RENDER_SCALE 1
+_half_images = weakref.WeakKeyDictionary() # 2x art -> native-size copy for that scene
+
+
+def scene_image(source, scale):
+    """source as drawn into a scene of this scale (halved once and cached if
+    the art was loaded at 2x for a full-size window)."""
+    if scale == config.RENDER_SCALE:
+        return source
+    image = _half_images.get(source)
+    if image is None:
+        width, height = source.get_size()
+        image = _half_images[source] = pygame.transform.scale(source, (width // 2, height // 2))
+    return image
+
+
+def scene_surface(window, scale):
+    """Surface the world is drawn into at this scale: the window itself at 1."""
+    global _half_scene
+    if scale == 1:
+        return window
+    if config.scene is not window:
+        return config.scene
+    if _half_scene is None:
+        _half_scene = pygame.Surface((WIDTH // 2, HEIGHT // 2)).convert()
+    return _half_scene
+
+
+class SceneTarget:
+    """Stands in for the window in draw_world() when drawing at half
+    resolution: takes world-pixel positions and draws into the scene."""
+
+    def __init__(self, surface, scale=None):
+        self.surface = surface
+        self.scale = scale or config.RENDER_SCALE
+
+    def blit(self, source, dest, area=None):
+        s = self.scale
+        if area is not None and s != config.RENDER_SCALE:
+            area = [v // 2 for v in area]
+        self.surface.blit(scene_image(source, s), (dest[0] // s, dest[1] // s), area)
+
+    def fill(self, color, rect=None):
+        if rect is None:
+            self.surface.fill(color)
+            return
+        x, y, width, height = rect
+        s = self.scale
+        self.surface.fill(color, (x // s, y // s, width // s, height // s))
+
+
+def present_scene(window, surface):
+    """Scales a half-size scene up onto the window (nothing to do for the window itself)."""
+    if surface is not window:
+        pygame.transform.scale(surface, window.get_size(), window)
+
+
+def draw_world(target, player, level, offset_x):
+    """Background, level and player. target is the window, a SceneTarget, or
+    a BlitRecorder when the simulation thread builds a RenderSnapshot."""
+    # Draw background
+    if adaptive.quality.background:
+        for layer in level.background:
+            layer.draw(target, offset_x)
+    else:
+        target.fill(level.bg_color)
+
+    # Draw all objects and traps
+    for obj in level.objects:
+        obj.draw(target, offset_x)
+    level.traps.draw(target, offset_x, player.rect.centerx)
+    level.enemies.draw(target, offset_x)
+    level.fruits.draw(target, offset_x)
+    if level.ghosts:
+        level.ghosts.draw(target, offset_x)
+
+    # Draw player (handles its own health display now)
+    player.draw(target, offset_x)
+
+
+class BlitRecorder:
+    """Stands in for the window in draw_world(): records blits instead of doing
+    them. Positions are stored in scene pixels, ready for scene.blits()."""
+
+    def __init__(self, scale=None):
+        self.blits = []
+        self.scale = scale or config.RENDER_SCALE
+        self.clear = None # Colour to fill the scene with first, if any
+
+    def blit(self, source, dest, area=None):
+        s = self.scale
+        source = scene_image(source, s)
+        dest = (dest[0] // s, dest[1] // s)
+        if area is None:
+            self.blits.append((source, dest))
+        else:
+            if s != config.RENDER_SCALE:
+                area = [v // 2 for v in area]
+            self.blits.append((source, dest, area))
+
+    def fill(self, color, rect=None):
+        if rect is None:
+            self.clear = color
+            return
+        rect = pygame.Rect(rect)
+        surface = pygame.Surface((rect.width // self.scale, rect.height // self.scale)) # Only used by placeholders for missing sprites
+        surface.fill(color)
+        self.blits.append((surface, (rect.x // self.scale, rect.y // self.scale)))
@@ -0,0 +1,60 @@
+"""Uniform grid of rects, for "what is near this rect" queries."""
+
+from engine.config import BLOCK_SIZE
+
+# --- Spatial Index ---
+class SpatialHash:
+    """Uniform grid mapping cells to the objects overlapping them.
+
+    Static objects are inserted once when a level loads. Moving objects call
+    move() after they move, which only touches the grid when the set of cells
+    they cover changes, so the cost per tick is proportional to what moved."""
+
+    def __init__(self, cell_size=BLOCK_SIZE):
+        self.cell_size = cell_size
+        self.cells = {} # (cx, cy) -> set of objects
+        self.coverage = {} # object -> (x0, y0, x1, y1) cell range it is filed under
+
+    def _cell_range(self, rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def insert(self, obj, rect):
+        cell_range = self._cell_range(rect)
+        self.coverage[obj] = cell_range
+        x0, y0, x1, y1 = cell_range
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                self.cells.setdefault((cx, cy), set()).add(obj)
+
+    def remove(self, obj):
+        cell_range = self.coverage.pop(obj, None)
+        if cell_range is None:
+            return
+        x0, y0, x1, y1 = cell_range
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket is not None:
+                    bucket.discard(obj)
+                    if not bucket:
+                        del self.cells[(cx, cy)]
+
+    def move(self, obj, rect):
+        if self.coverage.get(obj) == self._cell_range(rect):
+            return # Still in the same cells, nothing to do
+        self.remove(obj)
+        self.insert(obj, rect)
+
+    def query(self, rect):
+        """Returns every object filed in a cell that rect touches."""
+        found = set()
+        x0, y0, x1, y1 = self._cell_range(rect)
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return found
@@ -0,0 +1,133 @@
+"""Frame timing samples and the telemetry files they are summarised into."""
+import os
+import csv
+import json
+import time
+import threading
+from array import array
+from bisect import bisect_right
+from os.path import dirname, join
+
+from engine.config import FPS
+
+# --- Frame Telemetry ---
+# The game loop writes one sample per frame into FrameStats' preallocated
+# arrays: no allocation and no file I/O on the hot path. A TelemetryWriter
+# thread wakes up every few seconds, folds the samples written since its
+# last visit into histograms and appends one aggregate record per metric to
+# a CSV or JSONL file, so frame pacing can be compared across sessions.
+
+TELEMETRY_FILE = join(".cache", "frame_stats.jsonl") # Where a bare --telemetry writes
+
+TELEMETRY_METRICS = ("frame", "sim", "render", "latency") # All in milliseconds
+HISTOGRAM_EDGES_MS = (2, 4, 8, 12, 16, 17, 20, 25, 33, 50, 100) # Bucket upper bounds; one more for the rest
+FRAME_BUDGET_MS = 1000 / FPS
+MISS_TOLERANCE_MS = 2 # Clock.tick() jitter that doesn't count as a missed deadline
+NO_SAMPLE = -1.0 # Latency of frames with no new input
+
+
+class FrameStats:
+    """Fixed-size ring buffer of per-frame timings, written by the game loop.
+
+    written counts every sample ever recorded; the reader works out which
+    slots are new from it, so the writer never waits on the reader."""
+
+    def __init__(self, capacity=FPS * 30):
+        self.capacity = capacity
+        self.samples = {metric: array("d", [NO_SAMPLE]) * capacity for metric in TELEMETRY_METRICS}
+        self.missed = bytearray(capacity)
+        self.written = 0
+
+    def record(self, frame_ms, sim_ms, render_ms, latency_ms=NO_SAMPLE):
+        i = self.written % self.capacity
+        samples = self.samples
+        samples["frame"][i] = frame_ms
+        samples["sim"][i] = sim_ms
+        samples["render"][i] = render_ms
+        samples["latency"][i] = latency_ms
+        self.missed[i] = frame_ms > FRAME_BUDGET_MS + MISS_TOLERANCE_MS
+        self.written += 1 # Last, so a reader never sees a half-written sample as new
+
+
+class TelemetryWriter(threading.Thread):
+    """Background thread that appends aggregated FrameStats to path
+    (.csv for one row per metric, anything else for JSON lines)."""
+
+    def __init__(self, stats, path, interval=5.0):
+        super().__init__(name="telemetry", daemon=True)
+        self.stats = stats
+        self.path = path
+        self.interval = interval
+        self.read = 0 # stats.written when we last flushed
+        self.session = time.strftime("%Y%m%d-%H%M%S")
+        self.stopping = threading.Event()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            self.flush()
+        self.flush() # Whatever is left when the game quits
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+
+    def collect(self):
+        """Histograms of the samples written since the last call, or None."""
+        stats = self.stats
+        end = stats.written
+        # Leave the slot the game loop may be writing right now alone
+        start = max(self.read, end - stats.capacity + 1)
+        dropped = start - self.read # Overwritten before we got to them
+        self.read = end
+        if end == start:
+            return None
+
+        record = {"session": self.session, "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                  "frames": end - start, "dropped": dropped, "missed": 0, "metrics": {}}
+        slots = [i % stats.capacity for i in range(start, end)]
+        record["missed"] = sum(stats.missed[i] for i in slots)
+        for metric in TELEMETRY_METRICS:
+            values = stats.samples[metric]
+            counts = [0] * (len(HISTOGRAM_EDGES_MS) + 1)
+            total = 0.0
+            largest = 0.0
+            n = 0
+            for i in slots:
+                value = values[i]
+                if value < 0:
+                    continue # NO_SAMPLE
+                counts[bisect_right(HISTOGRAM_EDGES_MS, value)] += 1
+                total += value
+                largest = max(largest, value)
+                n += 1
+            record["metrics"][metric] = {"count": n, "mean_ms": round(total / n, 3) if n else None,
+                                         "max_ms": round(largest, 3), "histogram": counts}
+        return record
+
+    def flush(self):
+        record = self.collect()
+        if record is None:
+            return
+        try:
+            if dirname(self.path):
+                os.makedirs(dirname(self.path), exist_ok=True)
+            if self.path.endswith(".csv"):
+                self._write_csv(record)
+            else:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps({**record, "edges_ms": HISTOGRAM_EDGES_MS}) + "\n")
+        except OSError as e:
+            print(f"Error writing telemetry to {self.path}: {e}")
+
+    def _write_csv(self, record):
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                buckets = [f"lt_{edge}ms" for edge in HISTOGRAM_EDGES_MS] + [f"ge_{HISTOGRAM_EDGES_MS[-1]}ms"]
+                writer.writerow(["session", "time", "frames", "dropped", "missed",
+                                 "metric", "count", "mean_ms", "max_ms", *buckets])
+            for metric, summary in record["metrics"].items():
+                writer.writerow([record["session"], record["time"], record["frames"], record["dropped"],
+                                 record["missed"], metric, summary["count"], summary["mean_ms"],
+                                 summary["max_ms"], *summary["histogram"]])
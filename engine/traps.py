@@ -0,0 +1,471 @@
+"""Traps stored per kind in batches, with one motion update and contact response per kind."""
+import math
+import pygame
+from array import array
+from os.path import join
+
+from engine import adaptive
+from engine import config
+from engine.config import BLOCK_SIZE, FPS, WIDTH
+from engine.assets import (load_image, load_scaled_image, load_sprite_sheets, scale_art,
+                           world_mask, world_size)
+from engine.audio import SOUND_BOOST, SOUND_BOUNCE, audio
+
+# --- Trap System ---
+# Every kind of trap is described once in TRAP_KINDS (sprites, motion, what
+# happens on contact). The instances of a kind live in a TrapBatch as parallel
+# arrays, so a level full of traps is updated with one loop per kind instead
+# of one object (with its own sprite dict and mask) per trap.
+
+ON, OFF, HIT = "on", "off", "hit"
+TRAP_KINDS = {} # name -> TrapKind, filled in by register_trap_kind()
+SECONDARY_NEAR = BLOCK_SIZE * 3 # Secondary traps this close to the player always animate at full rate
+
+
+class TrapKind:
+    """Shared description of one kind of trap."""
+
+    def __init__(self, name, folder, frame_width, frame_height, animations,
+                 motion="static", contact="damage", animation_delay=3,
+                 sensor=None, loader=None, **params):
+        self.name = name
+        self.folder = folder
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.animations = animations # state -> sprite sheet name in the folder
+        self.states = list(animations) # Instances store an index into this list
+        self.motion = motion
+        self.contact = contact
+        self.animation_delay = animation_delay
+        self.sensor = sensor # Optional rect -> rect function for non-mask contact areas
+        self.loader = loader # Optional custom loader for sheets load_sprite_sheets can't cut
+        self.params = params # Kind defaults (damage, span, speed, power...)
+        self.sprites = None # Loaded lazily, then shared by every instance
+        self.masks = None
+
+    def load(self):
+        if self.sprites is not None:
+            return
+        if self.loader:
+            sheets = self.loader(self)
+        else:
+            sheets = load_sprite_sheets("Traps", self.folder, self.frame_width, self.frame_height)
+
+        self.sprites = {}
+        self.masks = {}
+        for state, sheet_name in self.animations.items():
+            frames = sheets.get(sheet_name)
+            if not frames:
+                print(f"Warning: Missing '{sheet_name}' frames for trap '{self.name}'")
+                placeholder = pygame.Surface((self.frame_width * config.ART_SCALE, self.frame_height * config.ART_SCALE), pygame.SRCALPHA)
+                placeholder.fill((255, 0, 255)) # Bright pink to indicate missing asset
+                frames = [placeholder]
+            self.sprites[state] = frames
+            self.masks[state] = [world_mask(frame) for frame in frames]
+
+        first = self.sprites[self.states[0]][0]
+        self.width, self.height = world_size(first)
+
+
+def _load_surface_tiles(kind):
+    """Cuts the top edge of the sand / mud / ice blocks into thin floor strips."""
+    path = join("assets", "Traps", kind.folder, "Sand Mud Ice (16x6).png")
+    sheets = {}
+    try:
+        sheet = load_image(path)
+        for column, name in enumerate(["sand", "mud", "ice"]):
+            surface = pygame.Surface((kind.frame_width, kind.frame_height), pygame.SRCALPHA, 32)
+            surface.blit(sheet, (0, 0), pygame.Rect(column * 64 + 16, 0, kind.frame_width, kind.frame_height))
+            sheets[name] = [scale_art(surface)]
+    except pygame.error as e:
+        print(f"Error loading surface tiles from {path}: {e}")
+    return sheets
+
+
+def _fan_sensor(rect):
+    # The fan pushes the player anywhere in the column above it
+    return pygame.Rect(rect.x, rect.y - BLOCK_SIZE * 3, rect.width, BLOCK_SIZE * 3)
+
+
+def _feet_sensor(rect):
+    # Floor strips sit on top of a block, so the player only ever touches their top edge
+    return pygame.Rect(rect.x, rect.y - 2, rect.width, 4)
+
+
+class TrapBatch:
+    """All instances of one trap kind, stored as parallel arrays."""
+
+    def __init__(self, kind):
+        kind.load()
+        self.kind = kind
+        self.tick = 0
+        self.x = array("d") # Current top-left position
+        self.y = array("d")
+        self.origin_x = array("d") # Where the instance was placed (motion is relative to it)
+        self.origin_y = array("d")
+        self.span = array("d")
+        self.speed = array("d")
+        self.phase = array("d")
+        self.state = bytearray() # Index into kind.states
+        self.timer = array("i") # Ticks left in a temporary state (e.g. "hit")
+        self.active = bytearray() # 0 while an instance is hidden (e.g. a used arrow)
+        self.rects = [] # Body rects, kept in sync for moving kinds
+        self.sensors = [] # Contact rects for sensor kinds (fans, floor strips)
+        self.handles = []
+        self.index = None # Level SpatialHash, kept up to date as instances move
+
+    def __len__(self):
+        return len(self.rects)
+
+    def add(self, x, y, state=None, **params):
+        kind = self.kind
+        settings = {**kind.params, **params}
+        self.x.append(x)
+        self.y.append(y)
+        self.origin_x.append(x)
+        self.origin_y.append(y)
+        self.span.append(settings.get("span", 0))
+        self.speed.append(settings.get("speed", 0))
+        self.phase.append(settings.get("phase", 0))
+        self.state.append(kind.states.index(state or kind.states[0]))
+        self.timer.append(0)
+        self.active.append(1)
+        rect = pygame.Rect(int(x), int(y), kind.width, kind.height)
+        self.rects.append(rect)
+        if kind.sensor:
+            self.sensors.append(kind.sensor(rect))
+        handle = TrapHandle(self, len(self.handles))
+        self.handles.append(handle)
+        if self.index is not None:
+            self.index.insert(handle, handle.contact_rect)
+        return handle
+
+    def remove(self, index):
+        """Deletes one instance; the ones after it move down a slot."""
+        handle = self.handles.pop(index)
+        if self.index is not None:
+            self.index.remove(handle)
+        for column in (self.x, self.y, self.origin_x, self.origin_y, self.span, self.speed,
+                       self.phase, self.state, self.timer, self.active, self.rects):
+            del column[index]
+        if self.kind.sensor:
+            del self.sensors[index]
+        for later in self.handles[index:]:
+            later.index -= 1
+
+    def set_state(self, index, state, duration=0):
+        self.state[index] = self.kind.states.index(state)
+        self.timer[index] = duration
+
+    def trigger(self, index, state):
+        """Plays a one-shot animation (e.g. "hit") before returning to the first state."""
+        frames = len(self.kind.sprites[state])
+        self.set_state(index, state, frames * self.kind.animation_delay)
+
+    def frame_index(self, index, tick=None):
+        kind = self.kind
+        frames = kind.sprites[kind.states[self.state[index]]]
+        if self.timer[index] > 0: # One-shot animations play from their first frame
+            elapsed = len(frames) * kind.animation_delay - self.timer[index]
+            return min(elapsed // kind.animation_delay, len(frames) - 1)
+        return ((self.tick if tick is None else tick) // kind.animation_delay) % len(frames)
+
+    def image(self, index, tick=None):
+        return self.kind.sprites[self.kind.states[self.state[index]]][self.frame_index(index, tick)]
+
+    def mask(self, index):
+        return self.kind.masks[self.kind.states[self.state[index]]][self.frame_index(index)]
+
+    def loop(self):
+        self.tick += 1
+
+        # Count down temporary states in one pass
+        timer = self.timer
+        for i in range(len(timer)):
+            if timer[i] > 0:
+                timer[i] -= 1
+                if timer[i] == 0:
+                    self.finish_timed_state(i)
+
+        update = MOTION_UPDATERS[self.kind.motion]
+        if update:
+            update(self)
+            if self.index is not None:
+                # Only moving kinds get here; the index skips instances that stay in their cells
+                for handle in self.handles:
+                    self.index.move(handle, handle.contact_rect)
+
+    def finish_timed_state(self, index):
+        if self.kind.params.get("consumed") and self.active[index]:
+            # Consumed traps (arrows) stay hidden for a while, then come back
+            self.active[index] = 0
+            self.timer[index] = self.kind.params.get("respawn", FPS * 3)
+            return
+        self.active[index] = 1
+        self.state[index] = 0
+
+    def draw(self, win, offset_x, focus_x=None):
+        """focus_x: the player's x; secondary traps away from it may animate slower."""
+        draw_chain = self.kind.params.get("chain")
+        tick = slow_tick = self.tick
+        if self.kind.params.get("secondary"):
+            # Background animation: the quality tier may only show every Nth frame.
+            # Collision masks still follow self.tick.
+            slow_tick -= tick % (self.kind.animation_delay * adaptive.quality.animation_step)
+        for i, rect in enumerate(self.rects):
+            if not self.active[i]:
+                continue
+            if rect.right < offset_x or rect.left > offset_x + WIDTH:
+                continue # Off-screen
+            if draw_chain:
+                draw_chain(win, self, i, offset_x)
+            near = focus_x is not None and abs(rect.centerx - focus_x) <= SECONDARY_NEAR
+            win.blit(self.image(i, tick if near else slow_tick), (rect.x - offset_x, rect.y))
+
+
+class TrapHandle:
+    """Lightweight view of one trap so it can be used like an Object in collision code."""
+    __slots__ = ("batch", "index")
+
+    def __init__(self, batch, index):
+        self.batch = batch
+        self.index = index
+
+    @property
+    def name(self):
+        return self.batch.kind.name
+
+    @property
+    def rect(self):
+        return self.batch.rects[self.index]
+
+    @property
+    def mask(self):
+        return self.batch.mask(self.index)
+
+    @property
+    def contact_rect(self):
+        if self.batch.kind.sensor:
+            return self.batch.sensors[self.index]
+        return self.batch.rects[self.index]
+
+
+# --- Trap Motion (one batch update per kind) ---
+
+def _sync_rects(batch):
+    for rect, x, y in zip(batch.rects, batch.x, batch.y):
+        rect.x = int(x)
+        rect.y = int(y)
+
+
+def _triangle_wave(batch, i):
+    """Distance along a back-and-forth path of length span."""
+    span = batch.span[i]
+    if span <= 0:
+        return 0
+    distance = (batch.tick * batch.speed[i] + batch.phase[i] * span) % (2 * span)
+    return distance if distance < span else 2 * span - distance
+
+
+def _move_patrol_x(batch):
+    for i in range(len(batch)):
+        batch.x[i] = batch.origin_x[i] + _triangle_wave(batch, i)
+    _sync_rects(batch)
+
+
+def _move_patrol_y(batch):
+    for i in range(len(batch)):
+        batch.y[i] = batch.origin_y[i] + _triangle_wave(batch, i)
+    _sync_rects(batch)
+
+
+def _move_swing(batch):
+    # origin is the pivot of the chain, span its length, speed the swing rate
+    amplitude = batch.kind.params.get("amplitude", math.pi / 3)
+    half_w = batch.kind.width / 2
+    half_h = batch.kind.height / 2
+    for i in range(len(batch)):
+        angle = amplitude * math.sin(batch.tick * batch.speed[i] + batch.phase[i] * math.tau)
+        batch.x[i] = batch.origin_x[i] + math.sin(angle) * batch.span[i] - half_w
+        batch.y[i] = batch.origin_y[i] + math.cos(angle) * batch.span[i] - half_h
+    _sync_rects(batch)
+
+
+MOTION_UPDATERS = {
+    "static": None,
+    "patrol_x": _move_patrol_x,
+    "patrol_y": _move_patrol_y,
+    "swing": _move_swing,
+}
+
+
+def chain_image(folder):
+    """The chain link of a swinging trap, loaded the first time."""
+    chain = TRAP_CHAIN_IMAGES.get(folder)
+    if chain is None:
+        chain = load_scaled_image(join("assets", "Traps", folder, "Chain.png"))
+        TRAP_CHAIN_IMAGES[folder] = chain
+    return chain
+
+
+def _draw_swing_chain(win, batch, index, offset_x):
+    chain = chain_image(batch.kind.folder)
+    pivot_x, pivot_y = batch.origin_x[index], batch.origin_y[index]
+    end_x, end_y = batch.rects[index].center
+    chain_width, chain_height = world_size(chain)
+    links = max(1, int(batch.span[index] // chain_height))
+    for step in range(links):
+        t = step / links
+        x = pivot_x + (end_x - pivot_x) * t - chain_width / 2
+        y = pivot_y + (end_y - pivot_y) * t - chain_height / 2
+        win.blit(chain, (x - offset_x, y))
+
+
+TRAP_CHAIN_IMAGES = {}
+
+
+# --- Trap Contact Responses (dispatch table) ---
+
+def _contact_damage(player, batch, index):
+    player.take_damage(batch.kind.params.get("damage", 1), batch.kind.name)
+
+
+def _contact_damage_when_on(player, batch, index):
+    if batch.kind.states[batch.state[index]] != OFF:
+        player.take_damage(batch.kind.params.get("damage", 1), batch.kind.name)
+
+
+def _contact_bounce(player, batch, index):
+    if player.y_vel <= 0:
+        return # Only bounce when landing on it
+    player.y_vel = -player.GRAVITY * batch.kind.params.get("power", 16)
+    player.fall_count = 0
+    player.jump_count = 1 # Still allows a double jump
+    batch.trigger(index, HIT)
+    audio.play(SOUND_BOUNCE)
+
+
+def _contact_lift(player, batch, index):
+    lift = batch.kind.params.get("power", 2)
+    player.y_vel = max(player.y_vel - lift, -player.GRAVITY * 8)
+    player.fall_count = 0
+
+
+def _contact_boost(player, batch, index):
+    if batch.timer[index] > 0:
+        return # Already used, playing its hit animation
+    player.y_vel = -player.GRAVITY * batch.kind.params.get("power", 10)
+    player.fall_count = 0
+    player.jump_count = 1
+    batch.trigger(index, HIT)
+    audio.play(SOUND_BOOST)
+
+
+def _contact_surface(player, batch, index):
+    player.speed_modifier = batch.kind.params.get("speed", 1)
+
+
+CONTACT_HANDLERS = {
+    "damage": _contact_damage,
+    "damage_when_on": _contact_damage_when_on,
+    "bounce": _contact_bounce,
+    "lift": _contact_lift,
+    "boost": _contact_boost,
+    "surface": _contact_surface,
+}
+
+
+def register_trap_kind(kind):
+    if kind.contact not in CONTACT_HANDLERS:
+        raise ValueError(f"Unknown contact behaviour '{kind.contact}' for trap '{kind.name}'")
+    if kind.motion not in MOTION_UPDATERS:
+        raise ValueError(f"Unknown motion '{kind.motion}' for trap '{kind.name}'")
+    kind.on_contact = CONTACT_HANDLERS[kind.contact]
+    TRAP_KINDS[kind.name] = kind
+    return kind
+
+
+register_trap_kind(TrapKind("fire", "Fire", 16, 32, {ON: "on", OFF: "off", HIT: "hit"},
+                            contact="damage_when_on", secondary=True))
+register_trap_kind(TrapKind("spike", "Spikes", 16, 16, {ON: "Idle"}))
+register_trap_kind(TrapKind("saw", "Saw", 38, 38, {ON: "on", OFF: "off"},
+                            motion="patrol_x", span=BLOCK_SIZE * 2, speed=2))
+register_trap_kind(TrapKind("spiked_ball", "Spiked Ball", 28, 28, {ON: "Spiked Ball"},
+                            motion="swing", span=BLOCK_SIZE * 1.5, speed=0.05,
+                            chain=_draw_swing_chain, align=False)) # Placed by the pivot of its chain
+register_trap_kind(TrapKind("spike_head", "Spike Head", 54, 52, {ON: "Blink (54x52)", OFF: "Idle"},
+                            motion="patrol_y", animation_delay=6, span=BLOCK_SIZE * 2, speed=3))
+register_trap_kind(TrapKind("rock_head", "Rock Head", 42, 42, {ON: "Blink (42x42)", OFF: "Idle"},
+                            motion="patrol_x", animation_delay=6, span=BLOCK_SIZE * 3, speed=3))
+register_trap_kind(TrapKind("trampoline", "Trampoline", 28, 28, {ON: "Idle", HIT: "Jump (28x28)"},
+                            contact="bounce", power=16))
+register_trap_kind(TrapKind("fan", "Fan", 24, 8, {ON: "On (24x8)", OFF: "Off"},
+                            contact="lift", sensor=_fan_sensor, power=2))
+register_trap_kind(TrapKind("arrow", "Arrow", 18, 18, {ON: "Idle (18x18)", HIT: "Hit (18x18)"},
+                            contact="boost", power=10, consumed=True, respawn=FPS * 3))
+for _surface, _speed in [("sand", 0.6), ("mud", 0.4), ("ice", 1.6)]:
+    register_trap_kind(TrapKind(_surface, "Sand Mud Ice", 16, 6, {ON: _surface},
+                                contact="surface", sensor=_feet_sensor,
+                                loader=_load_surface_tiles, speed=_speed,
+                                align=False)) # Placed at the top edge of the block it covers
+
+
+class TrapSystem:
+    """Owns one TrapBatch per trap kind used in a level."""
+
+    def __init__(self):
+        self.batches = {}
+        self.index = None
+
+    def add(self, kind_name, x, y, align=None, **params):
+        kind = TRAP_KINDS.get(kind_name)
+        if kind is None:
+            print(f"Warning: Unknown trap kind '{kind_name}', skipping")
+            return
+        batch = self.batches.get(kind_name)
+        if batch is None:
+            batch = self.batches[kind_name] = TrapBatch(kind)
+            batch.index = self.index
+        if align is None:
+            align = kind.params.get("align", True)
+        if align:
+            # Like spikes and the goal: stand on the bottom of the grid cell at (x, y)
+            y = y + BLOCK_SIZE - kind.height
+        return batch.add(x, y, **params)
+
+    def remove(self, handle):
+        handle.batch.remove(handle.index)
+
+    def __len__(self):
+        return sum(len(batch) for batch in self.batches.values())
+
+    def handles(self):
+        for batch in self.batches.values():
+            yield from batch.handles
+
+    def loop(self):
+        for batch in self.batches.values():
+            batch.loop()
+
+    def draw(self, win, offset_x, focus_x=None):
+        for batch in self.batches.values():
+            batch.draw(win, offset_x, focus_x)
+
+    def attach_index(self, index):
+        """Registers every trap in a level's SpatialHash and keeps it updated."""
+        self.index = index
+        for batch in self.batches.values():
+            batch.index = index
+            for handle in batch.handles:
+                index.insert(handle, handle.contact_rect)
+
+    def apply_contacts(self, player, contacts):
+        """Runs each touching trap's contact handler once for this frame.
+
+        contacts is the frame's list from collect_contacts(), which already
+        did the sensor / mask tests."""
+        player.speed_modifier = 1
+        for contact in contacts:
+            obj = contact.obj
+            if isinstance(obj, TrapHandle):
+                obj.batch.kind.on_contact(player, obj.batch, obj.index)
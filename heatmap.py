@@ -0,0 +1,161 @@
+"""Per-level heatmaps of where players take damage, die and reach the goal.
+
+Reads the event file the game appends to when run with --analytics
+(EventLog in engine/analytics.py, fixed-size records) straight into a NumPy
+structured array. Each level's events are binned with histogram2d into
+HEAT_CELL pixel cells, blurred a little, log scaled and drawn over a render
+of the whole level. One PNG per level is written to the output folder, and the event counts by kind and
+the most common causes of death are printed.
+
+Usage:
+    python heatmap.py                       # analytics/events_v1.bin -> analytics/heatmap_level_N.png
+    python heatmap.py --kinds death damage  # leave out goal completions
+    python heatmap.py --synthetic 5000000   # random events instead of the file, to time it
+"""
+import os
+import sys
+import time
+import argparse
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # configure() in main() opens a window
+
+import numpy as np
+import pygame
+
+import mario_offbrand as game
+from engine.config import configure
+from engine.analytics import EVENT_CAUSES, EVENT_DEATH, EVENT_DIR, EVENT_FILE, EVENT_KINDS, EVENT_RECORD
+
+# Same layout as EVENT_RECORD
+EVENT_DTYPE = np.dtype([("kind", "u1"), ("cause", "u1"), ("level", "<u2"),
+                        ("x", "<i4"), ("y", "<i4"), ("tick", "<u4")])
+assert EVENT_DTYPE.itemsize == EVENT_RECORD.size
+
+IMAGE_SIZE = (2400, 480)
+HEAT_CELL = 24 # World pixels per histogram cell
+BLUR_RADIUS = 2 # In cells
+MIN_HEAT = 0.02 # Cells below this share of the hottest one stay clear
+
+
+# --- Events ---
+def read_events(path):
+    return np.fromfile(path, dtype=EVENT_DTYPE)
+
+
+def synthetic_events(count, seed=0):
+    """count random events over every level, bunched around a few hot spots
+    per level the way real deaths bunch around traps."""
+    rng = np.random.default_rng(seed)
+    levels = len(game.level_definitions)
+    events = np.zeros(count, dtype=EVENT_DTYPE)
+    events["level"] = rng.integers(0, levels, count)
+    events["kind"] = rng.integers(0, len(EVENT_KINDS), count)
+    events["cause"] = rng.integers(0, len(EVENT_CAUSES), count)
+    spots = rng.uniform((0, game.HEIGHT // 4), (1, game.HEIGHT), size=(levels, 8, 2))
+    extents = np.array([level_extent(i) for i in range(levels)])
+    spots[..., 0] = extents[:, :1] + spots[..., 0] * (extents[:, 1:] - extents[:, :1])
+    centres = spots[events["level"], rng.integers(0, 8, count)]
+    events["x"] = centres[:, 0] + rng.normal(0, 60, count)
+    events["y"] = centres[:, 1] + rng.normal(0, 30, count)
+    events["tick"] = rng.integers(0, game.FPS * 120, count)
+    return events
+
+
+def level_extent(level_index):
+    return game.level_extent(game.load_level(level_index)[1])
+
+
+def summarize(events):
+    """'12 damage, 3 death, 1 goal; deaths: fall 2, spike 1'"""
+    kinds = np.bincount(events["kind"], minlength=len(EVENT_KINDS))
+    text = ", ".join(f"{count:,} {name}" for name, count in zip(EVENT_KINDS, kinds))
+    deaths = np.bincount(events["cause"][events["kind"] == EVENT_DEATH],
+                         minlength=len(EVENT_CAUSES))
+    top = [i for i in np.argsort(deaths)[::-1][:3] if deaths[i]]
+    if top:
+        text += "; deaths: " + ", ".join(f"{EVENT_CAUSES[i]} {deaths[i]:,}" for i in top)
+    return text
+
+
+# --- Heat ---
+def box_blur(grid, radius):
+    """Mean over a (2 * radius + 1) square around each cell, via running sums."""
+    size = 2 * radius + 1
+    for axis in (0, 1):
+        pad = [(0, 0), (0, 0)]
+        pad[axis] = (radius + 1, radius) # The extra leading zero makes sums[i + size] - sums[i] a window
+        sums = np.moveaxis(np.cumsum(np.pad(grid, pad), axis=axis), axis, 0)
+        grid = np.moveaxis((sums[size:] - sums[:-size]) / size, 0, axis)
+    return grid
+
+
+def heat_grid(x, y, left, top, right, bottom):
+    """Event counts per HEAT_CELL cell of the world rect, shape (rows, columns), smoothed."""
+    columns = max(1, int((right - left) // HEAT_CELL))
+    rows = max(1, int((bottom - top) // HEAT_CELL))
+    grid, _, _ = np.histogram2d(y, x, bins=(rows, columns), range=((top, bottom), (left, right)))
+    # Twice is close enough to a Gaussian
+    return box_blur(box_blur(grid, BLUR_RADIUS), BLUR_RADIUS)
+
+
+def heat_colors(grid):
+    """Log scaled heat as RGBA: clear, then yellow through to red."""
+    heat = np.log1p(grid)
+    heat /= heat.max() or 1
+    rgba = np.zeros(grid.shape + (4,), dtype=np.uint8)
+    rgba[..., 0] = 255
+    rgba[..., 1] = 255 * (1 - heat)
+    rgba[..., 3] = np.where(heat > MIN_HEAT, 60 + 170 * heat, 0)
+    return rgba
+
+
+def render_heatmap(level_index, events):
+    """The level with its events' heat drawn over it."""
+    image, scale, (left, top) = game.render_level_overview(level_index, IMAGE_SIZE)
+    # Only the level itself is heated, from its left edge (often left of x=0) to its right
+    world_left, world_right = level_extent(level_index)
+    rgba = heat_colors(heat_grid(events["x"], events["y"], world_left, 0, world_right, game.HEIGHT))
+    overlay = pygame.image.frombuffer(rgba.tobytes(), rgba.shape[1::-1], "RGBA")
+    x = round(left + world_left * scale)
+    size = (round(left + world_right * scale) - x, round(game.HEIGHT * scale))
+    image.blit(pygame.transform.smoothscale(overlay, size), (x, top))
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Draw per-level heatmaps of the game's analytics events")
+    parser.add_argument("path", nargs="?", default=EVENT_FILE, help="event file")
+    parser.add_argument("--kinds", nargs="+", choices=EVENT_KINDS, default=EVENT_KINDS)
+    parser.add_argument("--out", default=EVENT_DIR, help="folder for the PNGs")
+    parser.add_argument("--synthetic", type=int, metavar="COUNT", help="use COUNT random events instead")
+    args = parser.parse_args()
+    configure(muted=True)
+
+    started = time.perf_counter()
+    if args.synthetic:
+        events = synthetic_events(args.synthetic)
+    elif os.path.isfile(args.path):
+        events = read_events(args.path)
+    else:
+        print(f"No events at {args.path}, play a level with --analytics first")
+        sys.exit(1)
+    loaded = time.perf_counter()
+    wanted = [EVENT_KINDS.index(kind) for kind in args.kinds]
+    events = events[np.isin(events["kind"], wanted)]
+    print(f"{len(events):,} events ({', '.join(args.kinds)}) read in {loaded - started:.2f}s")
+
+    os.makedirs(args.out, exist_ok=True)
+    for level_index in range(len(game.level_definitions)):
+        level_events = events[events["level"] == level_index]
+        label = f"Level {level_index + 1}"
+        if not len(level_events):
+            print(f"{label}: no events")
+            continue
+        path = os.path.join(args.out, f"heatmap_level_{level_index + 1}.png")
+        pygame.image.save(render_heatmap(level_index, level_events), path)
+        print(f"{label}: {summarize(level_events)} -> {path}")
+    print(f"Done in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,471 @@
+"""Offline reachability / solvability checker for level_definitions.
+
+Explores the states the player can reach from player_start breadth-first,
+using the batch simulator's copy of the jump, double-jump and gravity
+rules. Each layer picks one of six inputs (nothing, left, right, with or
+without jump) for every state and holds it for STEP_TICKS ticks, all in
+vectorised calls. States are pruned through a quantised key (see
+state_keys()): a state is dropped when one with the same key and no more
+jumps used was already reached, in this layer or an earlier one.
+
+States that can't reach the goal within a tick bound are pruned too: the
+player (riding a platform or not) covers at most max_speed() pixels a
+tick, so the distance left to the goal gives a lower bound on the ticks
+left. The bound starts at that distance from player_start and is raised
+until the goal is found. The input sequence found is a solution, not the
+shortest one: states that share a quantised key are merged, so it can
+take detours (waiting, stepping back) an exact search wouldn't. A level
+is only unreachable (at the key's resolution) if a pass ends without
+pruning anything.
+
+Layers that grow past LAYER_LIMIT states keep only the ones nearest the
+goal. A pass that had to do that runs once more with the whole MAX_TICKS
+bound, and if it finds nothing the level is reported as not found rather
+than unreachable.
+
+What is modelled: terrain blocks, moving and falling platforms (where each
+is at every tick, and every branch's own copy of the falling ones), static
+damaging traps (touching one ends that branch), trampolines, fans and the
+goal. Branches that land where two platforms meet are dropped, as the game
+picks one of them arbitrarily. Moving traps, arrows, enemies and floor
+speed changes are ignored.
+
+Every input sequence found is then replayed through the game's own
+Player, Level and handle_move() (moving platforms, traps and enemies
+included). A level only counts as reachable if that replay gets to the
+goal; otherwise it is reported as unverified.
+
+Levels are checked at the same time on a multiprocessing pool, one per
+worker; a single level spreads its layers over the pool instead,
+CHUNK_SIZE states at a time. On one core the four built-in levels take
+about 13 s together, most of it level 4 (around 600k states); levels
+without platforms take a second or two. With a worker per level the whole
+check takes about as long as level 4.
+
+Usage:
+    python level_checker.py            # every level
+    python level_checker.py 2 3 -j 4   # levels 2 and 3 (1-based), 4 processes
+"""
+import os
+import sys
+import time
+import argparse
+from multiprocessing import Pool
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # configure() in main() opens a window
+
+import numpy as np
+import pygame
+
+import mario_offbrand as game
+from engine.config import configure
+from engine.entities import Goal
+from engine.traps import TrapSystem
+from batch_sim import BatchSimulator, HITBOX, PLAYER_SIZE
+
+# (left, right, jump) for each action, and how the input sequence prints them
+ACTIONS = [(False, False, False), (True, False, False), (False, True, False),
+           (False, False, True), (True, False, True), (False, True, True)]
+ACTION_NAMES = ["wait", "left", "right", "jump", "left+jump", "right+jump"]
+
+MAX_TICKS = game.FPS * 30
+STEP_TICKS = 4 # Inputs are chosen every STEP_TICKS ticks and held in between
+CHUNK_SIZE = 5000 # States stepped per call (and per job on the pool)
+LAYER_LIMIT = 50000 # States kept per layer, the ones nearest the goal
+
+# Resolution of the state keys (see state_keys())
+X_BUCKET = 8
+Y_BUCKET = 8
+VEL_BUCKET = 2
+FALL_BUCKET = 15
+TICK_BUCKET = 16
+
+
+# --- Level Geometry ---
+def static_traps(level_data):
+    """Sorts the level's static traps into (hazards, bounces, lifts).
+
+    hazards are opaque bounds of damaging traps, bounces (rect, power) the
+    opaque bounds of trampolines and lifts (rect, power) the air column
+    above fans."""
+    traps = TrapSystem()
+    for fire_data in level_data.get("fires", []):
+        traps.add("fire", fire_data[0], fire_data[1], align=False)
+    for pos in level_data.get("spikes", []):
+        traps.add("spike", pos[0], pos[1])
+    for trap_data in level_data.get("traps", []):
+        params = trap_data[3] if len(trap_data) > 3 else {}
+        traps.add(trap_data[0], trap_data[1], trap_data[2], **params)
+
+    hazards, bounces, lifts = [], [], []
+    for batch in traps.batches.values():
+        kind = batch.kind
+        if kind.motion != "static":
+            continue
+        power = kind.params.get("power", 0)
+        for handle in batch.handles:
+            if kind.contact == "lift":
+                lifts.append((handle.contact_rect, power))
+                continue
+            bounds = handle.mask.get_bounding_rects()
+            rect = bounds[0].move(handle.rect.topleft) if bounds else handle.rect
+            if kind.contact.startswith("damage"):
+                hazards.append(rect)
+            elif kind.contact == "bounce":
+                bounces.append((rect, power))
+    return hazards, bounces, lifts
+
+
+def goal_rect(level_data):
+    goal = Goal(*level_data["goal"])
+    bounds = goal.mask.get_bounding_rects()
+    return bounds[0].move(goal.rect.topleft) if bounds else goal.rect
+
+
+def frame_overlaps(x, y, rect):
+    """Overlap of the whole 64x64 player frame (what sensor traps test)."""
+    size = PLAYER_SIZE
+    return (x < rect.right) & (x + size > rect.left) & (y < rect.bottom) & (y + size > rect.top)
+
+
+def body_overlaps(x, y, rect):
+    inset_x, inset_y, width, height = HITBOX
+    left = x + inset_x
+    top = y + inset_y
+    return (left < rect.right) & (left + width > rect.left) & (top < rect.bottom) & (top + height > rect.top)
+
+
+# --- State Keys ---
+def state_keys(simulator, tick, states):
+    """One bytes key per state (in BatchSimulator.FIELDS order), so visited
+    states can live in a dict. jump_count is left out: states that only
+    differ in it are compared by dominate() instead.
+
+    The key is deliberately coarser than the state: x and y in X_BUCKET and
+    Y_BUCKET pixel steps, y_vel in VEL_BUCKET steps and fall_count (which
+    only matters through min(1, fall_count / FPS)) in FALL_BUCKET tick steps
+    up to FPS. Facing, the tick and the falling platforms only matter for
+    landing on platforms, so they're left out on levels without any; the
+    tick counts modulo the moving platforms' period in TICK_BUCKET steps,
+    each falling platform by whether it still waits, falls or is gone.
+    The animation count is left out. States that only differ below that
+    resolution are treated as the same, so a found path is checked by
+    replay()."""
+    fields = dict(zip(BatchSimulator.FIELDS, states))
+    columns = [fields["x"] // X_BUCKET, fields["y"] // Y_BUCKET, np.sign(fields["x_vel"]),
+               np.floor(fields["y_vel"] / VEL_BUCKET), np.minimum(fields["fall_count"], game.FPS) // FALL_BUCKET]
+    platforms = simulator.platforms
+    if platforms.moving or platforms.falling:
+        columns += [fields["right"], np.full(len(fields["x"]), tick % platforms.period // TICK_BUCKET)]
+        columns += [np.minimum(fields["stood_on"], 1), np.sign(fields["drop"]), np.sign(fields["respawn"])]
+    table = np.ascontiguousarray(np.column_stack(columns).astype(np.int64))
+    return table.view(np.dtype((np.void, table.shape[1] * 8))).ravel()
+
+
+def dominate(keys, jump_count, seen, visited):
+    """Indices of the states worth keeping: per key the one with the fewest
+    jumps used (it can do anything the others can), and only if no state
+    with that key and as few jumps is in seen or visited (key -> fewest
+    jumps). Adds the kept ones to seen."""
+    if not len(keys):
+        return np.zeros(0, dtype=np.int64)
+    keys, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.lexsort((jump_count, inverse))
+    first = order[np.r_[True, np.diff(inverse[order]) != 0]] # Fewest jumps per key
+    keep = []
+    for key, index in zip(keys.tolist(), first.tolist()):
+        jumps = int(jump_count[index])
+        if jumps < min(seen.get(key, 3), visited.get(key, 3)): # 3: more than a double jump
+            seen[key] = jumps
+            keep.append(index)
+    return np.array(keep, dtype=np.int64)
+
+
+def max_speed(simulator):
+    """Most pixels a tick the player can move sideways: walking, plus riding
+    the fastest moving platform the same way."""
+    return game.PLAYER_VEL + simulator.platforms.max_speed
+
+
+def carry_zones(simulator):
+    """Merged (left, right) ranges of rect.x where a moving platform may carry
+    the player sideways, padded by a tick of the fastest move so a carried
+    tick never ends outside them."""
+    speed = max_speed(simulator)
+    zones = []
+    for index, (_, path) in enumerate(simulator.platforms.moving):
+        if np.ptp(path[:, 0]):
+            left, right = simulator.platforms.moving_range(index)
+            zones.append((left - PLAYER_SIZE - speed, right + speed))
+    merged = []
+    for left, right in sorted(zones):
+        if merged and left <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], right)
+        else:
+            merged.append([left, right])
+    return merged
+
+
+def ticks_to_goal(x, goal, zones, speed):
+    """Lower bound on the ticks before a player at rect.x x can touch the goal
+    with its body: walking covers PLAYER_VEL pixels a tick, riding a moving
+    platform (only inside zones) at most speed."""
+    inset, width = HITBOX[0], HITBOX[2]
+    near = goal.left - inset - width + 1 # Closest rect.x that touches from the left...
+    far = goal.right - inset - 1 # ...and from the right
+    start = np.minimum(x, np.clip(x, near, far))
+    end = np.maximum(x, np.clip(x, near, far))
+    fast = np.zeros_like(x)
+    for left, right in zones:
+        fast += np.maximum(0, np.minimum(end, right) - np.maximum(start, left))
+    slow = end - start - fast
+    walk = game.PLAYER_VEL
+    return -(-(walk * fast + speed * slow) // (walk * speed))
+
+
+# --- Search ---
+_workers = {} # level index -> (simulator, static traps, goal) cached per process
+
+
+def _level_context(level_index):
+    if level_index not in _workers:
+        level_data = game.level_definitions[level_index]
+        simulator = BatchSimulator(level_data, 1)
+        _workers[level_index] = (simulator, static_traps(level_data), goal_rect(level_data))
+    return _workers[level_index]
+
+
+def apply_traps(simulator, bounces, lifts):
+    """Trampolines and fans, as TrapSystem.apply_contacts() applies them."""
+    x, y = simulator.x, simulator.y
+    for rect, power in bounces:
+        hit = body_overlaps(x, y, rect) & (simulator.y_vel > 0)
+        simulator.y_vel = np.where(hit, -game.Player.GRAVITY * power, simulator.y_vel)
+        simulator.fall_count = np.where(hit, 0, simulator.fall_count)
+        simulator.jump_count = np.where(hit, 1, simulator.jump_count)
+    for rect, power in lifts:
+        hit = frame_overlaps(x, y, rect)
+        lifted = np.maximum(simulator.y_vel - power, -game.Player.GRAVITY * 8)
+        simulator.y_vel = np.where(hit, lifted, simulator.y_vel)
+        simulator.fall_count = np.where(hit, 0, simulator.fall_count)
+
+
+def expand(level_index, tick, states):
+    """Steps every state in a layer (all at tick) under all six actions.
+
+    Returns (new states, parent index, action, goal reached) arrays with
+    dead branches (fell out of the level, touched a hazard, landed where
+    platforms meet) removed."""
+    simulator, (hazards, bounces, lifts), goal = _level_context(level_index)
+    count = len(states[0])
+    actions = len(ACTIONS)
+    simulator.set_state(*(field.repeat(actions, axis=0) for field in states), tick=tick)
+    left = np.tile([a[0] for a in ACTIONS], count)
+    right = np.tile([a[1] for a in ACTIONS], count)
+    jump = np.tile([a[2] for a in ACTIONS], count)
+    no_jump = np.zeros_like(jump)
+
+    alive = np.ones(count * actions, dtype=bool)
+    reached = np.zeros(count * actions, dtype=bool)
+    for tick in range(STEP_TICKS):
+        # Jump is a key press, so it only happens on the first tick of the step
+        simulator.step(left, right, jump if tick == 0 else no_jump)
+        apply_traps(simulator, bounces, lifts)
+        x, y = simulator.x, simulator.y
+        alive &= (y <= simulator.bottom) & ~simulator.ambiguous
+        for rect in hazards:
+            alive &= ~body_overlaps(x, y, rect)
+        reached |= alive & body_overlaps(x, y, goal)
+
+    parent = np.arange(count).repeat(actions)
+    action = np.tile(np.arange(actions), count)
+    return tuple(field[alive] for field in simulator.fields()), parent[alive], action[alive], reached[alive]
+
+
+def _expand_chunk(job):
+    return expand(*job)
+
+
+def search(level_index, pool=None, max_ticks=MAX_TICKS):
+    """Searches with a rising tick bound (see the module docstring); returns
+    (per-tick inputs, states explored, exhaustive) where inputs is None if
+    the goal wasn't found in max_ticks, and exhaustive is False if that
+    may only be because layers were cut to LAYER_LIMIT."""
+    simulator, _, goal = _level_context(level_index)
+    level_data = game.level_definitions[level_index]
+    reach = (carry_zones(simulator), max_speed(simulator))
+    bound = int(ticks_to_goal(np.array([level_data["player_start"][0]]), goal, *reach)[0])
+    explored = 0
+    while True:
+        inputs, visited, pruned, capped = bounded_search(level_index, pool, min(bound, max_ticks), reach)
+        explored += visited
+        if inputs is not None or (pruned is None and not capped) or bound >= max_ticks:
+            return inputs, explored, not capped
+        if capped:
+            bound = max_ticks # A little more time won't get past the cut, so try once with all of it
+        else:
+            # Failed passes are cheap, so step past the smallest pruned bound
+            bound = max(pruned, bound + max(2 * STEP_TICKS, bound // 20))
+
+
+def bounded_search(level_index, pool, bound, reach):
+    """Breadth-first search, one layer per STEP_TICKS ticks, dropping states
+    that can't touch the goal within bound ticks (reach is the zones and
+    speed for ticks_to_goal()). Returns (per-tick inputs or None, states
+    kept, smallest bound that would have kept a pruned state or None if
+    nothing was pruned, whether a layer was cut to LAYER_LIMIT).
+
+    Layers are stepped CHUNK_SIZE states at a time, on the pool if there is
+    one. A state's key holds the tick modulo the platforms' period, so it
+    can only come back that many ticks later; keys are only remembered past
+    their layer if that's within bound. States are deduplicated by
+    state_keys() and dominate()."""
+    simulator, _, goal = _level_context(level_index)
+    period = simulator.platforms.period
+    layer = BatchSimulator(game.level_definitions[level_index], 1).fields()
+    visited = {state_keys(simulator, 0, layer).tolist()[0]: 0}
+    history = [] # Per layer: (parent index, action) of every state kept in it
+    kept = 1
+    pruned = None
+    capped = False
+
+    for step in range(bound // STEP_TICKS + 1):
+        tick = step * STEP_TICKS
+        offsets = range(0, len(layer[0]), CHUNK_SIZE)
+        jobs = [(level_index, tick, tuple(field[i:i + CHUNK_SIZE] for field in layer)) for i in offsets]
+        seen = {} # Keys of this layer -> fewest jumps
+        parts = []
+        for offset, (states, parent, action, reached) in zip(offsets, (pool.imap if pool else map)(_expand_chunk, jobs)):
+            if reached.any():
+                hit = int(np.argmax(reached))
+                inputs = [int(action[hit])]
+                index = offset + int(parent[hit])
+                for parents, actions in reversed(history):
+                    inputs.append(int(actions[index]))
+                    index = int(parents[index])
+                return per_tick_inputs(inputs[::-1]), kept, pruned, capped
+
+            # Drop states that can't make it in time, then those seen before
+            needed = tick + STEP_TICKS + ticks_to_goal(states[0], goal, *reach)
+            late = needed > bound
+            if late.any():
+                earliest = int(needed[late].min())
+                pruned = earliest if pruned is None else min(pruned, earliest)
+            keep = np.flatnonzero(~late)
+            keys = state_keys(simulator, tick + STEP_TICKS, tuple(field[keep] for field in states))
+            keep = keep[dominate(keys, states[BatchSimulator.FIELDS.index("jump_count")][keep], seen, visited)]
+            parts.append((tuple(field[keep] for field in states), offset + parent[keep], action[keep]))
+
+        if not seen:
+            return None, kept, pruned, capped # Every branch died, looped back or ran out of time
+        if tick + STEP_TICKS + period <= bound:
+            visited.update(seen)
+        layer = tuple(np.concatenate([part[0][f] for part in parts]) for f in range(len(layer)))
+        history.append((np.concatenate([part[1] for part in parts]), np.concatenate([part[2] for part in parts])))
+        if len(layer[0]) > LAYER_LIMIT:
+            nearest = np.argsort(ticks_to_goal(layer[0], goal, *reach), kind="stable")[:LAYER_LIMIT]
+            layer = tuple(field[nearest] for field in layer)
+            history[-1] = tuple(field[nearest] for field in history[-1])
+            capped = True
+        kept += len(layer[0])
+
+    return None, kept, pruned, capped
+
+
+def per_tick_inputs(steps):
+    """Expands step actions to ticks: the action is held, jump only pressed once."""
+    inputs = []
+    for action in steps:
+        held = action - 3 if ACTIONS[action][2] else action # Same direction without jump
+        inputs += [action] + [held] * (STEP_TICKS - 1)
+    return inputs
+
+
+def describe_inputs(inputs):
+    """Collapses an input list into runs, e.g. 'right x12, right+jump, wait x3'."""
+    runs = []
+    for action in inputs:
+        if runs and runs[-1][0] == action:
+            runs[-1][1] += 1
+        else:
+            runs.append([action, 1])
+    return ", ".join(ACTION_NAMES[a] + (f" x{n}" if n > 1 else "") for a, n in runs)
+
+
+def replay(level_index, inputs):
+    """Plays per-tick inputs through the real game; True if the player reaches
+    the goal (within STEP_TICKS of the end) without dying or falling out."""
+    player, level = game.load_level(level_index)
+    for action in inputs + [0] * STEP_TICKS:
+        left, right, jump = ACTIONS[action]
+        if jump:
+            player.jump()
+        player.loop(game.FPS)
+        level.loop(player)
+        if game.handle_move(player, level, {pygame.K_LEFT: left, pygame.K_RIGHT: right}):
+            return True
+        if player.current_health <= 0 or player.rect.top > level.bottom:
+            return False
+    return False
+
+
+def check_level(level_index, pool=None):
+    started = time.perf_counter()
+    inputs, explored, exhaustive = search(level_index, pool)
+    return {
+        "level": level_index,
+        "reachable": inputs is not None,
+        "verified": inputs is not None and replay(level_index, inputs),
+        "inputs": inputs,
+        "exhaustive": exhaustive,
+        "explored": explored,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that every level's goal can be reached")
+    parser.add_argument("levels", nargs="*", type=int, help="1-based level numbers (default: all)")
+    parser.add_argument("-j", "--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    configure(muted=True)
+
+    levels = [n - 1 for n in args.levels] or list(range(len(game.level_definitions)))
+    pool = Pool(args.processes) if args.processes > 1 else None
+    if pool is None:
+        results = [check_level(level) for level in levels]
+    elif len(levels) == 1:
+        results = [check_level(levels[0], pool)] # Its layers go over the pool
+    else:
+        results = pool.map(check_level, levels) # One level per worker, at the same time
+    if pool is not None:
+        # close() rather than terminate(): SDL's SIGTERM handler in the workers ignores it
+        pool.close()
+        pool.join()
+
+    failed = False
+    for result in results:
+        label = f"Level {result['level'] + 1}"
+        stats = f"{result['explored']:,} states in {result['seconds']:.2f}s"
+        if result["reachable"]:
+            ticks = len(result["inputs"])
+            if result["verified"]:
+                print(f"{label}: goal reachable in {ticks} ticks ({ticks / game.FPS:.1f}s) - {stats}")
+            else:
+                failed = True
+                print(f"{label}: UNVERIFIED - found a {ticks} tick path but replaying it in the game "
+                      f"doesn't reach the goal - {stats}")
+            print(f"  {describe_inputs(result['inputs'])}")
+        elif result["exhaustive"]:
+            failed = True
+            print(f"{label}: GOAL UNREACHABLE - {stats}")
+        else:
+            failed = True
+            print(f"{label}: GOAL NOT FOUND - layers were cut to {LAYER_LIMIT:,} states, "
+                  f"so the search wasn't exhaustive - {stats}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
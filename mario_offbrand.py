@@ -1,21 +1,37 @@
 import os
+import sys
+import json
 import math
+import time
+import hashlib
+import queue
+import random
+import threading
 import pygame
+from collections import deque, namedtuple
+from multiprocessing.pool import ThreadPool
 from os import listdir
 from os.path import isfile, join
 
-pygame.init()
-pygame.font.init() # Initialize font module
-
-pygame.display.set_caption("Mario Offbrand")
-
-WIDTH, HEIGHT = 1000, 800
-FPS = 60
-PLAYER_VEL = 5
-BLOCK_SIZE = 96 # Make block size a global constant
-
-window = pygame.display.set_mode((WIDTH, HEIGHT))
-FONT = pygame.font.SysFont("comicsans", 30) # Font for UI
+# The engine package does the asset loading, entities, collision and drawing;
+# this script is the game on top of it (levels, HUD, modes, menus).
+from engine import adaptive, config
+from engine.config import BLOCK_SIZE, FPS, HEIGHT, PLAYER_VEL, WIDTH, configure
+from engine.assets import asset_files, discard_preloaded, draw_loading_screen, load_image, preload_assets
+from engine.audio import SOUND_GOAL, audio
+from engine.adaptive import QualityGovernor, report_quality_change
+from engine.entities import Block, FallingPlatform, Goal, MovingPlatform, Platform, Player
+from engine.traps import TRAP_KINDS, chain_image
+from engine.collectibles import FRUIT_NAMES, FruitField, fruit_row
+from engine.enemies import ENEMY_KINDS
+from engine.background import _backgrounds, background_layers, get_background, tile_surface
+from engine.rendering import BlitRecorder, SceneTarget, draw_text, draw_world, present_scene, scene_surface
+from engine.collision import handle_move
+from engine.level import Level, level_entries
+from engine.ghosts import GhostPlayback, GhostRecorder, load_ghosts
+from engine.analytics import EVENT_DAMAGE, EVENT_DEATH, EVENT_FILE, EVENT_GOAL, EventLog
+from engine.memory import MemoryTracker, format_memory_report, memory_usage
+from engine.telemetry import NO_SAMPLE, TELEMETRY_FILE, FrameStats, TelemetryWriter
 
 # Game States
 PLAYING = "playing"
@@ -23,612 +39,45 @@ LEVEL_TRANSITION = "transition"
 GAME_OVER = "game_over"
 GAME_WON = "game_won"
 
-# --- Asset Loading Functions ---
-
-def flip(sprites):
-    return [pygame.transform.flip(sprite, True, False) for sprite in sprites]
-
-def load_sprite_sheets(dir1, dir2, width, height, direction=False):
-    path = join("assets", dir1, dir2)
-    if not os.path.exists(path):
-        print(f"Warning: Path not found {path}")
-        return {} # Return empty if path doesn't exist
-    try:
-        images = [f for f in listdir(path) if isfile(join(path, f)) and f.lower().endswith(".png")]
-    except FileNotFoundError:
-        print(f"Error: Directory not found: {path}")
-        return {}
-
-
-    all_sprites = {}
-
-    for image in images:
-        try:
-            sprite_sheet = pygame.image.load(join(path, image)).convert_alpha()
-
-            sprites = []
-            sheet_width = sprite_sheet.get_width()
-            sheet_height = sprite_sheet.get_height() # Added for potential vertical spritesheets
-
-            # Assuming sprites are arranged horizontally for now
-            for i in range(sheet_width // width):
-                surface = pygame.Surface((width, height), pygame.SRCALPHA, 32)
-                rect = pygame.Rect(i * width, 0, width, height)
-                surface.blit(sprite_sheet, (0, 0), rect)
-                sprites.append(pygame.transform.scale2x(surface)) # Scale up 2x
-
-            sprite_name = image.replace(".png", "")
-            if direction:
-                all_sprites[sprite_name + "_right"] = sprites
-                all_sprites[sprite_name + "_left"] = flip(sprites)
-            else:
-                all_sprites[sprite_name] = sprites
-        except pygame.error as e:
-            print(f"Error loading image {join(path, image)}: {e}")
-        except Exception as e:
-             print(f"An unexpected error occurred loading {join(path, image)}: {e}")
 
+def startup_manifest():
+    """What main() loads before the first level: the player and the level
+    select's art, decoded in parallel before the first Player and the menu
+    ask for them."""
+    return (asset_files("MainCharacters", "NinjaFrog") + [join("assets", "Background", "Blue.png")]
+            + [join("assets", "Menu", "Buttons", f"{name}.png") for name in ("Close", "Previous", "Next", "Play")])
 
-    return all_sprites
-
-# Function to load a single scaled image
-def load_scaled_image(path, scale_factor=2):
-    try:
-        image = pygame.image.load(path).convert_alpha()
-        size = image.get_size()
-        scaled_size = (size[0] * scale_factor, size[1] * scale_factor)
-        return pygame.transform.scale(image, scaled_size)
-    except pygame.error as e:
-        print(f"Error loading or scaling image {path}: {e}")
-        # Return a placeholder surface if loading fails
-        placeholder = pygame.Surface((32 * scale_factor, 32 * scale_factor), pygame.SRCALPHA)
-        placeholder.fill((255, 0, 255)) # Bright pink to indicate missing asset
-        return placeholder
-    except Exception as e:
-        print(f"An unexpected error occurred loading {path}: {e}")
-        placeholder = pygame.Surface((32 * scale_factor, 32 * scale_factor), pygame.SRCALPHA)
-        placeholder.fill((255, 0, 255))
-        return placeholder
-
-
-def get_block(size):
-    path = join("assets", "Terrain", "Terrain.png")
-    try:
-        image = pygame.image.load(path).convert_alpha()
-        # Use a different block appearance (e.g., the one at 96, 64 in the spritesheet)
-        surface = pygame.Surface((size, size), pygame.SRCALPHA, 32)
-        # Coordinates might need adjustment based on the actual Terrain.png layout
-        # rect = pygame.Rect(96, 0, size, size) # Original brown block
-        rect = pygame.Rect(192, 0, size, size) # Example: Trying a different terrain piece if available
-        surface.blit(image, (0, 0), rect)
-        return pygame.transform.scale2x(surface)
-    except pygame.error as e:
-        print(f"Error loading block from {path}: {e}")
-        surface = pygame.Surface((size * 2, size * 2), pygame.SRCALPHA)
-        surface.fill((100, 100, 100)) # Grey placeholder
-        return surface
-    except IndexError:
-         print(f"Error: Rect coordinates out of bounds for {path}. Using default block.")
-         surface = pygame.Surface((size * 2, size * 2), pygame.SRCALPHA)
-         surface.fill((100, 100, 100))
-         return surface
-
-
-# --- Game Object Classes ---
-
-class Player(pygame.sprite.Sprite):
-    COLOR = (255, 0, 0)
-    GRAVITY = 1
-    SPRITES = load_sprite_sheets("MainCharacters", "NinjaFrog", 32, 32, True)
-    ANIMATION_DELAY = 3
-    MAX_HEALTH = 3
-    INVINCIBILITY_DURATION = 1.5 # Seconds of invincibility after hit
-
-    def __init__(self, x, y, width, height):
-        super().__init__()
-        self.starting_pos = (x, y) # Store starting position for reset
-        self.rect = pygame.Rect(x, y, width, height)
-        self.x_vel = 0
-        self.y_vel = 0
-        self.mask = None
-        self.direction = "right" # Start facing right
-        self.animation_count = 0
-        self.fall_count = 0
-        self.jump_count = 0
-        self.hit = False
-        self.hit_count = 0
-
-        self.max_health = self.MAX_HEALTH
-        self.current_health = self.max_health
-        self.is_invincible = False
-        self.invincibility_timer = 0
-
-    def reset(self):
-        """Resets player to starting state for the level."""
-        self.rect.topleft = self.starting_pos
-        self.x_vel = 0
-        self.y_vel = 0
-        self.direction = "right"
-        self.animation_count = 0
-        self.fall_count = 0
-        self.jump_count = 0
-        self.hit = False
-        self.hit_count = 0
-        self.current_health = self.max_health
-        self.is_invincible = False
-        self.invincibility_timer = 0
-        self.update_sprite() # Ensure correct sprite is set initially
-
-    def jump(self):
-        # Allow jump only if on ground or haven't double jumped
-        if self.jump_count < 2:
-            self.y_vel = -self.GRAVITY * 8 # Consistent jump height
-            self.animation_count = 0
-            self.jump_count += 1
-            if self.jump_count == 1:
-                self.fall_count = 0 # Reset fall count on first jump
-
-    def move(self, dx, dy):
-        self.rect.x += dx
-        self.rect.y += dy
-
-    def take_damage(self, amount=1):
-        """Reduces health if not invincible."""
-        if not self.is_invincible:
-            self.current_health -= amount
-            self.hit = True # Trigger hit animation
-            self.hit_count = 0
-            self.is_invincible = True
-            self.invincibility_timer = 0 # Reset invincibility timer
-            # print(f"Player took damage! Health: {self.current_health}") # Debugging
-
-    def move_left(self, vel):
-        self.x_vel = -vel
-        if self.direction != "left":
-            self.direction = "left"
-            self.animation_count = 0
-
-    def move_right(self, vel):
-        self.x_vel = vel
-        if self.direction != "right":
-            self.direction = "right"
-            self.animation_count = 0
-
-    def loop(self, fps):
-        # --- Handle Invincibility ---
-        if self.is_invincible:
-            self.invincibility_timer += 1 / fps
-            if self.invincibility_timer >= self.INVINCIBILITY_DURATION:
-                self.is_invincible = False
-                self.invincibility_timer = 0
-                # Also ensure hit animation stops if invincibility ends
-                if self.hit and self.hit_count == 0: # Only stop if not already in hit animation cycle
-                     self.hit = False
-
-
-        # --- Handle Gravity ---
-        # Apply gravity based on fall_count for terminal velocity effect
-        self.y_vel += min(1, (self.fall_count / fps) * self.GRAVITY)
-        self.move(self.x_vel, self.y_vel)
-
-        # --- Handle Hit Animation ---
-        # This part seems redundant now that invincibility handles the state
-        # Let's keep it simple: hit animation plays once when take_damage is called
-        if self.hit:
-           self.hit_count += 1
-           # Make hit animation last ~0.5 seconds regardless of invincibility?
-           if self.hit_count > fps * 0.5:
-                self.hit = False
-                self.hit_count = 0
-
-
-        self.fall_count += 1
-        self.update_sprite()
-
-    def landed(self):
-        self.fall_count = 0
-        self.y_vel = 0
-        self.jump_count = 0
-
-    def hit_head(self):
-        # self.count = 0 # 'count' was not defined, maybe meant fall_count or animation_count?
-        self.fall_count = 0 # Reset fall count to prevent instant acceleration down
-        self.y_vel *= -0.5 # Bounce off slightly, reduced intensity
-
-    def update_sprite(self):
-        # Determine sprite sheet based on state
-        sprite_sheet = "idle"
-        if self.hit:
-            sprite_sheet = "hit"
-        elif self.y_vel < 0:
-            if self.jump_count == 1:
-                sprite_sheet = "jump"
-            elif self.jump_count >= 2: # Use double_jump for second jump and beyond
-                sprite_sheet = "double_jump"
-        elif self.y_vel > self.GRAVITY * 1.5: # Lower threshold for fall animation
-            sprite_sheet = "fall"
-        elif self.x_vel != 0:
-            sprite_sheet = "run"
-
-        # Get the correct list of sprites
-        sprite_sheet_name = sprite_sheet + "_" + self.direction
-        if not self.SPRITES or sprite_sheet_name not in self.SPRITES:
-             # print(f"Warning: Sprite key '{sprite_sheet_name}' not found. Defaulting to idle_right.")
-             # Fallback if sprites didn't load or key is missing
-             sprite_sheet_name = "idle_right"
-             if sprite_sheet_name not in self.SPRITES: # Absolute fallback
-                 self.sprite = pygame.Surface((self.rect.width, self.rect.height))
-                 self.sprite.fill(self.COLOR)
-                 self.update()
-                 return
-
-
-        sprites = self.SPRITES[sprite_sheet_name]
-        if not sprites: # Check if the list of sprites is empty
-            # print(f"Warning: Sprite list for '{sprite_sheet_name}' is empty.")
-            self.sprite = pygame.Surface((self.rect.width, self.rect.height))
-            self.sprite.fill(self.COLOR)
-            self.update()
-            return
-
-        # Select the current sprite index based on animation count
-        sprite_index = (self.animation_count // self.ANIMATION_DELAY) % len(sprites)
-        self.sprite = sprites[sprite_index]
-        self.animation_count += 1
-
-        # Update rect and mask
-        self.update()
-
-
-    def update(self):
-        # Adjust rect size based on the current sprite, keep position consistent (topleft)
-        current_pos = self.rect.topleft
-        self.rect = self.sprite.get_rect(topleft=current_pos)
-        self.mask = pygame.mask.from_surface(self.sprite)
-
-    def draw(self, win, offset_x):
-        # Optionally add visual feedback for invincibility (e.g., flashing)
-        if not hasattr(self, 'sprite') or not self.sprite:
-            # If sprite doesn't exist (shouldn't happen with proper init/update, but defensive)
-            # Draw a placeholder rectangle instead of crashing
-            placeholder_rect = self.rect.move(-offset_x, 0) # Adjust for scroll
-            pygame.draw.rect(win, self.COLOR, placeholder_rect)
-            # print("Warning: Player sprite missing, drawing placeholder.") # Optional debug
-            return # Stop here to avoid blitting non-existent sprite
-        if self.is_invincible:
-            # Flash every few frames
-            if pygame.time.get_ticks() % 200 < 100: # Adjust timing for desired flash speed
-                 return # Skip drawing this frame to create a flash effect
-        win.blit(self.sprite, (self.rect.x - offset_x, self.rect.y))
-
-        # Draw Health Hearts (simple version)
-        heart_img = load_scaled_image(join("assets", "Items", "Fruits", "Kiwi.png"), 1) # Example using Kiwi as heart
-        if heart_img:
-            heart_size = heart_img.get_width()
-            for i in range(self.current_health):
-                 win.blit(heart_img, (10 + i * (heart_size + 5), 10))
-
-
-class Object(pygame.sprite.Sprite):
-    def __init__(self, x, y, width, height, name=None):
-        super().__init__()
-        self.rect = pygame.Rect(x, y, width, height)
-        # Ensure image is created *before* setting mask
-        self.image = pygame.Surface((width, height), pygame.SRCALPHA)
-        self.width = width
-        self.height = height
-        self.name = name
-        # Set mask after image is potentially modified by subclasses
-        # self.mask = pygame.mask.from_surface(self.image) # Moved to subclasses
-
-    def draw(self, win, offset_x):
-        win.blit(self.image, (self.rect.x - offset_x, self.rect.y))
-
-    # Add a dummy loop method for compatibility if needed by main loop iteration
-    def loop(self, *args):
-        pass
-
-
-class Block(Object):
-    def __init__(self, x, y, size):
-        super().__init__(x, y, size * 2, size * 2) # Size is doubled due to scale2x in get_block
-        block_surface = get_block(size) # get_block now returns a 2x scaled surface
-        self.image.blit(block_surface, (0, 0))
-        self.mask = pygame.mask.from_surface(self.image)
-
-
-class Fire(Object):
-    ANIMATION_DELAY = 3
-
-    def __init__(self, x, y, width, height):
-        super().__init__(x, y, width * 2, height * 2, "fire") # Adjust size for scaling
-        # Load spritesheets expects original dimensions
-        self.fire_sprites = load_sprite_sheets("Traps", "Fire", width, height)
-        self.animation_count = 0
-        self.animation_name = "off" # Start off by default
-        # Set initial image and mask
-        if "off" in self.fire_sprites and self.fire_sprites["off"]:
-            self.image = self.fire_sprites["off"][0]
-        else:
-             # Fallback if sprites missing
-             self.image.fill((255,100,0, 150)) # Orange placeholder
-        self.mask = pygame.mask.from_surface(self.image)
-
-
-    def on(self):
-        self.animation_name = "on"
-
-    def off(self):
-        self.animation_name = "off"
-
-    def loop(self, *args): # Accept optional arguments like fps
-        if not self.fire_sprites or self.animation_name not in self.fire_sprites:
-            return # Cannot animate if sprites are missing
-
-        sprites = self.fire_sprites[self.animation_name]
-        if not sprites: return # Skip if specific animation list is empty
-
-        sprite_index = (self.animation_count // self.ANIMATION_DELAY) % len(sprites)
-        self.image = sprites[sprite_index]
-        self.animation_count += 1
-
-        # Update rect and mask (important if animation size changes, though unlikely here)
-        current_pos = self.rect.topleft
-        self.rect = self.image.get_rect(topleft=current_pos)
-        self.mask = pygame.mask.from_surface(self.image)
-
-        # Reset animation loop (optional, prevents huge numbers) - corrected logic
-        # if self.animation_count >= len(sprites) * self.ANIMATION_DELAY:
-        #      self.animation_count = 0 # Reset smoothly
-
-
-# --- New Trap: Spikes ---
-class Spike(Object):
-    def __init__(self, x, y, width=16, height=16): # Default size based on typical spike assets
-        # Assuming spikes point up, adjust position slightly if needed
-        # The loaded image will be scaled 2x
-        img_path = join("assets", "Traps", "Spikes", "Idle.png") # Use the static spike image
-        self.spike_img = load_scaled_image(img_path)
-        scaled_width = self.spike_img.get_width()
-        scaled_height = self.spike_img.get_height()
-        # Adjust y position so the base aligns with where it should be placed
-        adjusted_y = y + BLOCK_SIZE - scaled_height # Place it relative to block grid bottom
-
-        super().__init__(x, adjusted_y, scaled_width, scaled_height, "spike")
-        self.image.blit(self.spike_img, (0, 0))
-        self.mask = pygame.mask.from_surface(self.image)
-
-# --- Goal Object ---
-class Goal(Object):
-    def __init__(self, x, y, width=32, height=32): # Adjust size as needed
-         # Use a checkpoint or specific goal asset
-         img_path = join("assets", "Items", "Checkpoints", "End", "End (Idle).png")
-         self.goal_img = load_scaled_image(img_path)
-         scaled_width = self.goal_img.get_width()
-         scaled_height = self.goal_img.get_height()
-         # Adjust y position to align nicely
-         adjusted_y = y + BLOCK_SIZE - scaled_height
-
-         super().__init__(x, adjusted_y, scaled_width, scaled_height, "goal")
-         self.image.blit(self.goal_img, (0,0))
-         self.mask = pygame.mask.from_surface(self.image)
-
-
-# --- Background Handling ---
-def get_background(name):
-    try:
-        path = join("assets", "Background", name)
-        image = pygame.image.load(path).convert() # Use convert for performance
-        _, _, width, height = image.get_rect()
-
-        if width == 0 or height == 0:
-             print(f"Warning: Background image {name} has zero dimension.")
-             return [], pygame.Surface((WIDTH, HEIGHT)) # Return empty list and blank surface
-
-        tiles = []
-        # Ensure we cover the screen even if dimensions are small
-        for i in range(math.ceil(WIDTH / width)): # Use ceil to ensure coverage
-            for j in range(math.ceil(HEIGHT / height)):
-                pos = (i * width, j * height)
-                tiles.append(pos)
-
-        return tiles, image
-    except pygame.error as e:
-        print(f"Error loading background {name}: {e}")
-        # Return a plain color background as fallback
-        fallback_surface = pygame.Surface((WIDTH, HEIGHT))
-        fallback_surface.fill((100, 100, 200)) # Blueish fallback
-        return [(0, 0)], fallback_surface # Single tile covering screen
-    except Exception as e:
-         print(f"An unexpected error occurred loading background {name}: {e}")
-         fallback_surface = pygame.Surface((WIDTH, HEIGHT))
-         fallback_surface.fill((100, 100, 200))
-         return [(0, 0)], fallback_surface
-
-
-# --- Drawing Function ---
-def draw_text(window, text, font, color, x, y):
-    text_surface = font.render(text, True, color)
-    window.blit(text_surface, (x, y))
-
-def draw(window, background, bg_image, player, objects, offset_x, current_level, game_state):
-    # Draw background
-    for tile in background:
-        window.blit(bg_image, tile)
-
-    # Draw all objects
-    for obj in objects:
-        obj.draw(window, offset_x)
-
-    # Draw player (handles its own health display now)
-    player.draw(window, offset_x)
 
+# --- HUD ---
+def draw_hud(window, current_level, fruit_count, fruit_total, game_state):
     # Draw Level Number
-    draw_text(window, f"Level: {current_level + 1}", FONT, (255, 255, 255), 10, 50) # Below health
+    label = "Endless" if current_level == ENDLESS else current_level + 1
+    draw_text(window, f"Level: {label}", config.FONT, (255, 255, 255), 10, 50) # Below health
+    if current_level == ENDLESS: # Only the fruit near the screen are loaded, so no total
+        draw_text(window, f"Fruit: {fruit_count}", config.FONT, (255, 255, 255), 10, 90)
+    elif fruit_total:
+        draw_text(window, f"Fruit: {fruit_count}/{fruit_total}", config.FONT, (255, 255, 255), 10, 90)
 
     # --- Draw Game State Messages ---
     if game_state == GAME_OVER:
-        draw_text(window, "GAME OVER", FONT, (255, 0, 0), WIDTH // 2 - 100, HEIGHT // 2 - 50)
-        draw_text(window, "Press R to Restart", FONT, (255, 255, 255), WIDTH // 2 - 150, HEIGHT // 2)
+        draw_text(window, "GAME OVER", config.FONT, (255, 0, 0), WIDTH // 2 - 100, HEIGHT // 2 - 50)
+        draw_text(window, "Press R to Restart", config.FONT, (255, 255, 255), WIDTH // 2 - 150, HEIGHT // 2)
     elif game_state == GAME_WON:
-        draw_text(window, "YOU WON!", FONT, (0, 255, 0), WIDTH // 2 - 100, HEIGHT // 2 - 50)
-        draw_text(window, "Press Q to Quit", FONT, (255, 255, 255), WIDTH // 2 - 150, HEIGHT // 2)
+        draw_text(window, "YOU WON!", config.FONT, (0, 255, 0), WIDTH // 2 - 100, HEIGHT // 2 - 50)
+        draw_text(window, "Press Q to Quit", config.FONT, (255, 255, 255), WIDTH // 2 - 150, HEIGHT // 2)
     elif game_state == LEVEL_TRANSITION:
-         draw_text(window, f"Level {current_level + 1} Complete!", FONT, (255, 255, 0), WIDTH // 2 - 150, HEIGHT // 2 - 50)
+         draw_text(window, f"Level {current_level + 1} Complete!", config.FONT, (255, 255, 0), WIDTH // 2 - 150, HEIGHT // 2 - 50)
          # Optional: Add a small delay visual here
 
 
+def draw(window, player, level, offset_x, current_level, game_state):
+    scale = adaptive.quality.render_scale
+    surface = scene_surface(window, scale)
+    draw_world(window if surface is window else SceneTarget(surface, scale), player, level, offset_x)
+    present_scene(window, surface)
+    draw_hud(window, current_level, level.fruits.count, len(level.fruits), game_state)
     pygame.display.update()
 
-# --- Collision Handling ---
-def handle_vertical_collision(player, objects, dy):
-    collided_objects_data = [] # Store tuples of (object, collision_point) if needed later
-    original_bottom = player.rect.bottom # Store position before potential adjustment
-
-    # Check collision against all objects
-    for obj in objects:
-        if pygame.sprite.collide_mask(player, obj):
-            # --- Vertical Collision Logic ---
-            if dy > 0: # Player is moving down
-                 # If colliding while moving down, assume landing ON TOP of the object (if it's a block)
-                 # or hitting a trap from above.
-                if isinstance(obj, Block): # Check if it's a solid block
-                    # Force player's bottom to align with the object's top
-                    player.rect.bottom = obj.rect.top
-                    player.landed() # Reset vertical velocity, fall count, jump count
-                    collided_objects_data.append(obj) # Mark as collided vertically
-                    # print(f"Landed on Block at {obj.rect.topleft}") # Debug print
-
-                elif obj.name in ["fire", "spike"]:
-                    # Player landed on a trap
-                    if obj.name == "fire":
-                        if hasattr(obj, 'animation_name') and obj.animation_name == "on":
-                            player.take_damage(1)
-                    else: # Spike always deals damage
-                        player.take_damage(1)
-                    # Don't necessarily stop falling if landing on a trap (unless it's also a Block)
-                    # But add to collided list if needed
-                    collided_objects_data.append(obj)
-
-
-            elif dy < 0: # Player is moving up
-                if isinstance(obj, Block): # Check if it's a solid block
-                    # Force player's top to align with the object's bottom
-                    player.rect.top = obj.rect.bottom
-                    player.hit_head() # Reverse velocity, reset counters
-                    collided_objects_data.append(obj) # Mark as collided vertically
-                    # print(f"Hit Head on Block at {obj.rect.topleft}") # Debug print
-
-                elif obj.name in ["fire", "spike"]:
-                     # Player hit a trap from below
-                     if obj.name == "fire":
-                         if hasattr(obj, 'animation_name') and obj.animation_name == "on":
-                              player.take_damage(1)
-                     else: # Spike always deals damage
-                         player.take_damage(1)
-                     # Add to collided list if needed
-                     collided_objects_data.append(obj)
-
-
-            # --- Horizontal Collision Logic (Added Check) ---
-            # Sometimes vertical movement causes slight horizontal overlap too.
-            # Check if player is primarily overlapping horizontally after vertical adjustment.
-            # This might need further refinement if causing issues.
-            # else: # If dy == 0 or vertical adjustment didn't occur
-            if isinstance(obj, Block): # Only check against solid blocks here
-                 # Check horizontal overlap more carefully if no vertical collision was resolved
-                 # Use player's center x for clarity
-                 player_center_x = player.rect.centerx
-                 obj_center_x = obj.rect.centerx
-
-                 # Check if player center is within obj bounds horizontally after any vertical adjust
-                 if obj.rect.left < player.rect.centerx < obj.rect.right:
-                      # If we are here, it means mask collided, but not resolved vertically.
-                      # This could be a side collision during vertical movement.
-                      # Let the horizontal collision handle this more precisely if needed.
-                      # For now, just note the collision occurred.
-                      if obj not in collided_objects_data: # Avoid duplicates
-                            collided_objects_data.append(obj)
-                      # print(f"Side overlap with Block {obj.rect.topleft} during vertical check") # Debug print
-
-                 elif obj.name in ["fire", "spike"]: # Handle side collision with traps too
-                    if obj not in collided_objects_data:
-                        # Player brushed side of trap
-                        if obj.name == "fire":
-                            if hasattr(obj, 'animation_name') and obj.animation_name == "on":
-                                player.take_damage(1)
-                        else: # Spike always deals damage
-                            player.take_damage(1)
-                        collided_objects_data.append(obj)
-
-
-    # Re-check vertical position *after* iterating through all objects,
-    # as multiple collisions might occur. Ensure player isn't pushed below ground again.
-    # This part might be overly complex - let's rely on the per-object check for now.
-    # If issues persist, we might need a post-collision adjustment phase.
-
-    return collided_objects_data # Return list of objects collided with (useful for handle_move)
-
-
-def collide(player, objects, dx):
-    """Checks for horizontal collision *after* moving."""
-    player.move(dx, 0)
-    player.update() # Update mask after moving
-    collided_object = None
-    for obj in objects:
-        if pygame.sprite.collide_mask(player, obj):
-             # Check if it's a harmful object
-             if obj.name in ["fire", "spike"]:
-                 if obj.name == "fire":
-                     if hasattr(obj, 'animation_name') and obj.animation_name == "on":
-                          player.take_damage(1)
-                 else:
-                      player.take_damage(1)
-             # If it's a solid block, mark as collided
-             if isinstance(obj, Block):
-                  collided_object = obj
-                  break # Stop checking once a solid collision occurs
-
-    # Move back regardless of what was hit, prevents sticking
-    player.move(-dx, 0)
-    player.update()
-    return collided_object # Return only the *solid* object collided with horizontally
-
-
-# --- Movement Handling ---
-def handle_move(player, objects):
-    keys = pygame.key.get_pressed()
-
-    player.x_vel = 0 # Reset horizontal velocity each frame
-
-    # Check for horizontal collisions *before* applying movement
-    collide_left_obj = collide(player, objects, -PLAYER_VEL)
-    collide_right_obj = collide(player, objects, PLAYER_VEL) # collide now returns the solid object hit
-
-    # Apply horizontal movement based on keys and collisions
-    if keys[pygame.K_LEFT] and not collide_left_obj:
-        player.move_left(PLAYER_VEL)
-    if keys[pygame.K_RIGHT] and not collide_right_obj:
-        player.move_right(PLAYER_VEL)
-
-    # Handle vertical collisions *after* gravity/jump velocity is applied (in player.loop)
-    vertically_collided_objects = handle_vertical_collision(player, objects, player.y_vel)
-
-    # Check for collision with the goal (ensure it wasn't handled as a block collision)
-    goal_reached = False
-    for obj in objects: # Check all objects again for the goal specifically
-        if isinstance(obj, Goal) and pygame.sprite.collide_mask(player, obj):
-            goal_reached = True
-            # print("Goal Reached!") # Debug
-            break
-
-    # Damage for horizontal collisions (if not already handled vertically)
-    # Note: collide() function already handles damage for traps during its check
-    # We might not need extra checks here unless traps can only be hit horizontally.
-    # The current collide() handles damage on horizontal overlap test.
-
-    return goal_reached # Return True if goal is reached
-
 
 # --- Level Definitions ---
 # Define levels as dictionaries or lists of objects/parameters
@@ -658,6 +107,12 @@ level_definitions = [
              # Place spikes (x, y) - y adjusted automatically
              (BLOCK_SIZE * 6, HEIGHT - BLOCK_SIZE),
         ],
+        "fruits": [
+             # (name, x, y) - top-left of the fruit
+             *fruit_row("Apple", BLOCK_SIZE, HEIGHT - BLOCK_SIZE - 64, 3),
+             *fruit_row("Cherries", BLOCK_SIZE * 5, HEIGHT - BLOCK_SIZE * 5 - 64, 2, spacing=48),
+             *fruit_row("Kiwi", BLOCK_SIZE * 7, HEIGHT - BLOCK_SIZE * 5 - 64, 3),
+        ],
         "goal": (BLOCK_SIZE * 9, HEIGHT - BLOCK_SIZE * 5) # Goal Position (x, y)
     },
     # --- LEVEL 2 ---
@@ -689,159 +144,1158 @@ level_definitions = [
              # Spike on platform
              (BLOCK_SIZE * 11, HEIGHT - BLOCK_SIZE * 4), # Added difficulty
          ],
+         "fruits": [
+             *fruit_row("Bananas", BLOCK_SIZE * 5, HEIGHT - BLOCK_SIZE * 3 - 64, 2),
+             *fruit_row("Orange", BLOCK_SIZE * 8, HEIGHT - BLOCK_SIZE - 64, 6),
+             ("Strawberry", BLOCK_SIZE * 12, HEIGHT - BLOCK_SIZE * 7 - 64),
+         ],
+         "enemies": [
+             # (kind, x, y) - stands on the block at (x, y)
+             ("patrol", BLOCK_SIZE * 13, HEIGHT - BLOCK_SIZE),
+         ],
          "goal": (BLOCK_SIZE * 14, HEIGHT - BLOCK_SIZE * 2) # Goal further away
+    },
+    # --- LEVEL 3 ---
+    {
+        "background": "Green.png",
+        "player_start": (50, HEIGHT - BLOCK_SIZE * 2),
+        "blocks": [
+            # Floor
+            *[(i * BLOCK_SIZE, HEIGHT - BLOCK_SIZE) for i in range(-2, 30)],
+            # Walls: the first needs the trampoline, the second the fan
+            *[(BLOCK_SIZE * 11, HEIGHT - BLOCK_SIZE * i) for i in range(2, 5)],
+            *[(BLOCK_SIZE * 18, HEIGHT - BLOCK_SIZE * i) for i in range(2, 5)],
+        ],
+        "traps": [
+            # (kind, x, y) or (kind, x, y, {params}) - y is the grid cell like spikes
+            *[("mud", BLOCK_SIZE * 3 + i * 32, HEIGHT - BLOCK_SIZE) for i in range(6)],
+            ("saw", BLOCK_SIZE * 6, HEIGHT - BLOCK_SIZE * 2, {"span": BLOCK_SIZE * 2}),
+            ("trampoline", BLOCK_SIZE * 10, HEIGHT - BLOCK_SIZE * 2),
+            *[("ice", BLOCK_SIZE * 12 + i * 32, HEIGHT - BLOCK_SIZE) for i in range(12)],
+            ("spike_head", BLOCK_SIZE * 15, HEIGHT - BLOCK_SIZE * 6, {"span": BLOCK_SIZE * 2}),
+            ("fan", BLOCK_SIZE * 17 + 24, HEIGHT - BLOCK_SIZE * 2),
+            ("arrow", BLOCK_SIZE * 20, HEIGHT - BLOCK_SIZE * 4),
+            ("rock_head", BLOCK_SIZE * 21, HEIGHT - BLOCK_SIZE * 6, {"span": BLOCK_SIZE * 2}),
+            ("spiked_ball", BLOCK_SIZE * 23 + 48, HEIGHT - BLOCK_SIZE * 4),
+        ],
+        "fruits": [
+            *fruit_row("Melon", BLOCK_SIZE, HEIGHT - BLOCK_SIZE - 64, 9),
+            *fruit_row("Pineapple", BLOCK_SIZE * 12, HEIGHT - BLOCK_SIZE - 64, 9),
+            *fruit_row("Apple", BLOCK_SIZE * 19, HEIGHT - BLOCK_SIZE - 64, 10),
+        ],
+        "enemies": [
+            ("patrol", BLOCK_SIZE * 8, HEIGHT - BLOCK_SIZE),
+            ("chaser", BLOCK_SIZE * 25, HEIGHT - BLOCK_SIZE),
+        ],
+        "goal": (BLOCK_SIZE * 26, HEIGHT - BLOCK_SIZE * 2)
+    },
+    # --- LEVEL 4 ---
+    {
+        "background": "Pink.png",
+        "player_start": (50, HEIGHT - BLOCK_SIZE * 2),
+        "blocks": [
+            # Floor islands over two pits
+            *[(i * BLOCK_SIZE, HEIGHT - BLOCK_SIZE) for i in range(-2, 3)],
+            *[(i * BLOCK_SIZE, HEIGHT - BLOCK_SIZE) for i in range(9, 13)],
+            *[(i * BLOCK_SIZE, HEIGHT - BLOCK_SIZE) for i in range(19, 25)],
+            # Ledge for the goal
+            (BLOCK_SIZE * 23, HEIGHT - BLOCK_SIZE * 2),
+            (BLOCK_SIZE * 23, HEIGHT - BLOCK_SIZE * 3),
+            (BLOCK_SIZE * 24, HEIGHT - BLOCK_SIZE * 2),
+            (BLOCK_SIZE * 24, HEIGHT - BLOCK_SIZE * 3),
+        ],
+        "platforms": [
+            # (x, y) or (x, y, {span_x, span_y, speed}) - moves from (x, y) to (x + span_x, y + span_y) and back
+            (BLOCK_SIZE * 3, HEIGHT - BLOCK_SIZE * 2, {"span_x": BLOCK_SIZE * 5, "speed": 2}),
+            (BLOCK_SIZE * 21, HEIGHT - BLOCK_SIZE * 4, {"span_y": BLOCK_SIZE * 2, "speed": 2}),
+        ],
+        "falling_platforms": [
+            (BLOCK_SIZE * 13 + 32, HEIGHT - BLOCK_SIZE * 2),
+            (BLOCK_SIZE * 15, HEIGHT - BLOCK_SIZE * 2 - 32),
+            (BLOCK_SIZE * 16 + 64, HEIGHT - BLOCK_SIZE * 2),
+        ],
+        "spikes": [
+            (BLOCK_SIZE * 11, HEIGHT - BLOCK_SIZE * 2),
+        ],
+        "fruits": [
+            *fruit_row("Cherries", BLOCK_SIZE * 4, HEIGHT - BLOCK_SIZE * 3, 5),
+            *fruit_row("Kiwi", BLOCK_SIZE * 13 + 32, HEIGHT - BLOCK_SIZE * 3, 5),
+        ],
+        "enemies": [
+            ("chaser", BLOCK_SIZE * 10, HEIGHT - BLOCK_SIZE),
+        ],
+        "goal": (BLOCK_SIZE * 24, HEIGHT - BLOCK_SIZE * 4)
     }
 ]
 
+
 # --- Level Loading Function ---
 def load_level(level_index):
     if level_index >= len(level_definitions):
         print("Error: Level index out of bounds!")
-        return None, None, None, None # Indicate error
+        return None # Indicate error
 
     level_data = level_definitions[level_index]
 
-    # Load Background
-    background, bg_image = get_background(level_data["background"])
-
     # Create Player
     player_start_pos = level_data["player_start"]
     # Assuming player sprite is roughly 32x32, scaled to 64x64
     player = Player(player_start_pos[0], player_start_pos[1], 64, 64) # Use scaled size
 
-    # Create Blocks
-    blocks = [Block(pos[0], pos[1], BLOCK_SIZE // 2) for pos in level_data["blocks"]] # Pass original size
+    # Background, blocks, traps, platforms, enemies, fruit and the goal
+    return player, Level(level_data)
+
 
-    # Create Fires
-    fires = []
-    for fire_data in level_data.get("fires", []): # Use .get for safety
-         fire = Fire(fire_data[0], fire_data[1], fire_data[2], fire_data[3])
-         fire.on() # Make fires active by default in levels
-         fires.append(fire)
+def level_manifest(level_index):
+    """Image files loading level_index will read that no cache has yet (for preload_assets())."""
+    level_data = level_definitions[level_index]
+    entries = level_entries(level_data)
+    paths = []
+    if Goal._image is None:
+        paths.append(Goal.IMAGE_PATH)
+    if not Block._shared:
+        paths.append(join("assets", "Terrain", "Terrain.png"))
+    if level_data["background"] not in _backgrounds:
+        paths.append(join("assets", "Background", level_data["background"]))
+    if FruitField._sprites is None:
+        paths += asset_files("Items", "Fruits")
+    for entry in entries:
+        if entry[0] == "trap":
+            kind = TRAP_KINDS.get(entry[3])
+            if kind is not None and kind.sprites is None and kind.loader is None: # Custom loaders pick their own files
+                paths += asset_files("Traps", kind.folder)
+        elif entry[0] == "enemy":
+            kind = ENEMY_KINDS.get(entry[3])
+            if kind is not None and kind.sprites is None:
+                paths += asset_files("MainCharacters", kind.skin)
+        elif entry[0] in ("platform", "falling_platform"):
+            platform = MovingPlatform if entry[0] == "platform" else FallingPlatform
+            if (platform.FOLDER, platform.SHEET) not in Platform._sprites:
+                paths += asset_files("Traps", platform.FOLDER)
+    return paths
+
+
+# --- Dev Mode: Level Files ---
+# With --dev-levels[=DIR] (default "levels"), DIR/NN.json replaces level NN
+# (1-based; one past the last built-in level adds a level) at startup, and a
+# LevelWatcher thread polls those files for edits. The Simulation applies an
+# edited level between ticks; the current level is patched in place by
+# Level.reload(), so the player and camera stay put. --export-levels[=DIR]
+# writes the built-in levels out as files to start from.
+
+DEV_LEVEL_DIR = "levels"
+REQUIRED_LEVEL_KEYS = ("background", "player_start", "blocks", "goal")
+
+
+def level_file_path(directory, level_index):
+    return join(directory, f"{level_index + 1:02}.json")
+
+
+def _level_file_index(name):
+    stem, extension = os.path.splitext(name)
+    return int(stem) - 1 if extension == ".json" and stem.isdigit() else None
+
+
+def read_level_file(path):
+    """Level data from a JSON file, or None (after saying why) if it can't be used."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e: # A half-saved file shows up here; the next save retries
+        print(f"Error reading level file {path}: {e}")
+        return None
+    missing = [key for key in REQUIRED_LEVEL_KEYS if key not in data]
+    if missing:
+        print(f"Error: level file {path} is missing {', '.join(missing)}")
+        return None
+    return data
+
+
+def set_level_definition(level_index, data):
+    if level_index < len(level_definitions):
+        level_definitions[level_index] = data
+    elif level_index == len(level_definitions):
+        level_definitions.append(data)
+    else:
+        print(f"Warning: ignoring level {level_index + 1}, level {len(level_definitions) + 1} has to come first")
+        return False
+    return True
+
+
+def load_level_files(directory):
+    """Applies every DIR/NN.json to level_definitions; returns {path: mtime} for the watcher."""
+    mtimes = {}
+    if not os.path.isdir(directory):
+        print(f"Warning: level directory '{directory}' not found")
+        return mtimes
+    for name in sorted(listdir(directory)):
+        level_index = _level_file_index(name)
+        if level_index is None:
+            continue
+        path = join(directory, name)
+        mtimes[path] = os.stat(path).st_mtime_ns
+        data = read_level_file(path)
+        if data is not None:
+            set_level_definition(level_index, data)
+    return mtimes
+
+
+def export_level_files(directory):
+    """Writes level_definitions to DIR/NN.json, one key per line."""
+    os.makedirs(directory, exist_ok=True)
+    for level_index, data in enumerate(level_definitions):
+        lines = [f"  {json.dumps(key)}: {json.dumps(value)}" for key, value in data.items()]
+        with open(level_file_path(directory, level_index), "w") as f:
+            f.write("{\n" + ",\n".join(lines) + "\n}\n")
+    print(f"Wrote {len(level_definitions)} levels to {directory}")
+
+
+class LevelWatcher(threading.Thread):
+    """Polls a level directory and queues (level index, data) for files that changed."""
+
+    def __init__(self, directory, mtimes, interval=0.5):
+        super().__init__(name="level watcher", daemon=True)
+        self.directory = directory
+        self.mtimes = mtimes # path -> st_mtime_ns last seen
+        self.interval = interval
+        self.changes = queue.Queue()
+        self.stopping = threading.Event()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            try:
+                names = listdir(self.directory)
+            except OSError:
+                continue # Directory briefly gone (e.g. being replaced)
+            for name in names:
+                level_index = _level_file_index(name)
+                if level_index is None:
+                    continue
+                path = join(self.directory, name)
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                if self.mtimes.get(path) == mtime:
+                    continue
+                self.mtimes[path] = mtime
+                data = read_level_file(path)
+                if data is not None:
+                    self.changes.put((level_index, data))
+
+
+# --- Endless Mode ---
+# Run with --endless[=seed]. The course is built from chunks that come from
+# generate_chunks(), a seeded generator: runs of ground blocks at different
+# heights with pits between them, fire and spikes on the longer runs and
+# fruit above. Each chunk is checked against the player's jump (see
+# jump_trajectory()) and re-rolled if a gap, step up or row of traps is out
+# of reach. A ChunkProducer thread runs the generator ahead into a small
+# bounded queue. EndlessRun takes chunks off it without waiting as the
+# camera nears the end of the course, and removes chunks from the Level
+# once they are well off the left of the screen, so the level never grows.
+
+ENDLESS = -1 # current_level_index (and music track) in endless mode
+ENDLESS_LEVEL = {"background": "Gray.png", "player_start": (BLOCK_SIZE, HEIGHT - BLOCK_SIZE * 2), "blocks": []}
+CHUNK_COLUMNS = 16 # Block columns per chunk, give or take a run
+CHUNK_QUEUE = 4 # Chunks the producer may get ahead
+CHUNK_ATTEMPTS = 20 # Re-rolls before falling back to flat ground
+ENDLESS_ROWS = 3 # Highest run, in blocks above the floor
+ENDLESS_LOOKAHEAD = WIDTH # Course kept built past the right of the screen...
+ENDLESS_KEEP = WIDTH // 2 # ...and past the left before chunks are released
+LANDING_MARGIN = BLOCK_SIZE // 2 # Sideways room kept in hand on every jump
+HEIGHT_MARGIN = 16 # Headroom kept over the highest step up
+
+Run = namedtuple("Run", "column length row hazards") # hazards: ((column in run, trap kind), ...)
+Chunk = namedtuple("Chunk", "right entries fruits") # entries as level_entries() makes them
+
+
+def jump_trajectory():
+    """(x, height, y_vel) per tick of a double jump at full speed, the second
+    jump at the top of the first, moving the way Player.loop() does."""
+    x = height = fall_count = 0
+    y_vel = -Player.GRAVITY * 8
+    doubled = False
+    points = []
+    while height > -HEIGHT:
+        y_vel += min(1, (fall_count / FPS) * Player.GRAVITY)
+        height -= y_vel
+        x += PLAYER_VEL
+        fall_count += 1
+        points.append((x, height, y_vel))
+        if not doubled and y_vel >= 0:
+            y_vel = -Player.GRAVITY * 8 # jump() doesn't reset fall_count the second time
+            doubled = True
+    return points
+
+
+JUMP_TRAJECTORY = jump_trajectory()
+JUMP_PEAK = max(height for _, height, _ in JUMP_TRAJECTORY)
+
+
+def jump_reach(rise):
+    """How far across (px) the player can get while coming down onto a
+    ledge rise px above the take off (negative: below), or None if it's
+    too high."""
+    if rise > JUMP_PEAK - HEIGHT_MARGIN:
+        return None
+    return max(x for x, height, y_vel in JUMP_TRAJECTORY if y_vel > 0 and height >= rise) - LANDING_MARGIN
+
+
+def passable(previous, runs):
+    """True if the player can get from the end of previous across runs."""
+    for run in runs:
+        gap = (run.column - previous.column - previous.length) * BLOCK_SIZE
+        reach = jump_reach((run.row - previous.row) * BLOCK_SIZE)
+        if reach is None or gap > reach:
+            return False
+        columns = sorted(column for column, _ in run.hazards)
+        if columns:
+            if columns[0] == 0 or columns[-1] == run.length - 1:
+                return False # Nowhere safe to land or take off
+            if (columns[-1] - columns[0] + 1) * BLOCK_SIZE > jump_reach(0):
+                return False # Traps have to be cleared in one jump from the block before them
+        previous = run
+    return True
+
+
+def random_runs(rng, previous):
+    """About CHUNK_COLUMNS columns of runs following previous, not yet checked."""
+    runs = []
+    column = previous.column + previous.length
+    row = previous.row
+    end = column + CHUNK_COLUMNS
+    while column < end:
+        gap = rng.choice((0, 0, 1, 1, 2, 3))
+        row = max(0, min(ENDLESS_ROWS, row + rng.choice((-2, -1, 0, 0, 1, 1, 2))))
+        length = rng.randint(2, 6)
+        hazards = ()
+        if length >= 4 and rng.random() < 0.6:
+            width = rng.randint(1, 2)
+            start = rng.randint(1, length - 1 - width)
+            kind = rng.choice(("fire", "spike"))
+            hazards = tuple((start + i, kind) for i in range(width))
+        runs.append(Run(column + gap, length, row, hazards))
+        column += gap + length
+    return runs
+
+
+def build_chunk(runs, rng):
+    entries, fruits = [], []
+    for run in runs:
+        hazards = dict(run.hazards)
+        top = HEIGHT - BLOCK_SIZE * (run.row + 1)
+        for i in range(run.length):
+            x = (run.column + i) * BLOCK_SIZE
+            for y in range(top, HEIGHT, BLOCK_SIZE): # Down to the floor
+                entries.append(("block", x, y))
+            if hazards.get(i) == "fire":
+                entries.append(("trap", x + BLOCK_SIZE // 3, top - 64, "fire", False, ()))
+            elif hazards.get(i) == "spike":
+                entries.append(("trap", x + BLOCK_SIZE // 3, top - BLOCK_SIZE, "spike", None, ()))
+        if rng.random() < 0.5:
+            fruits += fruit_row(rng.choice(FRUIT_NAMES), run.column * BLOCK_SIZE + 16,
+                                top - BLOCK_SIZE * 2, run.length, spacing=BLOCK_SIZE)
+    last = runs[-1]
+    return Chunk((last.column + last.length) * BLOCK_SIZE, entries, fruits)
+
+
+def generate_chunks(seed):
+    """Yields Chunks left to right, forever. The first is flat ground to start on."""
+    rng = random.Random(seed)
+    previous = Run(-4, CHUNK_COLUMNS + 4, 0, ()) # From off the left of the screen
+    yield build_chunk([previous], rng)
+    while True:
+        for _ in range(CHUNK_ATTEMPTS):
+            runs = random_runs(rng, previous)
+            if passable(previous, runs):
+                break
+        else:
+            runs = [Run(previous.column + previous.length, CHUNK_COLUMNS, previous.row, ())]
+        yield build_chunk(runs, rng)
+        previous = runs[-1]
+
+
+class ChunkProducer(threading.Thread):
+    """Runs generate_chunks() ahead of the game into a bounded queue."""
+
+    def __init__(self, seed):
+        super().__init__(name="chunk producer", daemon=True)
+        self.chunks = queue.Queue(maxsize=CHUNK_QUEUE)
+        self.seed = seed
+        self.stopping = threading.Event()
+
+    def run(self):
+        for chunk in generate_chunks(self.seed):
+            while not self.stopping.is_set():
+                try:
+                    self.chunks.put(chunk, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass # Far enough ahead, wait for the game to take one
+            if self.stopping.is_set():
+                return
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+
+
+class EndlessRun:
+    """The player and Level of an endless run, holding only the chunks near the camera."""
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.player = Player(*ENDLESS_LEVEL["player_start"], 64, 64)
+        self.level = Level(ENDLESS_LEVEL)
+        self.chunks = deque() # (chunk, indices of its fruit in level.fruits)
+        self.right = 0 # End of the course built so far
+        self.producer = ChunkProducer(seed)
+        self.producer.start()
+        while self.right < WIDTH + ENDLESS_LOOKAHEAD: # Waiting is fine while loading
+            self.add(self.producer.chunks.get())
+
+    def update(self, offset_x):
+        """Called every tick. Never waits for the producer: a chunk that
+        isn't ready yet is picked up on a later tick."""
+        while self.right < offset_x + WIDTH + ENDLESS_LOOKAHEAD:
+            try:
+                chunk = self.producer.chunks.get_nowait()
+            except queue.Empty:
+                break
+            self.add(chunk)
+        while self.chunks and self.chunks[0][0].right < offset_x - ENDLESS_KEEP:
+            self.release()
+
+    def add(self, chunk):
+        for entry in chunk.entries:
+            self.level.add_entry(entry)
+        fruits = [self.level.fruits.add(*fruit) for fruit in chunk.fruits]
+        self.chunks.append((chunk, [i for i in fruits if i is not None]))
+        self.right = chunk.right
+
+    def release(self):
+        """Drops the oldest chunk. Fruit picked up in it stay in the HUD's count."""
+        chunk, fruits = self.chunks.popleft()
+        for entry in chunk.entries:
+            self.level.remove_entry(entry)
+        for i in fruits:
+            self.level.fruits.remove(i)
+
+    def stop(self):
+        self.producer.stop()
+
+
+# --- Simulation ---
+class Simulation:
+    """The running game: current level, player, game state and scroll offset.
+
+    handle_key() takes KEYDOWN events (F9 prints a memory report at any
+    time) and step() advances one fixed tick.
+    main() drives it directly, or from a SimulationThread in threaded mode."""
+    SCROLL_AREA_WIDTH = 200
+
+    def __init__(self, memory_report=False, level_index=0, level_changes=None, endless_seed=None, analytics=None,
+                 leak_check=False):
+        self.current_level_index = level_index
+        self.game_state = PLAYING
+        self.offset_x = 0
+        self.tick = 0
+        self.player = None
+        self.level = None
+        self.recorder = None # Ghost of the current attempt at the level
+        self.level_start = 0 # Tick the current level was loaded on
+        self.loads = 0 # Level loads and reloads so far, and whether one is running now:
+        self.loading = False # the quality governor skips the frames they stall
+        self.events = EventLog(analytics) if analytics else None # Only with --analytics
+        self.memory = MemoryTracker(memory_report, leak_check)
+        self.level_changes = level_changes # Queue of (level index, data) from a LevelWatcher
+        self.endless = None # EndlessRun in endless mode
+        if endless_seed is not None:
+            self.running = self.start_endless(endless_seed)
+        else:
+            self.running = self.load_level(level_index, draw_loading_screen)
+
+    def load_level(self, level_index, progress=None):
+        self.loading = True
+        self.loads += 1
+        try:
+            return self._load_level(level_index, progress)
+        finally:
+            self.loading = False
+
+    def _load_level(self, level_index, progress):
+        if self.events is not None:
+            self.events.flush()
+        self.stop_endless()
+        if 0 <= level_index < len(level_definitions):
+            preload_assets(level_manifest(level_index), progress)
+        load_result = load_level(level_index)
+        discard_preloaded()
+        if load_result is None:
+            print(f"Error loading level {level_index + 1}")
+            return False
+        self.current_level_index = level_index
+        self.level_start = self.tick
+        self.offset_x = 0 # Reset scroll
+        self.player, self.level = load_result
+        self.level.ghosts = GhostPlayback(load_ghosts(level_index))
+        self.recorder = GhostRecorder(level_index)
+        self.memory.record(level_index, self.player, self.level)
+        audio.load_level(level_index)
+        return True
+
+    def start_endless(self, seed):
+        self.stop_endless()
+        print(f"Endless run, seed {seed}")
+        self.loads += 1
+        self.endless = EndlessRun(seed)
+        self.current_level_index = ENDLESS
+        self.level_start = self.tick
+        self.offset_x = 0
+        self.player, self.level = self.endless.player, self.endless.level
+        self.level.ghosts = GhostPlayback([])
+        self.recorder = None # Nothing to race on a course that's different every time
+        audio.load_level(ENDLESS)
+        return True
+
+    def stop_endless(self):
+        if self.endless is not None:
+            self.endless.stop()
+            self.endless = None
+
+    def handle_key(self, key):
+        if key == pygame.K_F9:
+            print(format_memory_report(memory_usage(self.player, self.level)))
+        elif self.game_state == PLAYING:
+            if key == pygame.K_SPACE: # Keep jump control simple
+                self.player.jump()
+        elif self.game_state == GAME_OVER:
+            if key == pygame.K_r: # Restart game from level 1, or the same endless course
+                self.game_state = PLAYING
+                if self.endless is not None:
+                    self.running = self.start_endless(self.endless.seed)
+                else:
+                    self.running = self.load_level(0)
+        elif self.game_state == GAME_WON:
+            if key == pygame.K_q: # Quit game
+                self.running = False
+
+    def apply_level_change(self, level_index, data):
+        started = time.perf_counter()
+        if not set_level_definition(level_index, data):
+            return
+        if level_index != self.current_level_index:
+            print(f"Level {level_index + 1} updated")
+            return
+        self.loads += 1
+        added, removed = self.level.reload(data, self.player)
+        print(f"Reloaded level {level_index + 1}: {added} added, {removed} removed "
+              f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def step(self, keys=None):
+        self.tick += 1
+        if self.level_changes is not None:
+            while not self.level_changes.empty(): # Between ticks, so nothing sees a half-patched level
+                self.apply_level_change(*self.level_changes.get_nowait())
+        if self.game_state != PLAYING:
+            return
+        player = self.player
+        health = player.current_health
+
+        # Update Player
+        player.loop(FPS)
+
+        # Update platforms (carrying the player) and traps, one batch per kind
+        self.level.loop(player)
+
+        # Handle Movement and Goal Check
+        goal_reached = handle_move(player, self.level, keys)
+        if self.recorder is not None:
+            self.recorder.record(player)
+        self.level.ghosts.loop()
+
+        if player.rect.top > self.level.bottom: # Fell out of the level
+            player.current_health = 0
+            player.damage_cause = "fall"
+        elif player.current_health < health:
+            self.log_event(EVENT_DAMAGE, player.damage_cause)
+
+        # Check for Death
+        if player.current_health <= 0:
+            self.log_event(EVENT_DEATH, player.damage_cause)
+            self.game_state = GAME_OVER
+            # No need to reset here, GAME_OVER state handles display/restart
+            return
 
+        # Check for Level Completion
+        if goal_reached:
+            self.log_event(EVENT_GOAL)
+            self.recorder.finish()
+            audio.play(SOUND_GOAL)
+            if self.current_level_index + 1 < len(level_definitions):
+                # Optional: Add a brief transition state/delay (LEVEL_TRANSITION)
+                self.running = self.load_level(self.current_level_index + 1)
+            else:
+                self.game_state = GAME_WON # All levels completed
+            return
 
-    # Create Spikes
-    spikes = [Spike(pos[0], pos[1]) for pos in level_data.get("spikes", [])]
+        # Update scroll offset
+        if ((player.rect.right - self.offset_x >= WIDTH - self.SCROLL_AREA_WIDTH) and player.x_vel > 0):
+            self.offset_x += player.x_vel
+        elif ((player.rect.left - self.offset_x <= self.SCROLL_AREA_WIDTH) and player.x_vel < 0):
+            self.offset_x += player.x_vel # x_vel is negative, so this subtracts
 
-    # Create Goal
-    goal_pos = level_data["goal"]
-    goal = Goal(goal_pos[0], goal_pos[1])
+        if self.endless is not None:
+            self.endless.update(self.offset_x)
 
-    # Combine all objects
-    objects = [*blocks, *fires, *spikes, goal] # Goal is also an object for drawing/collision
+    def log_event(self, kind, cause=None):
+        if self.events is None:
+            return
+        if self.endless is not None:
+            return # Positions on a generated course don't add up across runs
+        x, y = self.player.rect.midbottom
+        self.events.log(kind, cause, self.current_level_index, x, min(y, self.level.bottom),
+                        self.tick - self.level_start)
+
+    def draw(self, window):
+        draw(window, self.player, self.level, self.offset_x, self.current_level_index, self.game_state)
+
+    def snapshot(self):
+        recorder = BlitRecorder(adaptive.quality.render_scale)
+        draw_world(recorder, self.player, self.level, self.offset_x)
+        return RenderSnapshot(self.tick, recorder.scale, recorder.clear, tuple(recorder.blits),
+                              self.current_level_index, self.level.fruits.count,
+                              len(self.level.fruits), self.game_state)
+
+
+# --- Threaded Simulation ---
+# Optional mode (run with --threaded): the simulation ticks at FPS on a worker
+# thread and the main thread only handles events and renders. After every
+# tick the worker publishes a RenderSnapshot, an immutable list of the blits
+# that tick would make, so a slow frame on the main thread no longer delays
+# physics, and blitting (which releases the GIL) overlaps with the next tick.
+
+RenderSnapshot = namedtuple("RenderSnapshot",
+                            "tick scale clear blits current_level fruit_count fruit_total game_state")
+
+
+class SnapshotBuffer:
+    """Double buffer of RenderSnapshots: the simulation thread fills the back
+    slot and flips, the render thread reads the front one. Snapshots are
+    never modified once published, so a reader can keep using one after a flip."""
+
+    def __init__(self, snapshot):
+        self._slots = [snapshot, snapshot]
+        self._front = 0
+        self._lock = threading.Lock()
+
+    def publish(self, snapshot):
+        back = 1 - self._front
+        self._slots[back] = snapshot
+        with self._lock:
+            self._front = back
+
+    def latest(self):
+        with self._lock:
+            return self._slots[self._front]
+
+
+class SimulationThread(threading.Thread):
+    """Runs a Simulation at a fixed tick and publishes a snapshot after each one."""
+
+    def __init__(self, simulation, buffer):
+        super().__init__(name="simulation", daemon=True)
+        self.simulation = simulation
+        self.buffer = buffer
+        self.key_presses = queue.Queue() # KEYDOWN keys, handled before the next tick
+        self.keys = pygame.key.get_pressed() # Held keys, replaced by the main thread every frame
+        self.stopping = threading.Event()
+        self.step_ms = 0.0 # How long the last tick took, for FrameStats
+
+    def run(self):
+        tick_length = 1 / FPS
+        next_tick = time.perf_counter()
+        while self.simulation.running and not self.stopping.is_set():
+            started = time.perf_counter()
+            while not self.key_presses.empty():
+                self.simulation.handle_key(self.key_presses.get_nowait())
+            self.simulation.step(self.keys)
+            self.buffer.publish(self.simulation.snapshot())
+            self.step_ms = (time.perf_counter() - started) * 1000
+
+            next_tick += tick_length
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                self.stopping.wait(delay)
+            else:
+                next_tick = time.perf_counter() # Fell behind: carry on rather than run a burst of ticks
 
-    return player, objects, background, bg_image
+
+def render_snapshot(window, snapshot):
+    surface = scene_surface(window, snapshot.scale)
+    if snapshot.clear is not None:
+        surface.fill(snapshot.clear)
+    surface.blits(snapshot.blits, doreturn=False)
+    present_scene(window, surface)
+    draw_hud(window, snapshot.current_level, snapshot.fruit_count, snapshot.fruit_total, snapshot.game_state)
+    pygame.display.update()
+
+
+def option_value(argv, name, default):
+    """default for a bare --name, the value for --name=value, None if absent."""
+    for arg in argv:
+        if arg == name:
+            return default
+        if arg.startswith(name + "="):
+            return arg.split("=", 1)[1]
+    return None
+
+
+# --- Level Select ---
+# Shown before the game starts. Each level_definitions entry gets a card with
+# its number (assets/Menu/Levels) and a miniature of the level. Miniatures
+# are rendered on a small thread pool using the normal level loading and
+# drawing code, and saved under THUMBNAIL_DIR keyed by a hash of the level's
+# data, so later menus just load the PNGs (also on the pool). The main
+# thread loads all the art first; workers then render one at a time, as
+# pygame locks a surface while it is blitted or masked and the levels share
+# their sprites. Cards show a placeholder until their miniature arrives.
+
+THUMBNAIL_SIZE = (360, 120)
+THUMBNAIL_DIR = join(".cache", "thumbnails")
+THUMBNAIL_VERSION = 3 # Bump when the miniatures' look changes to ignore old files
+THUMBNAIL_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+
+_level_art_lock = threading.Lock()
+_level_art_ready = False
+_thumbnail_render_lock = threading.Lock()
+
+
+def thumbnail_key(level_data):
+    return hashlib.sha1(repr((THUMBNAIL_VERSION, THUMBNAIL_SIZE, level_data)).encode()).hexdigest()
+
+
+def load_level_art():
+    """Fills every shared sprite cache load_level() reads, for every level,
+    once and on the calling thread (the main one: converting needs the
+    display), so other threads only ever read them and never load or
+    convert an image. Used before thumbnail jobs and the simulation thread
+    start."""
+    global _level_art_ready
+    with _level_art_lock:
+        if _level_art_ready:
+            return
+        Player.load_sprites()
+        for kind in TRAP_KINDS.values():
+            kind.load()
+            if kind.motion == "swing":
+                chain_image(kind.folder)
+        for kind in ENEMY_KINDS.values():
+            kind.load()
+        Block(0, 0, BLOCK_SIZE // 2)
+        MovingPlatform(0, 0)
+        FallingPlatform(0, 0)
+        Goal.load_image()
+        FruitField([])
+        for level_data in level_definitions:
+            background_layers(level_data["background"])
+        _level_art_ready = True
+
+
+def _draw_thumbnail_strip(target, player, level, offset_x):
+    # draw_world() without the player's health, and the background fixed to the level
+    for layer in level.background:
+        layer.draw(target, offset_x, factor=1)
+    for obj in level.objects:
+        obj.draw(target, offset_x)
+    level.traps.draw(target, offset_x)
+    level.enemies.draw(target, offset_x)
+    level.fruits.draw(target, offset_x)
+    target.blit(player.sprite, (player.rect.x - offset_x, player.rect.y))
+
+
+def render_level_thumbnail(level_index):
+    """The whole level scaled down to fit THUMBNAIL_SIZE."""
+    return render_level_overview(level_index, THUMBNAIL_SIZE)[0]
+
+
+def level_extent(level):
+    """(left, right) world x of everything in level, at least the first screen.
+    Levels may start left of x=0 (their floors do)."""
+    left = min([obj.rect.left for obj in level.objects] +
+               [handle.rect.left for handle in level.traps.handles()] + [0])
+    right = max([obj.rect.right for obj in level.objects] +
+                [handle.rect.right for handle in level.traps.handles()] + [WIDTH])
+    return left, right
+
+
+def render_level_overview(level_index, size):
+    """The whole level scaled down to fit size, centred.
+
+    Returns (image, scale, (left, top)), where a world position (x, y) lands
+    at (left + x * scale, top + y * scale). Drawn one screen-wide strip at a
+    time, since the drawing code culls everything outside the screen at the
+    given offset."""
+    load_level_art()
+    player, level = load_level(level_index)
+    player.update_sprite()
+    left_edge, right = level_extent(level)
+    scale = min(size[0] / (right - left_edge), size[1] / HEIGHT)
+    left = (size[0] - (right - left_edge) * scale) // 2 - left_edge * scale
+    top = (size[1] - HEIGHT * scale) // 2
+    height = round(HEIGHT * scale)
+
+    thumbnail = pygame.Surface(size)
+    thumbnail.fill(level.bg_color)
+    start = round(left + left_edge * scale)
+    thumbnail.set_clip(pygame.Rect(start, top, round(left + right * scale) - start, height))
+    strip = pygame.Surface((WIDTH // config.RENDER_SCALE, HEIGHT // config.RENDER_SCALE))
+    target = strip if config.RENDER_SCALE == 1 else SceneTarget(strip)
+    for offset_x in range(left_edge, right, WIDTH):
+        _draw_thumbnail_strip(target, player, level, offset_x)
+        x = round(left + offset_x * scale)
+        width = round(left + (offset_x + WIDTH) * scale) - x # So neighbouring strips meet exactly
+        thumbnail.blit(pygame.transform.smoothscale(strip, (width, height)), (x, top))
+    thumbnail.set_clip(None)
+    return thumbnail, scale, (left, top)
+
+
+def _thumbnail_job(level_index, cancelled):
+    """Pool job: (level_index, thumbnail) from the disk cache or freshly rendered."""
+    if cancelled.is_set():
+        return level_index, None
+    path = join(THUMBNAIL_DIR, thumbnail_key(level_definitions[level_index]) + ".png")
+    if isfile(path):
+        try:
+            return level_index, pygame.image.load(path)
+        except pygame.error as e:
+            print(f"Error loading cached thumbnail {path}: {e}") # Render it again below
+
+    with _thumbnail_render_lock:
+        thumbnail = render_level_thumbnail(level_index)
+    try:
+        os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+        temp_path = f"{path[:-4]}-{threading.get_ident()}.tmp.png" # Keep .png: save() picks the format from it
+        pygame.image.save(thumbnail, temp_path)
+        os.replace(temp_path, path) # Readers never see a half-written file
+    except (OSError, pygame.error) as e:
+        print(f"Error caching thumbnail {path}: {e}")
+    return level_index, thumbnail
+
+
+def load_menu_image(path, scale=3):
+    """Menu art is drawn straight onto the window, so it ignores RENDER_SCALE."""
+    try:
+        image = load_image(path)
+        width, height = image.get_size()
+        return pygame.transform.scale(image, (width * scale, height * scale))
+    except pygame.error as e:
+        print(f"Error loading menu image {path}: {e}")
+        placeholder = pygame.Surface((16 * scale, 16 * scale), pygame.SRCALPHA)
+        placeholder.fill((255, 0, 255)) # Bright pink to indicate missing asset
+        return placeholder
+
+
+class LevelSelect:
+    """The level select screen. handle_event() returns "play" or "quit" once
+    the player has decided; selected is the chosen level index."""
+    COLUMNS = 2
+    CARD_WIDTH, CARD_HEIGHT = THUMBNAIL_SIZE[0] + 80, THUMBNAIL_SIZE[1] + 20
+    ROW_HEIGHT = CARD_HEIGHT + 20
+    GRID = pygame.Rect(0, 100, WIDTH, HEIGHT - 200) # Part of the screen the cards scroll in
+
+    def __init__(self):
+        self.count = len(level_definitions)
+        self.selected = 0
+        self.scroll = 0.0 # Eases towards target_scroll every frame
+        self.target_scroll = 0.0
+        self.thumbnails = [None] * self.count
+        self.numbers = {}
+
+        self.background = tile_surface(get_background("Blue.png"), (WIDTH, HEIGHT))
+        buttons = join("assets", "Menu", "Buttons")
+        self.buttons = {}
+        for name, x, y in [("Close", WIDTH - 70, 20), ("Previous", 40, HEIGHT - 86),
+                           ("Next", 120, HEIGHT - 86), ("Play", WIDTH - 103, HEIGHT - 86)]:
+            image = load_menu_image(join(buttons, f"{name}.png"))
+            self.buttons[name] = (image, image.get_rect(topleft=(x, y)))
+
+        # Results arrive on the pool's result thread; the main loop picks them up
+        self.ready = queue.Queue()
+        self.cancelled = threading.Event()
+        load_level_art()
+        self.pool = ThreadPool(THUMBNAIL_WORKERS)
+        for i in range(self.count):
+            self.pool.apply_async(_thumbnail_job, (i, self.cancelled), callback=self.ready.put)
+
+    def close(self):
+        """Drops thumbnails that haven't started and waits for the ones that have."""
+        self.cancelled.set()
+        self.pool.close()
+        self.pool.join()
+
+    def number_image(self, i):
+        if i not in self.numbers:
+            path = join("assets", "Menu", "Levels", f"{i + 1:02}.png")
+            if isfile(path):
+                self.numbers[i] = load_menu_image(path)
+            else: # The art stops at 50
+                self.numbers[i] = config.FONT.render(str(i + 1), True, (255, 255, 255))
+        return self.numbers[i]
+
+    def card_rect(self, i):
+        row, column = divmod(i, self.COLUMNS)
+        margin = (WIDTH - self.COLUMNS * self.CARD_WIDTH) // (self.COLUMNS + 1)
+        x = margin + column * (self.CARD_WIDTH + margin)
+        y = self.GRID.top + 10 + row * self.ROW_HEIGHT - round(self.scroll)
+        return pygame.Rect(x, y, self.CARD_WIDTH, self.CARD_HEIGHT)
+
+    def max_scroll(self):
+        rows = math.ceil(self.count / self.COLUMNS)
+        return max(0, rows * self.ROW_HEIGHT + 10 - self.GRID.height)
+
+    def select(self, i):
+        self.selected = max(0, min(self.count - 1, i))
+        # Scroll just enough to show the selected row
+        top = (self.selected // self.COLUMNS) * self.ROW_HEIGHT
+        if top < self.target_scroll:
+            self.target_scroll = top
+        elif top + self.ROW_HEIGHT + 10 > self.target_scroll + self.GRID.height:
+            self.target_scroll = top + self.ROW_HEIGHT + 10 - self.GRID.height
+
+    def handle_event(self, event):
+        page = self.COLUMNS * max(1, self.GRID.height // self.ROW_HEIGHT)
+        if event.type == pygame.QUIT:
+            return "quit"
+        if event.type == pygame.KEYDOWN:
+            if event.key in (pygame.K_RETURN, pygame.K_SPACE):
+                return "play"
+            if event.key == pygame.K_ESCAPE:
+                return "quit"
+            moves = {pygame.K_LEFT: -1, pygame.K_RIGHT: 1, pygame.K_UP: -self.COLUMNS,
+                     pygame.K_DOWN: self.COLUMNS, pygame.K_PAGEUP: -page, pygame.K_PAGEDOWN: page}
+            if event.key in moves:
+                self.select(self.selected + moves[event.key])
+        elif event.type == pygame.MOUSEWHEEL:
+            self.target_scroll = max(0, min(self.max_scroll(), self.target_scroll - event.y * 60))
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            for name, (_, rect) in self.buttons.items():
+                if rect.collidepoint(event.pos):
+                    if name == "Close":
+                        return "quit"
+                    if name == "Play":
+                        return "play"
+                    self.select(self.selected + (page if name == "Next" else -page))
+                    return None
+            if self.GRID.collidepoint(event.pos):
+                for i in range(self.count):
+                    if self.card_rect(i).collidepoint(event.pos):
+                        if i == self.selected:
+                            return "play" # Second click on a card starts it
+                        self.select(i)
+        return None
+
+    def update(self):
+        while not self.ready.empty():
+            i, thumbnail = self.ready.get_nowait()
+            if thumbnail is not None:
+                self.thumbnails[i] = thumbnail.convert() # Display format, on the main thread
+        self.target_scroll = min(self.target_scroll, self.max_scroll())
+        self.scroll += (self.target_scroll - self.scroll) * 0.25
+        if abs(self.target_scroll - self.scroll) < 0.5:
+            self.scroll = self.target_scroll
+
+    def draw(self, window):
+        window.blit(self.background, (0, 0))
+        draw_text(window, "Select Level", config.FONT, (255, 255, 255), 40, 30)
+
+        window.set_clip(self.GRID)
+        first = max(0, int(self.scroll // self.ROW_HEIGHT) * self.COLUMNS)
+        last = min(self.count, first + (self.GRID.height // self.ROW_HEIGHT + 2) * self.COLUMNS)
+        for i in range(first, last): # Only the rows that can be on screen
+            card = self.card_rect(i)
+            window.fill((33, 31, 48), card)
+            if i == self.selected:
+                pygame.draw.rect(window, (255, 255, 0), card, 4)
+            number = self.number_image(i)
+            window.blit(number, (card.x + 10, card.y + 10))
+            thumb_rect = pygame.Rect(card.right - THUMBNAIL_SIZE[0] - 10, card.y + 10, *THUMBNAIL_SIZE)
+            if self.thumbnails[i] is not None:
+                window.blit(self.thumbnails[i], thumb_rect)
+            else:
+                window.fill((60, 60, 80), thumb_rect)
+                draw_text(window, "...", config.FONT, (200, 200, 200), thumb_rect.centerx - 15, thumb_rect.centery - 20)
+        window.set_clip(None)
+
+        for image, rect in self.buttons.values():
+            window.blit(image, rect)
+
+
+def level_select(window, clock):
+    """Runs the level select screen; returns the chosen level index, or None to quit."""
+    menu = LevelSelect()
+    choice = None
+    while choice is None:
+        clock.tick(FPS)
+        for event in pygame.event.get():
+            choice = menu.handle_event(event)
+            if choice:
+                break
+        menu.update()
+        menu.draw(window)
+        pygame.display.update()
+    menu.close()
+    return menu.selected if choice == "play" else None
 
 
 # --- Main Game Function ---
-def main(window):
+def main(window, threaded=False, on_quality_change=report_quality_change, telemetry=None,
+         memory_report=False, dev_levels=None, sound=True, endless=None, analytics=None, leak_check=False):
+    """telemetry: optional path that aggregated frame timings are appended to.
+    analytics: optional path that damage, death and goal events are appended to.
+    memory_report: print surface memory usage at every level load.
+    leak_check: measure it at every level load (without printing) to warn about leaks.
+    dev_levels: optional directory of level files to load and hot reload.
+    sound: False to play without audio.
+    endless: seed to skip the level select and play endless mode with."""
     clock = pygame.time.Clock()
-    current_level_index = 0
-    game_state = PLAYING
+    preload_assets(startup_manifest(), draw_loading_screen)
+    if sound:
+        audio.start()
+    watcher = None
+    if dev_levels:
+        watcher = LevelWatcher(dev_levels, load_level_files(dev_levels))
+        watcher.start()
+    governor = QualityGovernor(on_quality_change)
+    stats = FrameStats()
+    writer = None
+    if telemetry:
+        writer = TelemetryWriter(stats, telemetry)
+        writer.start()
+
+    start_level = 0 if endless is not None else level_select(window, clock)
+    if start_level is None:
+        if writer:
+            writer.stop()
+        pygame.quit()
+        quit()
 
     # Load initial level
-    load_result = load_level(current_level_index)
-    if load_result is None:
+    simulation = Simulation(memory_report, start_level, watcher.changes if watcher else None, endless, analytics,
+                            leak_check)
+    if not simulation.running:
         print("Failed to load initial level. Exiting.")
         pygame.quit()
         quit()
-    player, objects, background, bg_image = load_result
 
-    active_objects = [obj for obj in objects if hasattr(obj, 'loop')] # Objects that need updating (like Fire)
+    if threaded:
+        run_threaded(window, simulation, clock, governor, stats)
+    else:
+        run_serial(window, simulation, clock, governor, stats)
+
+    if simulation.events is not None:
+        simulation.events.flush()
+    simulation.stop_endless()
+    if writer:
+        writer.stop()
+    audio.stop()
+    pygame.quit()
+    quit()
+
 
+def record_frame(governor, clock, simulation, last_scene):
+    """Gives the governor the last frame's working time, unless that frame
+    loaded a level or changed screens (or is the first): those stall for
+    reasons the quality tier can't fix, so the governor starts over instead.
+    Returns the scene to pass in next frame."""
+    scene = (simulation.loads, simulation.game_state)
+    if scene != last_scene or simulation.loading:
+        governor.reset()
+    else:
+        governor.record(clock.get_rawtime())
+    return scene
 
-    offset_x = 0
-    scroll_area_width = 200
 
-    run = True
-    while run:
+def run_serial(window, simulation, clock, governor, stats):
+    frame_start = time.perf_counter()
+    scene = None
+    while simulation.running:
         clock.tick(FPS)
+        scene = record_frame(governor, clock, simulation, scene) # Time the last frame spent working
+        # Wall time is start to start, so each sample's frame_ms is the previous frame's
+        now = time.perf_counter()
+        frame_ms = (now - frame_start) * 1000
+        frame_start = now
 
         # --- Event Handling ---
+        input_time = None # When this frame first saw a key press
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                run = False
+                simulation.running = False
                 break
-
             if event.type == pygame.KEYDOWN:
-                if game_state == PLAYING:
-                    if event.key == pygame.K_SPACE: # Keep jump control simple
-                        player.jump()
-                elif game_state == GAME_OVER:
-                     if event.key == pygame.K_r: # Restart game from level 1
-                         current_level_index = 0
-                         game_state = PLAYING
-                         offset_x = 0
-                         load_result = load_level(current_level_index)
-                         if load_result:
-                             player, objects, background, bg_image = load_result
-                             active_objects = [obj for obj in objects if hasattr(obj, 'loop')]
-                         else: # Failed loading after restart attempt
-                              run = False
-                              break
-                elif game_state == GAME_WON:
-                     if event.key == pygame.K_q: # Quit game
-                          run = False
-                          break
-
-        if not run: # Exit loop if run became False
-            break
+                if input_time is None:
+                    input_time = time.perf_counter()
+                simulation.handle_key(event.key)
 
+        if not simulation.running: # Exit loop if run became False
+            break
 
         # --- Game Logic based on State ---
-        if game_state == PLAYING:
-            # Update Player
-            player.loop(FPS)
-
-             # Update active objects (like Fire animations)
-            for obj in active_objects:
-                 obj.loop(FPS) # Pass FPS if needed by the object's loop
-
-            # Handle Movement and Goal Check
-            goal_reached = handle_move(player, objects) # Pass all objects for collision checks
-
-            # Check for Death
-            if player.current_health <= 0:
-                game_state = GAME_OVER
-                # print("Player Died!") # Debug
-                # No need to reset here, GAME_OVER state handles display/restart
-
-            # Check for Level Completion
-            elif goal_reached:
-                 current_level_index += 1
-                 if current_level_index < len(level_definitions):
-                     # Optional: Add a brief transition state/delay
-                     # game_state = LEVEL_TRANSITION
-                     # pygame.time.delay(1000) # Pause for 1 second (example)
-
-                     # Load next level
-                     game_state = PLAYING # Go back to playing state for next level
-                     offset_x = 0 # Reset scroll
-                     load_result = load_level(current_level_index)
-                     if load_result:
-                         player, objects, background, bg_image = load_result
-                         active_objects = [obj for obj in objects if hasattr(obj, 'loop')]
-                     else: # Failed loading next level
-                          print(f"Error loading level {current_level_index + 1}")
-                          run = False # Or handle error differently
-                 else:
-                     game_state = GAME_WON # All levels completed
-                     # print("Game Won!") # Debug
-
-            # Update scroll offset
-            if ((player.rect.right - offset_x >= WIDTH - scroll_area_width) and player.x_vel > 0):
-                offset_x += player.x_vel
-            elif ((player.rect.left - offset_x <= scroll_area_width) and player.x_vel < 0):
-                offset_x += player.x_vel # x_vel is negative, so this subtracts
-
+        sim_start = time.perf_counter()
+        simulation.step()
 
         # --- Drawing ---
         # Draw regardless of state to show messages (Game Over, Win)
-        draw(window, background, bg_image, player, objects, offset_x, current_level_index, game_state)
+        render_start = time.perf_counter()
+        simulation.draw(window)
+        presented = time.perf_counter()
+
+        latency_ms = (presented - input_time) * 1000 if input_time is not None else NO_SAMPLE
+        stats.record(frame_ms, (render_start - sim_start) * 1000, (presented - render_start) * 1000, latency_ms)
+
+
+def run_threaded(window, simulation, clock, governor, stats):
+    """Main-thread half of threaded mode: events in, newest snapshot out."""
+    load_level_art() # Level changes load on the simulation thread, which must not touch the display
+    buffer = SnapshotBuffer(simulation.snapshot())
+    worker = SimulationThread(simulation, buffer)
+    worker.start()
+
+    frame_start = time.perf_counter()
+    input_time = None # Oldest key press not yet seen in a snapshot...
+    input_tick = 0 # ...and the newest tick published when it was sent
+    scene = None
+    while worker.is_alive():
+        clock.tick(FPS)
+        scene = record_frame(governor, clock, simulation, scene)
+        now = time.perf_counter()
+        frame_ms = (now - frame_start) * 1000
+        frame_start = now
 
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                worker.stopping.set()
+            elif event.type == pygame.KEYDOWN:
+                if input_time is None:
+                    input_time = time.perf_counter()
+                    input_tick = buffer.latest().tick
+                worker.key_presses.put(event.key)
+        worker.keys = pygame.key.get_pressed()
 
-    pygame.quit()
-    quit()
+        render_start = time.perf_counter()
+        snapshot = buffer.latest()
+        render_snapshot(window, snapshot)
+        presented = time.perf_counter()
+
+        latency_ms = NO_SAMPLE
+        if input_time is not None and snapshot.tick > input_tick: # The key was handled before this tick
+            latency_ms = (presented - input_time) * 1000
+            input_time = None
+        stats.record(frame_ms, worker.step_ms, (presented - render_start) * 1000, latency_ms)
+
+    worker.join()
 
 
 # --- Entry Point ---
@@ -860,4 +1314,27 @@ if __name__ == "__main__":
           quit()
     # Add more checks if necessary for specific assets used
 
-    main(window)
\ No newline at end of file
+    export_dir = option_value(sys.argv, "--export-levels", DEV_LEVEL_DIR)
+    if export_dir:
+        export_level_files(export_dir)
+        quit()
+
+    endless = option_value(sys.argv, "--endless", "")
+    if endless is not None:
+        try:
+            endless = int(endless) if endless else random.randrange(1 << 31)
+        except ValueError:
+            print(f"Error: --endless takes a whole number as its seed, not '{endless}'.")
+            print("Usage: python mario_offbrand.py --endless[=SEED]")
+            quit()
+
+    muted = "--mute" in sys.argv # Play without audio: don't open the sound device at all
+    # --render-scale: draw the world at half size and scale it up (see engine.config)
+    window = configure(muted, 2 if "--render-scale" in sys.argv else 1, "Mario Offbrand")
+    main(window, threaded="--threaded" in sys.argv,
+         telemetry=option_value(sys.argv, "--telemetry", TELEMETRY_FILE),
+         analytics=option_value(sys.argv, "--analytics", EVENT_FILE),
+         memory_report="--memory-report" in sys.argv,
+         leak_check="--leak-check" in sys.argv,
+         dev_levels=option_value(sys.argv, "--dev-levels", DEV_LEVEL_DIR),
+         sound=not muted, endless=endless)
@@ -0,0 +1,977 @@
+"""Local multiplayer races over UDP.
+
+One machine hosts: it runs the only real simulation of the level and every
+player in it (the same Player / Level / handle_move() code as the single
+player game) and sends each client a snapshot of the world every
+SNAPSHOT_INTERVAL ticks. Clients send their inputs every tick.
+
+Snapshots are a flat list of quantised integers (positions in pixels,
+velocities in 1/16 px, flags packed into bits...) and are sent as the
+difference from the newest snapshot that client has acknowledged: only the
+fields that changed, as (gap, delta) varint pairs. A client that hasn't
+acknowledged anything yet (or whose level changed shape) gets a full one.
+
+Clients predict their own player: each input is applied locally straight
+away with the terrain part of handle_move() (move_player()), and when a
+snapshot says where the host put that player after a given input, the
+client compares it with its own guess for that tick. If they differ, it
+takes the host's state and replays the inputs the host hasn't seen yet.
+Everything else (the other players, traps, platforms, enemies) is drawn
+INTERP_TICKS behind the newest snapshot, interpolated between two snapshots.
+
+The host only steps a client's player when one of its inputs has arrived,
+so a client's prediction sees exactly the same sequence of ticks as the host.
+
+For testing on one machine, "loopback" runs a host and clients in one
+process over 127.0.0.1, with LossyTransport delaying, jittering and dropping
+packets on the way. Bandwidth per client is printed every REPORT_SECONDS and
+at the end.
+
+Usage:
+    python netplay.py host [--port 47800]
+    python netplay.py join HOST [--port 47800]
+    python netplay.py loopback [--latency 50] [--jitter 10] [--loss 0.05] [--clients 1] [--seconds 20] [--headless]
+"""
+import os
+import sys
+import time
+import heapq
+import random
+import socket
+import struct
+import argparse
+
+if "--headless" in sys.argv:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # configure() in main() opens a window
+
+import pygame
+
+import mario_offbrand as game
+from engine import config
+from engine.assets import load_sprite_sheets
+from engine.collision import move_player
+
+DEFAULT_PORT = 47800
+SNAPSHOT_INTERVAL = 2 # Host ticks between snapshots (30 a second)
+INTERP_TICKS = 6 # How far behind the newest snapshot other things are drawn
+INPUT_REDUNDANCY = 8 # Inputs repeated in every input packet, so one lost packet loses nothing
+INPUT_BACKLOG = 6 # Inputs a client may get ahead by before the host skips to its newest
+HISTORY = 64 # Snapshots (host) / inputs (client) kept for deltas and replays
+PREDICTION_TOLERANCE = 2 # Pixels a prediction may be off before the client corrects it
+TELEPORT_DISTANCE = 200 # Bigger jumps between two snapshots are not interpolated
+MAX_PLAYERS = 4
+PLAYER_SKINS = ("NinjaFrog", "PinkMan") # Player 1, 2, 3... cycle through these
+TIMEOUT_SECONDS = 5
+WIN_DELAY = game.FPS * 3 # Ticks the winner is shown before the next level starts
+REPORT_SECONDS = 10
+UDP_OVERHEAD = 28 # IPv4 + UDP header bytes per packet, added to the "wire" figures
+
+# Packets: one type byte, then a fixed struct, then a variable part
+HELLO = b"H" # client -> host: join request
+WELCOME = b"W" # host -> client: player id
+INPUT = b"I" # client -> host: newest tick, acked snapshot, then the last inputs (oldest first)
+SNAPSHOT = b"S" # host -> client: seq, baseline seq, last input applied, then the state
+WELCOME_FORMAT = struct.Struct("<cB")
+INPUT_FORMAT = struct.Struct("<cIH")
+SNAPSHOT_FORMAT = struct.Struct("<cHHI")
+NO_BASELINE = 0xFFFF
+
+# Input bits (one byte per tick)
+LEFT, RIGHT, JUMP = 1, 2, 4
+
+
+class InputKeys:
+    """Held keys for move_player() / handle_move(), from an input byte."""
+    __slots__ = ("bits",)
+    KEY_BITS = {pygame.K_LEFT: LEFT, pygame.K_RIGHT: RIGHT}
+
+    def __init__(self, bits):
+        self.bits = bits
+
+    def __getitem__(self, key):
+        return bool(self.bits & self.KEY_BITS.get(key, 0))
+
+
+def read_input(keys, jump_pressed):
+    return (LEFT if keys[pygame.K_LEFT] else 0) | (RIGHT if keys[pygame.K_RIGHT] else 0) | (JUMP if jump_pressed else 0)
+
+
+def step_player(player, level, bits, predict=False):
+    """One tick of one player, in Simulation.step()'s order. Predicting
+    clients only move against terrain (the host decides traps, enemies and
+    fruit); returns True if the goal was reached."""
+    if bits & JUMP:
+        player.jump()
+    player.loop(game.FPS)
+    keys = InputKeys(bits)
+    if predict:
+        move_player(player, level, keys)
+        return False
+    return game.handle_move(player, level, keys)
+
+
+_skins = {}
+
+
+def new_player(player_id, level_data):
+    start = level_data["player_start"]
+    player = game.Player(start[0], start[1], 64, 64)
+    skin = PLAYER_SKINS[player_id % len(PLAYER_SKINS)]
+    if skin != "NinjaFrog": # Player.SPRITES already is
+        if skin not in _skins:
+            _skins[skin] = load_sprite_sheets("MainCharacters", skin, 32, 32, True)
+        player.SPRITES = _skins[skin]
+    player.update_sprite()
+    return player
+
+
+# --- Delta Encoding ---
+def write_varint(out, value):
+    value = value * 2 if value >= 0 else -value * 2 - 1 # Zigzag: small negatives stay small
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    return (value >> 1) ^ -(value & 1), pos
+
+
+def encode_state(values, baseline=None):
+    """Field count, then either every value or, against a baseline of the
+    same length, the number of changed fields and a (fields skipped, delta)
+    pair for each of them."""
+    out = bytearray()
+    write_varint(out, len(values))
+    if baseline is None:
+        for value in values:
+            write_varint(out, value)
+        return out
+    changes = bytearray()
+    changed = 0
+    last = -1
+    for i, (value, old) in enumerate(zip(values, baseline)):
+        if value != old:
+            write_varint(changes, i - last - 1)
+            write_varint(changes, value - old)
+            changed += 1
+            last = i
+    write_varint(out, changed)
+    return out + changes
+
+
+def decode_state(data, pos, baseline=None):
+    count, pos = read_varint(data, pos)
+    if baseline is None:
+        values = []
+        for _ in range(count):
+            value, pos = read_varint(data, pos)
+            values.append(value)
+        return values
+    if len(baseline) != count:
+        raise ValueError("baseline has a different layout")
+    values = list(baseline)
+    changed, pos = read_varint(data, pos)
+    i = -1
+    for _ in range(changed):
+        gap, pos = read_varint(data, pos)
+        delta, pos = read_varint(data, pos)
+        i += gap + 1
+        values[i] += delta
+    return values
+
+
+# --- World State ---
+# pack_world() and unpack_world() walk the level in the same order, so a
+# snapshot is just the values. lerp_fields() marks which ones are positions
+# and counters that can be interpolated; the rest (states, flags, health)
+# switch over when the newer snapshot is reached.
+HEADER_FIELDS = 4 # level index, host tick, winner + 1 (0: none), player count
+PLAYER_FIELDS = 14
+PLAYER_LERP = (1, 2, 12) # x, y, animation_count
+# Fields only the host decides (damage, invincibility, surface speed): a
+# client's prediction never changes them, so any difference is a correction
+HOST_DECIDED = (5, 8, 9, 10) # speed modifier, hit count, invincibility, health
+HOST_FLAGS = 2 | 4 # hit, invincible
+FRUIT_BITS = 16 # Collected fruit bitset, sent in chunks this size
+ENEMY_POSES = ("idle", "run", "jump", "fall")
+_MOVING = (None, None) # Stands in for Enemy.link on clients: "between two nodes"
+
+
+def player_fields(player_id, player):
+    flags = (player.direction == "right") | player.hit << 1 | player.is_invincible << 2 | player.jump_count << 3
+    return (player_id, player.rect.x, player.rect.y, round(player.x_vel), round(player.y_vel * 16),
+            round(player.speed_modifier * 16), flags, min(player.fall_count, game.FPS), player.hit_count,
+            round(player.invincibility_timer * game.FPS), player.current_health, 0, player.animation_count, 0)
+
+
+def set_player(player, fields):
+    _, x, y, x_vel, y_vel, speed, flags, fall_count, hit_count, invincible, health, _, animation_count, _ = fields
+    player.rect.topleft = (x, y)
+    player.x_vel = x_vel
+    player.y_vel = y_vel / 16
+    player.speed_modifier = speed / 16
+    player.direction = "right" if flags & 1 else "left"
+    player.hit = bool(flags & 2)
+    player.is_invincible = bool(flags & 4)
+    player.jump_count = flags >> 3
+    player.fall_count = fall_count
+    player.hit_count = hit_count
+    player.invincibility_timer = invincible / game.FPS
+    player.current_health = health
+    player.animation_count = animation_count
+
+
+def matches(predicted, fields):
+    """True if a client's predicted player fields agree with the host's:
+    the position within PREDICTION_TOLERANCE, the host-decided ones exactly."""
+    if abs(predicted[1] - fields[1]) > PREDICTION_TOLERANCE or abs(predicted[2] - fields[2]) > PREDICTION_TOLERANCE:
+        return False
+    if (predicted[6] ^ fields[6]) & HOST_FLAGS:
+        return False
+    return all(predicted[i] == fields[i] for i in HOST_DECIDED)
+
+
+def enemy_pose(enemy):
+    if enemy.link is None:
+        return 0
+    if not enemy.hop:
+        return 1
+    return 2 if enemy.progress * 2 < enemy.length else 3
+
+
+def pack_world(level_index, tick, winner, players, level):
+    """players: {player id: Player}. Returns the state as a list of ints."""
+    values = [level_index, tick, 0 if winner is None else winner + 1, len(players)]
+    for player_id in sorted(players):
+        values += player_fields(player_id, players[player_id])
+    fruits = level.fruits
+    values.append(fruits.tick)
+    for shift in range(0, len(fruits), FRUIT_BITS):
+        values.append(fruits.collected >> shift & (1 << FRUIT_BITS) - 1)
+    for batch in level.traps.batches.values():
+        values.append(batch.tick)
+        for i in range(len(batch)):
+            values += (round(batch.x[i]), round(batch.y[i]), batch.state[i], batch.timer[i], batch.active[i])
+    for platform in level.platforms:
+        falling = getattr(platform, "y_vel", 0) != 0
+        values += (platform.rect.x, platform.rect.y, platform.visible | falling << 1, platform.animation_count)
+    for enemy in level.enemies.enemies:
+        flags = (enemy.direction == "right") | enemy.defeated << 1
+        values += (round(enemy.x), round(enemy.y), enemy.dead, flags, enemy_pose(enemy), enemy.animation_count)
+    return values
+
+
+def lerp_fields(values, level):
+    """Indices of the fields in a pack_world() list that may be interpolated."""
+    lerp = set()
+    i = HEADER_FIELDS
+    for _ in range(values[3]):
+        lerp.update(i + field for field in PLAYER_LERP)
+        i += PLAYER_FIELDS
+    lerp.add(i) # Fruit animation tick
+    i += 1 + (len(level.fruits) + FRUIT_BITS - 1) // FRUIT_BITS
+    for batch in level.traps.batches.values():
+        lerp.add(i)
+        i += 1
+        for _ in range(len(batch)):
+            lerp.update((i, i + 1))
+            i += 5
+    for _ in level.platforms:
+        lerp.update((i, i + 1, i + 3))
+        i += 4
+    for _ in level.enemies.enemies:
+        lerp.update((i, i + 1, i + 5))
+        i += 6
+    return lerp
+
+
+def unpack_world(values, level, players, skip=None):
+    """Writes a pack_world() list into a client's copy of the level and the
+    players in it (creating players as they appear). skip: the local
+    player's id, which prediction looks after instead."""
+    i = HEADER_FIELDS
+    seen = set()
+    for _ in range(values[3]):
+        fields = values[i:i + PLAYER_FIELDS]
+        i += PLAYER_FIELDS
+        player_id = fields[0]
+        seen.add(player_id)
+        if player_id == skip:
+            continue
+        if player_id not in players:
+            players[player_id] = new_player(player_id, level.data)
+        set_player(players[player_id], fields)
+        players[player_id].update_sprite()
+    for player_id in set(players) - seen - {skip}:
+        del players[player_id] # Left the game
+
+    fruits = level.fruits
+    fruits.tick = values[i]
+    i += 1
+    collected = 0
+    for shift in range(0, len(fruits), FRUIT_BITS):
+        collected |= values[i] << shift
+        i += 1
+    fruits.restore((collected, bin(collected).count("1")))
+
+    for batch in level.traps.batches.values():
+        batch.tick = values[i]
+        i += 1
+        for index in range(len(batch)):
+            x, y, state, timer, active = values[i:i + 5]
+            i += 5
+            batch.x[index], batch.y[index] = x, y
+            batch.rects[index].topleft = (x, y)
+            batch.state[index], batch.timer[index], batch.active[index] = state, timer, active
+
+    for platform in level.platforms:
+        x, y, flags, animation_count = values[i:i + 4]
+        i += 4
+        platform.rect.topleft = (x, y)
+        platform.visible = bool(flags & 1)
+        platform.animation_count = animation_count
+        if flags & 2:
+            platform.image = platform.off_frames[0]
+        else:
+            platform.image = platform.frames[(animation_count // platform.ANIMATION_DELAY) % len(platform.frames)]
+
+    for enemy in level.enemies.enemies:
+        x, y, dead, flags, pose, animation_count = values[i:i + 6]
+        i += 6
+        enemy.x, enemy.y, enemy.dead = x, y, dead
+        enemy.defeated = bool(flags & 2)
+        enemy.direction = "right" if flags & 1 else "left"
+        enemy.animation_count = animation_count
+        enemy.link = None if pose == 0 else _MOVING
+        enemy.hop = pose >= 2
+        enemy.progress, enemy.length = (1.0, 1.0) if pose == 3 else (0.0, 1.0)
+
+
+def interpolate(older, newer, t, lerp):
+    values = list(newer)
+    for i in lerp:
+        a, b = older[i], newer[i]
+        if a != b and abs(b - a) < TELEPORT_DISTANCE:
+            values[i] = round(a + (b - a) * t)
+    return values
+
+
+# --- Transport ---
+class UdpTransport:
+    """Non-blocking UDP socket that counts what goes through it per address."""
+
+    def __init__(self, port=0, host="0.0.0.0"):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.socket.setblocking(False)
+        self.meter = BandwidthMeter()
+
+    @property
+    def address(self):
+        return self.socket.getsockname()
+
+    def send(self, data, address):
+        self.meter.sent(address, len(data))
+        try:
+            self.socket.sendto(data, address)
+        except OSError as e:
+            print(f"Warning: Couldn't send to {address}: {e}")
+
+    def receive(self):
+        packets = []
+        while True:
+            try:
+                data, address = self.socket.recvfrom(65536)
+            except BlockingIOError:
+                break
+            except ConnectionResetError: # Windows reports an earlier send to a closed port here
+                continue
+            self.meter.received(address, len(data))
+            packets.append((data, address))
+        return packets
+
+    def close(self):
+        self.socket.close()
+
+
+class LossyTransport:
+    """Testing shim around a UdpTransport: every outgoing packet is delayed by
+    latency_ms +/- jitter_ms (one way) or, with probability loss, dropped.
+    Dropped packets still count as sent, since they used the bandwidth."""
+
+    def __init__(self, transport, latency_ms=0, jitter_ms=0, loss=0.0, seed=None):
+        self.transport = transport
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.queue = [] # (deliver at, order, data, address)
+        self.order = 0
+        self.dropped = 0
+        self.meter = transport.meter
+
+    @property
+    def address(self):
+        return self.transport.address
+
+    def send(self, data, address):
+        if self.random.random() < self.loss:
+            self.meter.sent(address, len(data))
+            self.dropped += 1
+            return
+        delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        self.order += 1
+        heapq.heappush(self.queue, (time.perf_counter() + delay, self.order, data, address))
+        self.flush()
+
+    def flush(self):
+        now = time.perf_counter()
+        while self.queue and self.queue[0][0] <= now:
+            _, _, data, address = heapq.heappop(self.queue)
+            self.transport.send(data, address)
+
+    def receive(self):
+        self.flush()
+        return self.transport.receive()
+
+    def close(self):
+        self.transport.close()
+
+
+class BandwidthMeter:
+    """Bytes and packets sent to / received from each address."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = {} # address -> [bytes sent, packets sent, bytes received, packets received]
+
+    def _entry(self, address):
+        entry = self.totals.get(address)
+        if entry is None:
+            entry = self.totals[address] = [0, 0, 0, 0]
+        return entry
+
+    def sent(self, address, size):
+        entry = self._entry(address)
+        entry[0] += size
+        entry[1] += 1
+
+    def received(self, address, size):
+        entry = self._entry(address)
+        entry[2] += size
+        entry[3] += 1
+
+    def report(self, label="", addresses=None):
+        seconds = max(time.perf_counter() - self.started, 1e-6)
+        lines = []
+        for address in addresses or sorted(self.totals):
+            sent, sent_packets, received, received_packets = self.totals.get(address, (0, 0, 0, 0))
+            wire_out = sent + sent_packets * UDP_OVERHEAD
+            wire_in = received + received_packets * UDP_OVERHEAD
+            lines.append(f"{label}{address[0]}:{address[1]}: "
+                         f"out {sent * 8 / seconds / 1000:.1f} kbit/s ({wire_out * 8 / seconds / 1000:.1f} on the wire, "
+                         f"{sent / max(sent_packets, 1):.0f} B/packet), "
+                         f"in {received * 8 / seconds / 1000:.1f} kbit/s ({wire_in * 8 / seconds / 1000:.1f} on the wire)")
+        return "\n".join(lines)
+
+    def reset(self):
+        self.started = time.perf_counter()
+        self.totals.clear()
+
+
+# --- Host ---
+class Peer:
+    """A connected client, as the host sees it."""
+
+    def __init__(self, player_id, address):
+        self.player_id = player_id
+        self.address = address
+        self.inputs = {} # client tick -> input byte, not yet applied
+        self.next_tick = None # Client tick of the next input to apply
+        self.applied = 0 # Client tick of the newest input applied
+        self.acked = None # Newest snapshot seq the client has confirmed
+        self.last_heard = time.perf_counter()
+        self.full_snapshots = 0
+        self.snapshots = 0
+
+
+class RaceHost:
+    """Authoritative simulation of a race, plus its side of the protocol.
+
+    local: whether this machine has a player too (id 0, on the keyboard)."""
+
+    def __init__(self, transport, level_index=0, local=True):
+        self.transport = transport
+        self.tick = 0
+        self.seq = 0
+        self.history = {} # seq -> state sent with it
+        self.peers = {} # address -> Peer
+        self.players = {} # player id -> Player
+        self.local = local
+        self.winner = None
+        self.finished_tick = 0
+        self.last_report = time.perf_counter()
+        self.load(level_index)
+        if local:
+            self.players[0] = new_player(0, self.level.data)
+
+    def load(self, level_index):
+        self.level_index = level_index % len(game.level_definitions)
+        _, self.level = game.load_level(self.level_index)
+        for player_id in self.players:
+            self.players[player_id] = new_player(player_id, self.level.data)
+        self.winner = None
+
+    def free_id(self):
+        taken = set(self.players)
+        return next(i for i in range(MAX_PLAYERS) if i not in taken)
+
+    def receive(self):
+        for data, address in self.transport.receive():
+            kind = data[:1]
+            peer = self.peers.get(address)
+            if kind == HELLO:
+                if peer is None:
+                    if len(self.players) >= MAX_PLAYERS:
+                        continue # Full: the client times out
+                    peer = self.peers[address] = Peer(self.free_id(), address)
+                    self.players[peer.player_id] = new_player(peer.player_id, self.level.data)
+                    print(f"Player {peer.player_id + 1} joined from {address[0]}:{address[1]}")
+                self.transport.send(WELCOME_FORMAT.pack(WELCOME, peer.player_id), address)
+            elif kind == INPUT and peer is not None and len(data) >= INPUT_FORMAT.size:
+                _, newest, acked = INPUT_FORMAT.unpack_from(data)
+                peer.last_heard = time.perf_counter()
+                if acked in self.history and (peer.acked is None or _newer(acked, peer.acked)):
+                    peer.acked = acked
+                inputs = data[INPUT_FORMAT.size:]
+                first = newest - len(inputs) + 1
+                for offset, bits in enumerate(inputs):
+                    tick = first + offset
+                    if tick > peer.applied:
+                        peer.inputs[tick] = bits
+                if peer.next_tick is None:
+                    peer.next_tick = first
+
+    def peer_inputs(self, peer):
+        """The inputs to apply to a client's player this tick: normally one,
+        none if nothing has arrived, several if the client got too far ahead."""
+        if peer.next_tick is None or not peer.inputs:
+            return []
+        for tick in [tick for tick in peer.inputs if tick < peer.next_tick]:
+            del peer.inputs[tick] # Skipped over
+        newest = max(peer.inputs)
+        if peer.next_tick not in peer.inputs:
+            # Lost for good (beyond the redundancy) or not here yet: skip
+            # ahead only once something later is waiting
+            later = [tick for tick in peer.inputs if tick > peer.next_tick]
+            if not later:
+                return []
+            peer.next_tick = min(later)
+        count = 1
+        if newest - peer.next_tick >= INPUT_BACKLOG:
+            count = newest - peer.next_tick - 1 # Catch up, keeping a tick of slack
+        applied = []
+        for _ in range(count):
+            bits = peer.inputs.pop(peer.next_tick, None)
+            if bits is None:
+                break
+            peer.applied = peer.next_tick
+            peer.next_tick += 1
+            applied.append(bits)
+        return applied
+
+    def step(self, local_bits=0):
+        self.receive()
+        self.tick += 1
+        now = time.perf_counter()
+        for address, peer in list(self.peers.items()):
+            if now - peer.last_heard > TIMEOUT_SECONDS:
+                print(f"Player {peer.player_id + 1} timed out")
+                del self.peers[address]
+                del self.players[peer.player_id]
+
+        if self.winner is not None:
+            if self.tick - self.finished_tick >= WIN_DELAY:
+                self.load(self.level_index + 1)
+        else:
+            self.simulate(local_bits)
+
+        if self.tick % SNAPSHOT_INTERVAL == 0:
+            self.send_snapshots()
+        if now - self.last_report >= REPORT_SECONDS:
+            self.last_report = now
+            print(self.report())
+
+    def simulate(self, local_bits):
+        level = self.level
+        players = self.players
+        if not players:
+            return
+        # Platforms carry the player given to level.loop(); move everyone else
+        # standing on one by however far it went
+        lead = players[min(players)]
+        riders = [(player, platform, platform.rect.topleft) for player in players.values() if player is not lead
+                  for platform in level.platforms if platform.carries(player)]
+        level.loop(lead)
+        for player, platform, (x, y) in riders:
+            player.move(platform.rect.x - x, platform.rect.y - y)
+
+        moves = []
+        if self.local:
+            moves.append((0, local_bits))
+        for peer in self.peers.values():
+            moves += [(peer.player_id, bits) for bits in self.peer_inputs(peer)]
+        for player_id, bits in moves:
+            player = players[player_id]
+            if step_player(player, level, bits) and self.winner is None:
+                self.winner = player_id
+                self.finished_tick = self.tick
+                print(f"Player {player_id + 1} wins level {self.level_index + 1}")
+            if player.current_health <= 0 or player.rect.top > level.bottom:
+                player.reset() # Back to the start with full health
+
+    def send_snapshots(self):
+        self.seq = (self.seq + 1) % NO_BASELINE
+        state = pack_world(self.level_index, self.tick, self.winner, self.players, self.level)
+        self.history[self.seq] = state
+        self.history.pop((self.seq - HISTORY) % NO_BASELINE, None)
+        for peer in self.peers.values():
+            baseline = self.history.get(peer.acked) if peer.acked is not None else None
+            if baseline is not None and len(baseline) != len(state):
+                baseline = None # Level or players changed: start over
+            header = SNAPSHOT_FORMAT.pack(SNAPSHOT, self.seq, NO_BASELINE if baseline is None else peer.acked,
+                                          peer.applied)
+            self.transport.send(header + encode_state(state, baseline), peer.address)
+            peer.snapshots += 1
+            peer.full_snapshots += baseline is None
+
+    def report(self):
+        lines = [f"Host tick {self.tick}, {len(self.players)} players:"]
+        for peer in self.peers.values():
+            lines.append(f"  Player {peer.player_id + 1}: {peer.snapshots} snapshots ({peer.full_snapshots} full)")
+            lines.append(self.transport.meter.report("    ", [peer.address]))
+        return "\n".join(lines)
+
+
+def _newer(seq, than):
+    """Sequence numbers wrap, so 'newer' means less than half the range ahead."""
+    return 0 < (seq - than) % NO_BASELINE < NO_BASELINE // 2
+
+
+# --- Client ---
+class RaceClient:
+    """Predicts its own player and interpolates everything else."""
+
+    def __init__(self, transport, host_address):
+        self.transport = transport
+        self.host_address = host_address
+        self.player_id = None
+        self.level_index = None
+        self.level = None
+        self.player = None # Predicted
+        self.others = {} # player id -> Player, interpolated
+        self.tick = 0 # Own input tick
+        self.history = {} # tick -> (input byte, predicted player fields after it)
+        self.received = {} # seq -> state
+        self.acked = NO_BASELINE
+        self.buffer = [] # (host tick, state) of recent snapshots, oldest first
+        self.lerp = None
+        self.host_tick = 0 # Estimated host tick now
+        self.winner = None
+        self.corrections = 0
+        self.lost_snapshots = 0
+        self.offset_x = 0
+
+    def connect(self, poll=None, timeout=TIMEOUT_SECONDS):
+        """Says hello until the host answers; returns False if it never does.
+        poll: called every tick while waiting (a loopback host's step())."""
+        deadline = time.perf_counter() + timeout
+        next_hello = 0
+        while self.player_id is None:
+            now = time.perf_counter()
+            if now > deadline:
+                return False
+            if now >= next_hello:
+                self.transport.send(HELLO, self.host_address)
+                next_hello = now + 0.2
+            if poll:
+                poll()
+            time.sleep(1 / game.FPS)
+            self.receive()
+        return True
+
+    def receive(self):
+        for data, address in self.transport.receive():
+            if address != self.host_address:
+                continue
+            kind = data[:1]
+            if kind == WELCOME and self.player_id is None:
+                self.player_id = WELCOME_FORMAT.unpack_from(data)[1]
+            elif kind == SNAPSHOT and self.player_id is not None:
+                self.on_snapshot(data)
+
+    def on_snapshot(self, data):
+        _, seq, baseline_seq, applied = SNAPSHOT_FORMAT.unpack_from(data)
+        if self.acked != NO_BASELINE and not _newer(seq, self.acked):
+            return # Arrived out of order: a newer one is already in
+        baseline = None
+        if baseline_seq != NO_BASELINE:
+            baseline = self.received.get(baseline_seq)
+            if baseline is None:
+                return # Can't decode it; the next snapshot will use an older baseline
+        state = decode_state(data, SNAPSHOT_FORMAT.size, baseline)
+        if self.acked != NO_BASELINE:
+            self.lost_snapshots += (seq - self.acked) % NO_BASELINE - 1
+        self.received[seq] = state
+        self.received.pop((seq - HISTORY) % NO_BASELINE, None)
+        self.acked = seq
+
+        level_index, host_tick, winner = state[0], state[1], state[2] - 1
+        if level_index != self.level_index:
+            self.level_index = level_index
+            self.player, self.level = game.load_level(level_index)
+            self.player = new_player(self.player_id, self.level.data)
+            self.others.clear()
+            self.buffer.clear()
+            self.history.clear()
+            self.lerp = None
+        if self.lerp is None or len(state) != len(self.buffer[-1][1]):
+            self.lerp = lerp_fields(state, self.level)
+            self.buffer.clear()
+        self.buffer.append((host_tick, state))
+        del self.buffer[:-8]
+        self.host_tick = max(self.host_tick, host_tick)
+        self.winner = None if winner < 0 else winner
+        self.reconcile(state, applied)
+
+    def reconcile(self, state, applied):
+        """Checks the host's copy of our player against what we predicted for
+        that input; on a mismatch (position, or anything only the host
+        decides), takes the host's and replays the rest."""
+        fields = None
+        for i in range(HEADER_FIELDS, HEADER_FIELDS + state[3] * PLAYER_FIELDS, PLAYER_FIELDS):
+            if state[i] == self.player_id:
+                fields = state[i:i + PLAYER_FIELDS]
+        if fields is None or applied == 0:
+            return
+        for tick in [tick for tick in self.history if tick < applied]:
+            del self.history[tick]
+        predicted = self.history.get(applied)
+        if predicted is not None and matches(predicted[1], fields):
+            return
+        self.corrections += 1
+        player = self.player
+        set_player(player, fields)
+        for tick in sorted(self.history):
+            if tick > applied:
+                step_player(player, self.level, self.history[tick][0], predict=True)
+                self.history[tick] = (self.history[tick][0], player_fields(self.player_id, player))
+
+    def step(self, bits):
+        self.receive()
+        if self.level is None:
+            return # Waiting for the first snapshot
+        self.tick += 1
+        # Our guess of the host's clock runs on between snapshots, but never far past the newest
+        self.host_tick = min(self.host_tick + 1, self.buffer[-1][0] + INTERP_TICKS)
+        step_player(self.player, self.level, bits, predict=True)
+        self.history[self.tick] = (bits, player_fields(self.player_id, self.player))
+        if len(self.history) > HISTORY * 4:
+            del self.history[min(self.history)] # The host isn't applying them; don't grow forever
+
+        ticks = range(max(1, self.tick - INPUT_REDUNDANCY + 1), self.tick + 1)
+        inputs = bytes(self.history[tick][0] if tick in self.history else 0 for tick in ticks)
+        self.transport.send(INPUT_FORMAT.pack(INPUT, self.tick, self.acked) + inputs, self.host_address)
+        self.offset_x = follow(self.offset_x, self.player)
+
+    def apply_interpolated(self):
+        """Puts the world as it was INTERP_TICKS ago (between two snapshots) into the level."""
+        if not self.buffer:
+            return
+        render_tick = self.host_tick - INTERP_TICKS
+        older = newer = self.buffer[-1]
+        for i, entry in enumerate(self.buffer):
+            if entry[0] >= render_tick:
+                newer = entry
+                older = self.buffer[i - 1] if i else entry
+                break
+        if older is newer or newer[0] == older[0]:
+            state = newer[1]
+        else:
+            t = (render_tick - older[0]) / (newer[0] - older[0])
+            state = interpolate(older[1], newer[1], min(max(t, 0.0), 1.0), self.lerp)
+        unpack_world(state, self.level, self.others, skip=self.player_id)
+
+    def draw(self, window):
+        if self.level is None:
+            window.fill((0, 0, 0))
+            game.draw_text(window, "Waiting for the host...", config.FONT, (255, 255, 255), 10, 10)
+            pygame.display.update()
+            return
+        self.apply_interpolated()
+        draw_race(window, self.level_index, self.level, self.player, self.player_id, self.others, self.offset_x, self.winner)
+
+    def report(self):
+        return (f"Client {self.player_id + 1 if self.player_id is not None else '?'}: "
+                f"{self.corrections} prediction corrections, {self.lost_snapshots} snapshots lost\n"
+                + self.transport.meter.report("  ", [self.host_address]))
+
+
+def follow(offset_x, player):
+    """Scrolls like Simulation.step() does."""
+    area = game.Simulation.SCROLL_AREA_WIDTH
+    if player.rect.right - offset_x >= game.WIDTH - area and player.x_vel > 0:
+        return offset_x + player.x_vel
+    if player.rect.left - offset_x <= area and player.x_vel < 0:
+        return offset_x + player.x_vel
+    return offset_x
+
+
+def draw_race(window, level_index, level, player, player_id, others, offset_x, winner):
+    scale = game.adaptive.quality.render_scale
+    surface = game.scene_surface(window, scale)
+    target = window if surface is window else game.SceneTarget(surface, scale)
+    game.draw_world(target, player, level, offset_x)
+    for other in others.values():
+        target.blit(other.sprite, (other.rect.x - offset_x, other.rect.y))
+    game.present_scene(window, surface)
+    game.draw_hud(window, level_index, level.fruits.count, len(level.fruits), game.PLAYING)
+    game.draw_text(window, f"Player {player_id + 1}", config.FONT, (255, 255, 255), 10, 130)
+    if winner is not None:
+        text = "You win!" if winner == player_id else f"Player {winner + 1} wins!"
+        game.draw_text(window, text, config.FONT, (255, 255, 0), game.WIDTH // 2 - 100, game.HEIGHT // 2 - 50)
+    pygame.display.update()
+
+
+# --- Entry Points ---
+def run_host(window, port):
+    transport = UdpTransport(port)
+    host = RaceHost(transport)
+    print(f"Hosting on port {transport.address[1]}")
+    clock = pygame.time.Clock()
+    offset_x = 0
+    level_index = host.level_index
+    running = True
+    while running:
+        clock.tick(game.FPS)
+        jump = False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                jump = True
+        host.step(read_input(pygame.key.get_pressed(), jump))
+        player = host.players[0]
+        others = {i: p for i, p in host.players.items() if i != 0}
+        if host.level_index != level_index:
+            level_index = host.level_index
+            offset_x = 0
+        offset_x = follow(offset_x, player)
+        draw_race(window, host.level_index, host.level, player, 0, others, offset_x, host.winner)
+    print(host.report())
+    transport.close()
+
+
+def run_client(window, transport, host_address, hosts=()):
+    """Plays as a client; hosts: RaceHosts to step in the same loop (loopback)."""
+    client = RaceClient(transport, host_address)
+    if not client.connect(lambda: [host.step() for host in hosts]):
+        print(f"No answer from {host_address[0]}:{host_address[1]}")
+        return
+    clock = pygame.time.Clock()
+    running = True
+    while running:
+        clock.tick(game.FPS)
+        jump = False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                jump = True
+        for host in hosts:
+            host.step()
+        client.step(read_input(pygame.key.get_pressed(), jump))
+        client.draw(window)
+    print(client.report())
+    for host in hosts:
+        print(host.report())
+
+
+def scripted_input(tick, player_id):
+    """Headless stand-in for a player: run right, jumping now and then."""
+    bits = RIGHT if (tick // 240 + player_id) % 4 else LEFT
+    if (tick + player_id * 7) % 45 == 0:
+        bits |= JUMP
+    return bits
+
+
+def run_loopback(args, window):
+    host_transport = UdpTransport(0, "127.0.0.1")
+    shimmed = lambda transport, seed: LossyTransport(transport, args.latency, args.jitter, args.loss, seed)
+    host = RaceHost(shimmed(host_transport, 1), args.level - 1, local=False)
+    host_address = ("127.0.0.1", host_transport.address[1])
+    print(f"Loopback: {args.latency} ms +/- {args.jitter} ms each way, {args.loss:.0%} loss")
+
+    if not args.headless:
+        run_client(window, shimmed(UdpTransport(0, "127.0.0.1"), 2), host_address, [host])
+        return
+
+    clients = [RaceClient(shimmed(UdpTransport(0, "127.0.0.1"), 2 + i), host_address) for i in range(args.clients)]
+    for client in clients:
+        if not client.connect(host.step):
+            print("A client couldn't connect")
+            return
+    for transport in [host.transport] + [client.transport for client in clients]:
+        transport.meter.reset() # Measure the race, not the handshake
+    started = time.perf_counter()
+    next_tick = started
+    while time.perf_counter() - started < args.seconds:
+        host.step()
+        for client in clients:
+            client.step(scripted_input(client.tick, client.player_id))
+            client.apply_interpolated()
+        next_tick += 1 / game.FPS
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    print(host.report())
+    for client in clients:
+        print(client.report())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Two-player races over UDP")
+    parser.add_argument("mode", choices=["host", "join", "loopback"])
+    parser.add_argument("address", nargs="?", default="127.0.0.1", help="host to join")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--level", type=int, default=1, help="1-based level to start on (loopback)")
+    parser.add_argument("--latency", type=float, default=50, help="one-way delay in ms (loopback)")
+    parser.add_argument("--jitter", type=float, default=10, help="random +/- ms on the delay (loopback)")
+    parser.add_argument("--loss", type=float, default=0.05, help="fraction of packets dropped (loopback)")
+    parser.add_argument("--clients", type=int, default=1, help="scripted clients (loopback --headless)")
+    parser.add_argument("--seconds", type=float, default=20, help="run time (loopback --headless)")
+    parser.add_argument("--headless", action="store_true", help="no window: scripted clients (loopback)")
+    args = parser.parse_args()
+
+    window = config.configure(caption="Mario Offbrand - Race")
+    if args.mode == "host":
+        run_host(window, args.port)
+    elif args.mode == "join":
+        run_client(window, UdpTransport(), (socket.gethostbyname(args.address), args.port))
+    else:
+        run_loopback(args, window)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()